@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from django.contrib.auth.signals import user_logged_in
+        from .sesiones import registrar_epoca_en_sesion
+
+        user_logged_in.connect(registrar_epoca_en_sesion, dispatch_uid='core_registrar_epoca_en_sesion')
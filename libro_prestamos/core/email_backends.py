@@ -1,110 +1,119 @@
 """
-Backend de email personalizado para desarrollo que maneja UTF-8 correctamente
+Backends de email para desarrollo y pruebas de carga.
+
+- UTF8ConsoleEmailBackend: muestra los emails en la consola, legibles y con
+  UTF-8 sin importar el encoding de la terminal.
+- MaildirEmailBackend: guarda cada email en un directorio Maildir
+  (EMAIL_FILE_PATH) en lugar de mostrarlo; sirve para pruebas de carga sin
+  inundar la consola, y los emails se pueden revisar con cualquier cliente
+  que lea Maildir (mutt, mailbox.Maildir).
 """
-from django.core.mail.backends.console import EmailBackend as ConsoleEmailBackend
-from django.core.mail.message import EmailMessage
-import sys
-import traceback
 import logging
-import io
-import re
+import mailbox
+import os
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.console import EmailBackend as ConsoleEmailBackend
 
 logger = logging.getLogger(__name__)
 
+SEPARADOR = "=" * 70
+SEPARADOR_ALTERNATIVA = "-" * 70
+
 
 class UTF8ConsoleEmailBackend(ConsoleEmailBackend):
     """
-    Backend de consola que maneja correctamente caracteres UTF-8
+    Backend de consola que maneja correctamente caracteres UTF-8.
+
+    El stream se reconfigura a UTF-8 una sola vez, al crear el backend, y
+    cada email se arma completo en memoria y se escribe con un solo write().
     """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        encoding = (getattr(self.stream, 'encoding', None) or '').lower().replace('-', '')
+        if encoding != 'utf8' and hasattr(self.stream, 'reconfigure'):
+            try:
+                self.stream.reconfigure(encoding='utf-8', errors='replace')
+            except Exception as e:
+                logger.warning(f"No se pudo reconfigurar la salida a UTF-8: {e}")
+
     def write_message(self, message):
-        """
-        Escribe el mensaje a stdout con encoding UTF-8 de forma segura
-        """
+        """Escribe el mensaje en el stream con un solo write()."""
+        texto = self.formatear(message)
         try:
-            logger.debug("UTF8ConsoleEmailBackend: Iniciando write_message")
-            logger.debug(f"Encoding actual de stdout: {getattr(sys.stdout, 'encoding', 'N/A')}")
-            logger.debug(f"Subject: {repr(message.subject)}")
-            logger.debug(f"From: {repr(message.from_email)}")
-            logger.debug(f"To: {repr(message.to)}")
-            
-            # Asegurar que stdout use UTF-8
-            if hasattr(sys.stdout, 'reconfigure'):
-                try:
-                    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
-                    logger.debug("stdout reconfigurado a UTF-8")
-                except Exception as e:
-                    logger.warning(f"No se pudo reconfigurar stdout: {e}")
-            
-            # Escribir el email manualmente con manejo seguro de UTF-8
-            self._write_email_safe(message)
-            logger.debug("Mensaje escrito exitosamente")
-            
-        except Exception as e:
-            logger.error(f"Error en write_message: {e}")
-            logger.error(f"Tipo: {type(e).__name__}")
-            logger.error(traceback.format_exc())
-            # Intentar mostrar información básica
-            self._write_email_fallback(message)
-            raise
-    
-    def _write_email_safe(self, message):
-        """Escribe el email de forma segura manejando UTF-8"""
-        def safe_write(text):
-            """Escribe texto de forma segura"""
+            self.stream.write(texto)
+        except UnicodeEncodeError:
+            # Stream sin reconfigure y con un encoding que no soporta el texto
+            encoding = getattr(self.stream, 'encoding', None) or 'ascii'
+            self.stream.write(texto.encode(encoding, errors='replace').decode(encoding))
+
+    @staticmethod
+    def formatear(message):
+        """Texto legible del email: encabezados, cuerpo y alternativas."""
+        partes = [
+            "\n", SEPARADOR, "\nEMAIL (desde UTF8ConsoleEmailBackend)\n", SEPARADOR, "\n",
+            f"Content-Type: {message.content_subtype or 'text/plain'}; charset=utf-8\n",
+            "MIME-Version: 1.0\n",
+            f"Subject: {message.subject}\n",
+            f"From: {message.from_email}\n",
+            f"To: {', '.join(message.to)}\n",
+            "\n",
+            message.body,
+        ]
+        alternativas = getattr(message, 'alternatives', None)
+        if alternativas:
+            partes += ["\n", SEPARADOR_ALTERNATIVA, "\nALTERNATIVE CONTENT:\n", SEPARADOR_ALTERNATIVA, "\n"]
+            for contenido, mimetype in alternativas:
+                partes += [f"\n[{mimetype}]\n", str(contenido)]
+        partes += ["\n", SEPARADOR, "\n\n"]
+        return ''.join(partes)
+
+
+class MaildirEmailBackend(BaseEmailBackend):
+    """
+    Guarda cada email, tal como se enviaría (MIME completo), como un archivo
+    en el directorio Maildir EMAIL_FILE_PATH (o el argumento file_path).
+    Maildir escribe cada email en tmp/ y lo mueve a new/, así que varios
+    procesos pueden escribir a la vez sin bloquearse.
+    """
+
+    def __init__(self, *args, file_path=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file_path = file_path or getattr(settings, 'EMAIL_FILE_PATH', None)
+        if not self.file_path:
+            raise ImproperlyConfigured('MaildirEmailBackend requiere EMAIL_FILE_PATH.')
+        self._buzon = None
+        self._lock = threading.RLock()
+
+    def open(self):
+        if self._buzon is None:
+            # Maildir solo crea tmp/, new/ y cur/ si el directorio no existe
+            for subdirectorio in ('tmp', 'new', 'cur'):
+                os.makedirs(os.path.join(self.file_path, subdirectorio), exist_ok=True)
+            self._buzon = mailbox.Maildir(self.file_path, create=False)
+            return True
+        return False
+
+    def close(self):
+        self._buzon = None
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        enviados = 0
+        with self._lock:
             try:
-                sys.stdout.write(text)
-            except UnicodeEncodeError:
-                # Si falla, usar replace
-                safe_text = text.encode('utf-8', errors='replace').decode('utf-8', errors='replace')
-                sys.stdout.write(safe_text)
-        
-        safe_write("\n" + "="*70 + "\n")
-        safe_write("EMAIL (desde UTF8ConsoleEmailBackend)\n")
-        safe_write("="*70 + "\n")
-        safe_write(f"Content-Type: {message.content_subtype or 'text/plain'}; charset=utf-8\n")
-        safe_write(f"MIME-Version: 1.0\n")
-        safe_write(f"Subject: {message.subject}\n")
-        safe_write(f"From: {message.from_email}\n")
-        safe_write(f"To: {', '.join(message.to)}\n")
-        safe_write(f"Date: {message.date}\n" if hasattr(message, 'date') and message.date else "")
-        safe_write("\n")
-        
-        # Escribir el body
-        if hasattr(message, 'body'):
-            safe_write(message.body)
-        
-        # Escribir alternatives si existen
-        if hasattr(message, 'alternatives') and message.alternatives:
-            safe_write("\n" + "-"*70 + "\n")
-            safe_write("ALTERNATIVE CONTENT:\n")
-            safe_write("-"*70 + "\n")
-            for content, mimetype in message.alternatives:
-                safe_write(f"\n[{mimetype}]\n")
-                safe_write(str(content))
-        
-        safe_write("\n" + "="*70 + "\n\n")
-        sys.stdout.flush()
-    
-    def _write_email_fallback(self, message):
-        """Escribe información básica del email cuando hay error"""
-        try:
-            print("\n" + "="*70, file=sys.stderr)
-            print("EMAIL (versión simplificada - error de codificación)", file=sys.stderr)
-            print("="*70, file=sys.stderr)
-            print(f"From: {message.from_email}", file=sys.stderr)
-            print(f"To: {', '.join(message.to)}", file=sys.stderr)
-            # Subject sin caracteres especiales
-            safe_subject = message.subject.encode('ascii', errors='replace').decode('ascii')
-            print(f"Subject: {safe_subject}", file=sys.stderr)
-            print(f"Body length: {len(message.body)} caracteres", file=sys.stderr)
-            
-            # Intentar extraer el enlace del body
-            if hasattr(message, 'body') and message.body:
-                url_match = re.search(r'http://[^\s<>"\']+', message.body)
-                if url_match:
-                    print(f"\nENLACE DE RESET (copia esto):", file=sys.stderr)
-                    print(url_match.group(), file=sys.stderr)
-            
-            print("="*70 + "\n", file=sys.stderr)
-        except Exception as e2:
-            logger.error(f"Error incluso en fallback: {e2}")
+                creado = self.open()
+                for message in email_messages:
+                    self._buzon.add(message.message())
+                    enviados += 1
+                if creado:
+                    self.close()
+            except Exception:
+                if not self.fail_silently:
+                    raise
+        return enviados
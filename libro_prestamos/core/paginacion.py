@@ -0,0 +1,199 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+En lugar de COUNT(*) + OFFSET, cada página se pide a partir de los valores de
+orden de la última (o primera) fila vista, en un token opaco y firmado que viaja
+en ?after= / ?before=. Así la página N cuesta lo mismo que la primera.
+
+El queryset debe estar ordenado por campos no nulos y el último campo del orden
+debe ser único (normalmente 'id'), para que el orden sea total.
+"""
+import datetime
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+SALT_CURSOR = 'core.paginacion.cursor'
+
+# Tope del total aproximado: contar más allá de esto cuesta lo mismo que un COUNT(*)
+LIMITE_TOTAL_APROXIMADO = 1000
+
+
+class PaginaCursor:
+    """Una página de resultados con los querystrings para navegar."""
+
+    def __init__(self, object_list, params, param_after, param_before,
+                 cursor_siguiente=None, cursor_anterior=None,
+                 total_aproximado=None, total_es_exacto=True):
+        self.object_list = object_list
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        self.total_aproximado = total_aproximado
+        self.total_es_exacto = total_es_exacto
+        self._params = params
+        self._param_after = param_after
+        self._param_before = param_before
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def _querystring(self, after=None, before=None):
+        params = self._params.copy()
+        params.pop(self._param_after, None)
+        params.pop(self._param_before, None)
+        if after:
+            params[self._param_after] = after
+        if before:
+            params[self._param_before] = before
+        return params.urlencode()
+
+    @property
+    def querystring_siguiente(self):
+        return self._querystring(after=self.cursor_siguiente)
+
+    @property
+    def querystring_anterior(self):
+        return self._querystring(before=self.cursor_anterior)
+
+    @property
+    def querystring_primera(self):
+        return self._querystring()
+
+
+def _campo_de_orden(campo_orden):
+    """Retorna (nombre_campo, es_descendente) para una entrada de order_by."""
+    return campo_orden.lstrip('-'), campo_orden.startswith('-')
+
+
+def codificar_cursor(fila, orden):
+    """Genera el token opaco con los valores de orden de una fila."""
+    valores = []
+    for campo_orden in orden:
+        valor = getattr(fila, _campo_de_orden(campo_orden)[0])
+        if isinstance(valor, (datetime.date, datetime.time)):
+            # isoformat completo: DjangoJSONEncoder trunca a milisegundos
+            valor = valor.isoformat()
+        elif not isinstance(valor, (str, int, float, bool)):
+            valor = str(valor)
+        valores.append(valor)
+    return signing.dumps(valores, salt=SALT_CURSOR, compress=True)
+
+
+def decodificar_cursor(token, queryset, orden):
+    """
+    Retorna los valores de orden guardados en el token, convertidos al tipo
+    de cada campo. Retorna None si el token es inválido o no corresponde al orden.
+    """
+    try:
+        valores = signing.loads(token, salt=SALT_CURSOR)
+    except signing.BadSignature:
+        return None
+    if not isinstance(valores, list) or len(valores) != len(orden):
+        return None
+    convertidos = []
+    for campo_orden, valor in zip(orden, valores):
+        nombre = _campo_de_orden(campo_orden)[0]
+        try:
+            valor = queryset.model._meta.get_field(nombre).to_python(valor)
+        except FieldDoesNotExist:
+            pass  # Anotaciones (ej: relevancia de la búsqueda)
+        except ValidationError:
+            return None
+        convertidos.append(valor)
+    return convertidos
+
+
+def filtro_posterior(orden, valores, hacia_atras=False):
+    """
+    Construye el filtro "filas después de (v1, v2, ...)" en el orden dado
+    (o antes, con hacia_atras=True). La primera condición, no estricta, sobre el
+    primer campo permite que la base de datos resuelva el rango con el índice.
+    """
+    def lookup(descendente, estricto=True):
+        mayor = descendente == hacia_atras
+        return ('gt' if mayor else 'lt') + ('' if estricto else 'e')
+
+    primer_campo, primer_descendente = _campo_de_orden(orden[0])
+    rango = Q(**{f'{primer_campo}__{lookup(primer_descendente, estricto=False)}': valores[0]})
+
+    desempate = Q()
+    iguales = {}
+    for campo_orden, valor in zip(orden, valores):
+        nombre, descendente = _campo_de_orden(campo_orden)
+        desempate |= Q(**iguales, **{f'{nombre}__{lookup(descendente)}': valor})
+        iguales[nombre] = valor
+    return rango & desempate
+
+
+def invertir_orden(orden):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+
+
+def paginar_por_cursor(queryset, params, por_pagina=10, prefijo='', con_total=False):
+    """
+    Pagina un queryset ordenado usando los cursores de `params` (request.GET).
+
+    Args:
+        queryset: QuerySet ya ordenado (el último campo del orden debe ser único)
+        params: QueryDict con los parámetros de la petición
+        por_pagina: Cantidad de filas por página
+        prefijo: Prefijo de los parámetros, para paginar varias listas en una misma página
+        con_total: Si es True, calcula un total acotado a LIMITE_TOTAL_APROXIMADO
+
+    Returns:
+        PaginaCursor
+    """
+    orden = list(queryset.query.order_by)
+    if not orden or _campo_de_orden(orden[-1])[0] not in ('id', 'pk'):
+        raise ValueError("El queryset debe estar ordenado y terminar en 'id'")
+
+    param_after = f'{prefijo}after'
+    param_before = f'{prefijo}before'
+    token_after = params.get(param_after)
+    token_before = params.get(param_before)
+
+    hacia_atras = False
+    filas_qs = queryset
+    if token_before:
+        valores = decodificar_cursor(token_before, queryset, orden)
+        if valores is not None:
+            hacia_atras = True
+            filas_qs = queryset.filter(filtro_posterior(orden, valores, hacia_atras=True))
+            filas_qs = filas_qs.order_by(*invertir_orden(orden))
+    elif token_after:
+        valores = decodificar_cursor(token_after, queryset, orden)
+        if valores is not None:
+            filas_qs = queryset.filter(filtro_posterior(orden, valores))
+
+    # Pedir una fila de más para saber si hay otra página en esa dirección
+    filas = list(filas_qs[:por_pagina + 1])
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+        hay_siguiente, hay_anterior = True, hay_mas
+    else:
+        hay_siguiente, hay_anterior = hay_mas, filas_qs is not queryset
+
+    pagina = PaginaCursor(
+        filas, params, param_after, param_before,
+        cursor_siguiente=codificar_cursor(filas[-1], orden) if filas and hay_siguiente else None,
+        cursor_anterior=codificar_cursor(filas[0], orden) if filas and hay_anterior else None,
+    )
+    if con_total:
+        total = queryset.order_by()[:LIMITE_TOTAL_APROXIMADO + 1].count()
+        pagina.total_es_exacto = total <= LIMITE_TOTAL_APROXIMADO
+        pagina.total_aproximado = min(total, LIMITE_TOTAL_APROXIMADO)
+    return pagina
@@ -0,0 +1,104 @@
+"""
+Servicios compartidos por las páginas generales del sitio.
+Separa la lógica de negocio de las vistas según AGENT.md.
+"""
+from django.contrib.auth.models import User
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from libros.models import Libro
+from prestamos.models import Prestamo
+from usuarios.models import UserStats
+
+
+def _contar(queryset, campo_usuario, filtro=None):
+    """
+    Subconsulta escalar con la cantidad de filas de `queryset` del usuario externo
+    (o de las que cumplen `filtro`), para combinarla con otras en un solo SELECT.
+    """
+    conteo = queryset.filter(**{campo_usuario: OuterRef('pk')}).order_by().values(campo_usuario).annotate(
+        total=Count('id', filter=filtro)
+    ).values('total')
+    return Coalesce(Subquery(conteo, output_field=IntegerField()), 0)
+
+
+def calcular_estadisticas_usuario(usuario):
+    """
+    Calcula los contadores del usuario desde Libro y Prestamo en una sola consulta.
+
+    Args:
+        usuario: Usuario
+
+    Returns:
+        dict: total_libros, libros_disponibles, prestamos_activos, prestamos_recibidos
+    """
+    contadores = {
+        'total_libros': _contar(Libro.objects, 'propietario'),
+        'libros_disponibles': _contar(Libro.objects, 'propietario', Q(estado='disponible')),
+        # Libros que el usuario prestó y aún no se devolvieron
+        'prestamos_activos': _contar(Prestamo.objects.filter(devuelto=False), 'prestador'),
+        # Libros que el usuario recibió prestados
+        'prestamos_recibidos': _contar(Prestamo.objects.filter(devuelto=False), 'prestatario'),
+    }
+    # Prefijo en las anotaciones: algunos nombres coinciden con related_names de User
+    fila = User.objects.filter(pk=usuario.pk).annotate(
+        **{f'estadistica_{nombre}': expresion for nombre, expresion in contadores.items()}
+    ).values_list(*(f'estadistica_{nombre}' for nombre in contadores)).get()
+    return dict(zip(contadores, fila))
+
+
+def recalcular_estadisticas(usuario):
+    """
+    Reconstruye la fila UserStats del usuario a partir de los datos reales.
+
+    Returns:
+        UserStats: Fila actualizada
+    """
+    estadisticas, _ = UserStats.objects.update_or_create(
+        usuario_id=usuario.pk, defaults=calcular_estadisticas_usuario(usuario)
+    )
+    return estadisticas
+
+
+def ajustar_estadisticas(usuario_id, **cambios):
+    """
+    Suma `cambios` (ej: total_libros=1, libros_disponibles=-1) a los contadores
+    del usuario con un UPDATE atómico. Si el usuario todavía no tiene fila no
+    se hace nada: obtener_estadisticas_usuario() la calcula completa al leerla.
+    """
+    cambios = {campo: valor for campo, valor in cambios.items() if valor}
+    if not cambios:
+        return
+    UserStats.objects.filter(usuario_id=usuario_id).update(
+        **{campo: F(campo) + valor for campo, valor in cambios.items()}
+    )
+
+
+def ajustar_estadisticas_varios(campo, cambios_por_usuario):
+    """
+    Suma a `campo` el cambio de cada usuario ({usuario_id: valor}) con un solo
+    UPDATE, para operaciones masivas que afectan a varios usuarios.
+    """
+    cambios_por_usuario = {usuario_id: valor for usuario_id, valor in cambios_por_usuario.items() if valor}
+    if not cambios_por_usuario:
+        return
+    UserStats.objects.filter(usuario_id__in=cambios_por_usuario).update(**{
+        campo: F(campo) + Case(
+            *[When(usuario_id=usuario_id, then=Value(valor)) for usuario_id, valor in cambios_por_usuario.items()],
+            default=Value(0),
+        )
+    })
+
+
+def obtener_estadisticas_usuario(usuario):
+    """
+    Retorna los contadores del panel de inicio leyendo la fila UserStats
+    (una consulta), o calculándola si el usuario todavía no tiene.
+
+    Returns:
+        dict: total_libros, libros_disponibles, prestamos_activos, prestamos_recibidos
+    """
+    fila = UserStats.objects.filter(usuario_id=usuario.pk).values(*UserStats.CONTADORES).first()
+    if fila is None:
+        estadisticas = recalcular_estadisticas(usuario)
+        fila = {campo: getattr(estadisticas, campo) for campo in UserStats.CONTADORES}
+    return fila
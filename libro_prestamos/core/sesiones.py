@@ -0,0 +1,105 @@
+"""
+Invalidación de sesiones ("cerrar sesión en todos los dispositivos") sin
+consultas a la base de datos en cada petición.
+
+Cada usuario tiene una "época" de sesiones: el instante de la última
+invalidación (Perfil.session_invalidated_at) en microsegundos, 0 si nunca
+invalidó. Al iniciar sesión se guarda la época vigente dentro de la sesión;
+una sesión sigue siendo válida mientras su época no sea menor que la del
+usuario. La época del usuario se guarda en la caché, así que el caso común
+(sin invalidaciones nuevas) no consulta Perfil ni django_session.
+
+También se guarda el momento de la autenticación (CLAVE_AUTENTICADO_EN),
+en lugar de estimarlo con expire_date - SESSION_COOKIE_AGE, que falla cuando
+la sesión se renueva. Las sesiones sin época lo usan como época.
+
+Con varios procesos, la caché debe ser compartida (CACHE_URL): con la caché
+en memoria cada proceso ve la invalidación recién cuando vence su copia
+(SESIONES_EPOCA_CACHE_SEGUNDOS).
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from usuarios.models import Perfil
+
+CLAVE_EPOCA_SESION = '_epoca_sesion'
+CLAVE_AUTENTICADO_EN = '_autenticado_en'
+
+
+def _clave_cache(usuario_id):
+    return f'sesiones:epoca:{usuario_id}'
+
+
+def _timeout():
+    return getattr(settings, 'SESIONES_EPOCA_CACHE_SEGUNDOS', 300)
+
+
+def epoca_de(fecha):
+    """Convierte un datetime en época: microsegundos desde 1970 (0 si no hay fecha)."""
+    return int(fecha.timestamp() * 1_000_000) if fecha else 0
+
+
+def fecha_de(epoca):
+    """Inversa de epoca_de: retorna el datetime (UTC) o None."""
+    if not epoca:
+        return None
+    return datetime.datetime.fromtimestamp(epoca / 1_000_000, tz=datetime.timezone.utc)
+
+
+def obtener_epoca_usuario(usuario_id):
+    """Retorna la época de sesiones del usuario; solo consulta Perfil si no está en caché."""
+    clave = _clave_cache(usuario_id)
+    epoca = cache.get(clave)
+    if epoca is None:
+        fecha = Perfil.objects.filter(usuario_id=usuario_id).values_list(
+            'session_invalidated_at', flat=True
+        ).first()
+        epoca = epoca_de(fecha)
+        cache.set(clave, epoca, _timeout())
+    return epoca
+
+
+def registrar_epoca_en_sesion(sender, request, user, **kwargs):
+    """
+    Receptor de user_logged_in: la sesión nueva nace con la época vigente
+    y el momento de la autenticación.
+    """
+    if request is not None and hasattr(request, 'session'):
+        request.session[CLAVE_EPOCA_SESION] = obtener_epoca_usuario(user.pk)
+        request.session[CLAVE_AUTENTICADO_EN] = epoca_de(timezone.now())
+
+
+def fecha_autenticacion(request):
+    """Retorna cuándo se inició la sesión actual (None si no se registró)."""
+    return fecha_de(request.session.get(CLAVE_AUTENTICADO_EN))
+
+
+def sesion_vigente(request):
+    """True si la sesión del usuario autenticado no fue invalidada después de iniciarse."""
+    epoca_sesion = request.session.get(CLAVE_EPOCA_SESION)
+    if epoca_sesion is None:
+        epoca_sesion = request.session.get(CLAVE_AUTENTICADO_EN, 0)
+    return epoca_sesion >= obtener_epoca_usuario(request.user.pk)
+
+
+def invalidar_sesiones(usuario, request=None):
+    """
+    Invalida todas las sesiones del usuario. Si se pasa la petición, la sesión
+    actual adopta la nueva época y sigue activa.
+
+    Returns:
+        datetime: el nuevo session_invalidated_at
+    """
+    ahora = timezone.now()
+    perfil = usuario.perfil
+    perfil.session_invalidated_at = ahora
+    perfil.save(update_fields=['session_invalidated_at'])
+
+    epoca = epoca_de(ahora)
+    cache.set(_clave_cache(usuario.pk), epoca, _timeout())
+    if request is not None:
+        request.session[CLAVE_EPOCA_SESION] = epoca
+    return ahora
@@ -1,37 +1,17 @@
 from django.shortcuts import render
 from libros.models import Libro
-from prestamos.models import Prestamo
+from .services import obtener_estadisticas_usuario
 
 def home(request):
     context = {}
     if request.user.is_authenticated:
-        # Estadísticas del usuario
-        mis_libros = Libro.objects.filter(propietario=request.user)
-        total_libros = mis_libros.count()
-        libros_disponibles = mis_libros.filter(estado='disponible').count()
-        
-        # Préstamos activos (libros que el usuario prestó y aún no se devolvieron)
-        prestamos_activos = Prestamo.objects.filter(
-            prestador=request.user,
-            devuelto=False
-        ).count()
-        
-        # Préstamos recibidos activos (libros que el usuario recibió prestados)
-        prestamos_recibidos = Prestamo.objects.filter(
-            prestatario=request.user,
-            devuelto=False
-        ).count()
+        # Estadísticas del usuario (una sola consulta)
+        context = obtener_estadisticas_usuario(request.user)
         
         # Últimos libros agregados (opcional)
-        ultimos_libros = mis_libros.order_by('-id')[:5]
-        
-        context = {
-            'total_libros': total_libros,
-            'libros_disponibles': libros_disponibles,
-            'prestamos_activos': prestamos_activos,
-            'prestamos_recibidos': prestamos_recibidos,
-            'ultimos_libros': ultimos_libros,
-        }
+        context['ultimos_libros'] = Libro.objects.filter(
+            propietario=request.user
+        ).only('id', 'nombre', 'autor', 'estado').order_by('-id')[:5]
     
     return render(request, 'home.html', context)
 
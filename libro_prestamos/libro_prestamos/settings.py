@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 import environ
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -181,6 +182,51 @@ STATICFILES_DIRS = [
 # En producción, STATIC_ROOT es donde se recopilan todos los archivos estáticos
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Motor de búsqueda del catálogo ('auto' elige según la base de datos, ver libros/search.py)
+LIBROS_SEARCH_BACKEND = env('LIBROS_SEARCH_BACKEND', default='auto')
+
+# Carga masiva: archivos hasta este tamaño se procesan en la misma petición;
+# los más grandes se encolan para el comando procesar_importaciones.
+# En producción se encolan todos, para no acercarse al timeout del servidor
+LIBROS_IMPORTACION_MAX_BYTES_SINCRONO = env.int(
+    'LIBROS_IMPORTACION_MAX_BYTES_SINCRONO', default=32 * 1024 if DEBUG else 0
+)
+
+# Caché (locmem por defecto). Con varios procesos usar una caché compartida,
+# ej: CACHE_URL=redis://127.0.0.1:6379/1, para que cerrar sesión y "cerrar
+# sesión en todos los dispositivos" se vean enseguida en todos (ver core/sesiones.py)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# locmem y dummy no se comparten entre procesos
+CACHE_COMPARTIDA = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Segundos que se cachea la época de sesiones de cada usuario
+SESIONES_EPOCA_CACHE_SEGUNDOS = env.int('SESIONES_EPOCA_CACHE_SEGUNDOS', default=300)
+
+# Sesiones: con una caché compartida, cached_db lee la sesión de la caché y
+# solo va a django_session cuando no está cacheada (las escrituras se guardan
+# en ambas). Sin caché compartida se usa db: cada proceso cachearía su copia
+# de la sesión y un logout en otro proceso no la borraría hasta que venza.
+SESSION_ENGINE = env(
+    'SESSION_ENGINE',
+    default='django.contrib.sessions.backends.cached_db' if CACHE_COMPARTIDA
+    else 'django.contrib.sessions.backends.db',
+)
+if SESSION_ENGINE in (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+) and not CACHE_COMPARTIDA:
+    raise ImproperlyConfigured(
+        f'SESSION_ENGINE={SESSION_ENGINE} necesita una caché compartida en CACHE_URL '
+        '(ej: redis://127.0.0.1:6379/1); con la caché en memoria de cada proceso '
+        'cerrar sesión no se aplica en los demás procesos.'
+    )
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -196,8 +242,13 @@ LOGOUT_REDIRECT_URL = '/'
 # En desarrollo, SIEMPRE usar el backend de consola UTF-8 para evitar problemas de codificación
 # IMPORTANTE: En desarrollo, forzar uso de consola incluso si EMAIL_BACKEND está en .env
 if DEBUG:
-    # Forzar backend de consola UTF-8 en desarrollo
-    EMAIL_BACKEND = 'core.email_backends.UTF8ConsoleEmailBackend'
+    # Forzar backend de consola UTF-8 en desarrollo; con EMAIL_FILE_PATH los
+    # emails se guardan en ese directorio Maildir (ej: pruebas de carga)
+    EMAIL_FILE_PATH = env('EMAIL_FILE_PATH', default='')
+    if EMAIL_FILE_PATH:
+        EMAIL_BACKEND = 'core.email_backends.MaildirEmailBackend'
+    else:
+        EMAIL_BACKEND = 'core.email_backends.UTF8ConsoleEmailBackend'
     # Limpiar para asegurar que no se use SMTP en desarrollo
     EMAIL_HOST_USER = ''
     EMAIL_HOST_PASSWORD = ''
@@ -213,6 +264,17 @@ else:
     EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
     EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
 
+# Los emails de usuarios se encolan en EmailOutbox y los envía el comando
+# enviar_emails. Con envío inmediato (por defecto en desarrollo) se envían
+# al confirmarse la transacción, sin necesidad de correr el worker.
+EMAIL_OUTBOX_ENVIO_INMEDIATO = env.bool('EMAIL_OUTBOX_ENVIO_INMEDIATO', default=DEBUG)
+# Emails enviados por cada conexión SMTP
+EMAIL_LOTE_ENVIO = env.int('EMAIL_LOTE_ENVIO', default=50)
+# Máximo de emails por minuto a un mismo dominio de destino (0: sin límite)
+EMAIL_MAX_POR_DOMINIO_POR_MINUTO = env.int('EMAIL_MAX_POR_DOMINIO_POR_MINUTO', default=0)
+# Espera del primer reintento; se duplica en cada intento fallido
+EMAIL_REINTENTO_SEGUNDOS = env.int('EMAIL_REINTENTO_SEGUNDOS', default=60)
+
 # Configuración común
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default=EMAIL_HOST_USER if not DEBUG else 'noreply@bibliotecacolectiva.com')
 SERVER_EMAIL = DEFAULT_FROM_EMAIL
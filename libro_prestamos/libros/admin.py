@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import Libro
+from .models import Libro, ImportJob
 
 admin.site.register(Libro)
+admin.site.register(ImportJob)
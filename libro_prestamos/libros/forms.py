@@ -15,9 +15,9 @@ class LibroForm(forms.ModelForm):
 
 class CargaMasivaForm(forms.Form):
     archivo_excel = forms.FileField(
-        label='Archivo Excel',
-        help_text='Sube un archivo Excel (.xlsx o .xls) con los libros a cargar',
-        widget=forms.FileInput(attrs={'accept': '.xlsx,.xls'})
+        label='Archivo',
+        help_text='Sube un archivo Excel (.xlsx o .xls), CSV (.csv) u OpenDocument (.ods) con los libros a cargar',
+        widget=forms.FileInput(attrs={'accept': '.xlsx,.xls,.csv,.ods'})
     )
     
     def clean_archivo_excel(self):
@@ -25,8 +25,8 @@ class CargaMasivaForm(forms.Form):
         if archivo:
             # Validar extensión
             nombre = archivo.name.lower()
-            if not (nombre.endswith('.xlsx') or nombre.endswith('.xls')):
-                raise forms.ValidationError('El archivo debe ser un Excel (.xlsx o .xls)')
+            if not nombre.endswith(('.xlsx', '.xls', '.csv', '.ods')):
+                raise forms.ValidationError('El archivo debe ser un Excel (.xlsx o .xls), CSV (.csv) u OpenDocument (.ods)')
             
             # Validar tamaño (5MB máximo)
             if archivo.size > 5 * 1024 * 1024:
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from libros.services import tomar_siguiente_importacion, ejecutar_importacion
+
+
+class Command(BaseCommand):
+    help = 'Procesa las cargas masivas encoladas (worker sin broker externo: la cola es la base de datos).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help='Procesa los trabajos pendientes y termina, en lugar de quedar esperando.'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5,
+            help='Segundos de espera entre consultas cuando la cola está vacía (por defecto 5).'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                job = tomar_siguiente_importacion()
+                if job is None:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+                job = ejecutar_importacion(job)
+                self.stdout.write(
+                    f'Importación {job.id} {job.estado}: {job.creados} creados, '
+                    f'{job.duplicados} duplicados, {job.errores} errores.'
+                )
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido.')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from libros.search import obtener_motor
+
+
+class Command(BaseCommand):
+    help = 'Instala (si hace falta) y reconstruye el índice de búsqueda del catálogo.'
+
+    def handle(self, *args, **options):
+        motor = obtener_motor(verificar=False)
+        motor.instalar()
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice de búsqueda reconstruido con {type(motor).__name__}.'
+        ))
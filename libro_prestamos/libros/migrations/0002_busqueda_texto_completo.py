@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def instalar_indice_busqueda(apps, schema_editor):
+    from libros.search import obtener_motor
+    obtener_motor(schema_editor.connection, verificar=False).instalar(schema_editor.connection)
+
+
+def desinstalar_indice_busqueda(apps, schema_editor):
+    from libros.search import obtener_motor
+    obtener_motor(schema_editor.connection, verificar=False).desinstalar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(instalar_indice_busqueda, desinstalar_indice_busqueda),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def completar_campos_normalizados(apps, schema_editor):
+    from libros.normalizacion import normalizar_campo
+    Libro = apps.get_model('libros', 'Libro')
+    libros = []
+    for libro in Libro.objects.only('id', 'nombre', 'autor').iterator(chunk_size=2000):
+        libro.nombre_normalizado = normalizar_campo(libro.nombre)
+        libro.autor_normalizado = normalizar_campo(libro.autor)
+        libros.append(libro)
+        if len(libros) >= 2000:
+            Libro.objects.bulk_update(libros, ['nombre_normalizado', 'autor_normalizado'])
+            libros = []
+    if libros:
+        Libro.objects.bulk_update(libros, ['nombre_normalizado', 'autor_normalizado'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0002_busqueda_texto_completo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='autor_normalizado',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='nombre_normalizado',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(completar_campos_normalizados, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['nombre_normalizado'], name='libros_nombre_norm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['autor_normalizado'], name='libros_autor_norm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['propietario', 'nombre_normalizado', 'autor_normalizado'], name='libros_duplicado_idx'),
+        ),
+    ]
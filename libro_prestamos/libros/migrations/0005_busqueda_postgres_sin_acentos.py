@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def reinstalar_indice_postgres(apps, schema_editor):
+    """
+    El índice GIN creado por 0002 usaba la configuración 'spanish', que no
+    quita acentos; se recrea con la configuración con unaccent.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    from libros.search import obtener_motor
+    motor = obtener_motor(connection, verificar=False)
+    motor.desinstalar(connection)
+    motor.instalar(connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0004_importjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstalar_indice_postgres, migrations.RunPython.noop),
+    ]
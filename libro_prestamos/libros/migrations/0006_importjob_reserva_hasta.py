@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0005_busqueda_postgres_sin_acentos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='reserva_hasta',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,29 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .normalizacion import LONGITUD_NORMALIZADA, normalizar_campo
+
+
+class LibroQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create no llama a save(): completar aquí las columnas normalizadas
+        objs = list(objs)
+        for libro in objs:
+            libro.actualizar_campos_normalizados()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def para_listado(self):
+        """
+        Trae en una sola consulta los datos que muestra la tarjeta de cada libro,
+        incluyendo propietario y perfil, para evitar una consulta extra por libro.
+        """
+        return self.select_related('propietario__perfil').only(
+            'id', 'nombre', 'autor', 'estado', 'nombre_normalizado',
+            'propietario__id', 'propietario__username',
+            'propietario__perfil__ciudad', 'propietario__perfil__pais',
+        )
+
 
 class Libro(models.Model):
     ESTADOS = [
@@ -14,6 +38,87 @@ class Libro(models.Model):
     propietario = models.ForeignKey(User, on_delete=models.CASCADE)
     estado = models.CharField(max_length=15, choices=ESTADOS, default='disponible')
     descripcion = models.TextField(blank=True, null=True)
-    
+    # Copias normalizadas (sin acentos ni mayúsculas) para búsquedas indexadas
+    nombre_normalizado = models.CharField(max_length=LONGITUD_NORMALIZADA, default='', editable=False)
+    autor_normalizado = models.CharField(max_length=LONGITUD_NORMALIZADA, default='', editable=False)
+
+    objects = LibroQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['nombre_normalizado'], name='libros_nombre_norm_idx'),
+            models.Index(fields=['autor_normalizado'], name='libros_autor_norm_idx'),
+            models.Index(
+                fields=['propietario', 'nombre_normalizado', 'autor_normalizado'],
+                name='libros_duplicado_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.nombre} - {self.autor}"
+
+    def actualizar_campos_normalizados(self):
+        self.nombre_normalizado = normalizar_campo(self.nombre)
+        self.autor_normalizado = normalizar_campo(self.autor)
+
+    def save(self, *args, **kwargs):
+        self.actualizar_campos_normalizados()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'nombre' in update_fields:
+                update_fields.add('nombre_normalizado')
+            if 'autor' in update_fields:
+                update_fields.add('autor_normalizado')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+
+class ImportJob(models.Model):
+    """
+    Carga masiva encolada para procesarse fuera de la petición HTTP.
+    La cola vive en la base de datos: el comando procesar_importaciones toma
+    los trabajos pendientes y va actualizando los contadores de progreso.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='importaciones')
+    nombre_archivo = models.CharField(max_length=255)
+    # El archivo se guarda en la base (máximo 5MB por el formulario) y se vacía al terminar
+    contenido = models.BinaryField(default=b'')
+    estado = models.CharField(max_length=15, choices=ESTADOS, default='pendiente')
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    creados = models.PositiveIntegerField(default=0)
+    duplicados = models.PositiveIntegerField(default=0)
+    errores = models.PositiveIntegerField(default=0)
+    resultados = models.JSONField(null=True, blank=True)
+    mensaje_error = models.TextField(blank=True, default='')
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    # Plazo del proceso que lo está ejecutando; se renueva con cada avance.
+    # Si vence (worker o petición cortados) el trabajo se marca como fallido
+    reserva_hasta = models.DateTimeField(null=True, blank=True)
+    finalizado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['estado', 'creado_en'], name='libros_importjob_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"Importación {self.id} de {self.usuario.username} - {self.estado}"
+
+    @property
+    def terminado(self):
+        return self.estado in ('completado', 'fallido')
+
+    @property
+    def reserva_vencida(self):
+        return self.estado == 'procesando' and (
+            self.reserva_hasta is None or self.reserva_hasta <= timezone.now()
+        )
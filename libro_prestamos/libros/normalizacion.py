@@ -0,0 +1,56 @@
+"""
+Normalización de texto para comparaciones y búsquedas sin acentos ni mayúsculas.
+"""
+import unicodedata
+
+from django.db.models import Q
+
+# Largo de las columnas normalizadas (nombre_normalizado, autor_normalizado)
+LONGITUD_NORMALIZADA = 255
+
+
+def normalizar_texto(texto):
+    """
+    Normaliza un texto para compararlo de forma flexible:
+    minúsculas, sin acentos ni diacríticos (descomposición NFKD) y
+    con los espacios colapsados.
+    """
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto).casefold())
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return ' '.join(texto.split())
+
+
+def normalizar_campo(texto):
+    """
+    Normaliza un texto para guardarlo en una columna normalizada. NFKD y
+    casefold pueden alargar el texto ('ß' -> 'ss', 'ﬃ' -> 'ffi'), así que se
+    recorta al largo de la columna.
+    """
+    return normalizar_texto(texto)[:LONGITUD_NORMALIZADA]
+
+
+def rango_prefijo(prefijo):
+    """
+    Retorna el límite superior exclusivo de las cadenas que empiezan con `prefijo`,
+    para buscar por prefijo con una comparación de rango que aprovecha los índices
+    (LIKE 'x%' no usa el índice en SQLite).
+    """
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+def filtro_prefijo(campo, prefijo):
+    """
+    Condición para buscar por prefijo sobre una columna ya normalizada
+    (o anotada, ej: Lower('username')).
+
+    El rango lo resuelve el índice; el startswith se agrega porque con las
+    collations de Postgres que ignoran la puntuación el rango también
+    incluiría, por ejemplo, 'a.bc' para el prefijo 'ab'.
+    """
+    return Q(**{
+        f'{campo}__gte': prefijo,
+        f'{campo}__lt': rango_prefijo(prefijo),
+        f'{campo}__startswith': prefijo,
+    })
@@ -0,0 +1,280 @@
+"""
+Motores de búsqueda de texto completo para el catálogo de libros.
+
+El motor se elige con el setting LIBROS_SEARCH_BACKEND:
+- 'auto' (por defecto): según la base de datos en uso.
+    - SQLite: tabla virtual FTS5 sincronizada mediante señales.
+    - PostgreSQL: índice GIN sobre un tsvector calculado de las columnas del libro.
+    - Otra base de datos: búsqueda simple sobre las columnas normalizadas.
+- Ruta a una clase (ej: 'libros.search.BusquedaSimple') para forzar un motor.
+
+Si el índice del motor no está instalado (por ejemplo, tests sin migraciones),
+se usa la búsqueda simple para no romper el catálogo.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection as conexion_default
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .normalizacion import normalizar_texto
+
+CAMPOS_INDEXADOS = ('nombre', 'autor', 'editorial', 'isbn', 'descripcion')
+
+
+def extraer_terminos(query):
+    """
+    Extrae las palabras de la búsqueda descartando signos y operadores,
+    para que el texto del usuario nunca se interprete como sintaxis del motor.
+    """
+    return re.findall(r'\w+', query.lower())
+
+
+class BusquedaSimple:
+    """
+    Búsqueda sin índice de texto completo. Nombre y autor se comparan contra
+    las columnas normalizadas, así que no distingue acentos ni mayúsculas.
+    """
+
+    def disponible(self, connection=None):
+        return True
+
+    def buscar(self, libros, query):
+        query_normalizada = normalizar_texto(query)
+        if not query_normalizada:
+            return libros.none()
+        condiciones = (
+            Q(nombre_normalizado__contains=query_normalizada)
+            | Q(autor_normalizado__contains=query_normalizada)
+            | Q(editorial__icontains=query)
+            | Q(descripcion__icontains=query)
+        )
+        # Sin este control, una búsqueda como '-' sería startswith('') y traería todos los libros con ISBN
+        isbn = query.replace('-', '').strip()
+        if isbn:
+            condiciones |= Q(isbn__startswith=isbn)
+        return libros.filter(condiciones)
+
+    def indexar(self, libros, connection=None):
+        pass
+
+    def eliminar(self, ids, connection=None):
+        pass
+
+    def reindexar(self, connection=None):
+        pass
+
+    def instalar(self, connection=None):
+        pass
+
+    def desinstalar(self, connection=None):
+        pass
+
+
+class BusquedaSQLiteFTS(BusquedaSimple):
+    """
+    Búsqueda con una tabla virtual FTS5 cuyo rowid es el id del libro.
+    El tokenizador ignora mayúsculas y acentos, y cada término se busca por prefijo.
+    """
+    tabla = 'libros_libro_fts'
+
+    def __init__(self):
+        self._instalada = {}
+
+    def disponible(self, connection=None):
+        connection = connection or conexion_default
+        if connection.alias not in self._instalada:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                    [self.tabla]
+                )
+                self._instalada[connection.alias] = cursor.fetchone() is not None
+        return self._instalada[connection.alias]
+
+    def olvidar_estado(self):
+        """Fuerza a volver a comprobar si la tabla virtual existe."""
+        self._instalada.clear()
+
+    def buscar(self, libros, query):
+        terminos = extraer_terminos(query)
+        if not terminos:
+            return libros.none()
+        expresion = ' '.join(f'"{termino}"*' for termino in terminos)
+        coincidencias = RawSQL(
+            f"SELECT rowid FROM {self.tabla} WHERE {self.tabla} MATCH %s",
+            [expresion]
+        )
+        relevancia = RawSQL(
+            f"SELECT bm25({self.tabla}) FROM {self.tabla} "
+            f"WHERE {self.tabla} MATCH %s AND rowid = libros_libro.id",
+            [expresion],
+            output_field=FloatField()
+        )
+        # bm25 devuelve valores más bajos para los resultados más relevantes
+        return libros.filter(id__in=coincidencias).annotate(
+            relevancia=relevancia
+        ).order_by('relevancia', 'id')
+
+    def indexar(self, libros, connection=None):
+        connection = connection or conexion_default
+        if not self.disponible(connection):
+            return
+        filas = [
+            [libro.pk] + [getattr(libro, campo) for campo in CAMPOS_INDEXADOS]
+            for libro in libros if libro.pk
+        ]
+        if not filas:
+            return
+        columnas = ', '.join(CAMPOS_INDEXADOS)
+        marcadores = ', '.join(['%s'] * (len(CAMPOS_INDEXADOS) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.tabla} WHERE rowid = %s",
+                [[fila[0]] for fila in filas]
+            )
+            cursor.executemany(
+                f"INSERT INTO {self.tabla} (rowid, {columnas}) VALUES ({marcadores})",
+                filas
+            )
+
+    def eliminar(self, ids, connection=None):
+        connection = connection or conexion_default
+        if not self.disponible(connection):
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.tabla} WHERE rowid = %s",
+                [[libro_id] for libro_id in ids]
+            )
+
+    def reindexar(self, connection=None):
+        connection = connection or conexion_default
+        columnas = ', '.join(CAMPOS_INDEXADOS)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.tabla}")
+            cursor.execute(
+                f"INSERT INTO {self.tabla} (rowid, {columnas}) "
+                f"SELECT id, {columnas} FROM libros_libro"
+            )
+
+    def instalar(self, connection=None):
+        connection = connection or conexion_default
+        columnas = ', '.join(CAMPOS_INDEXADOS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.tabla} USING fts5("
+                f"{columnas}, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        self._instalada[connection.alias] = True
+        self.reindexar(connection)
+
+    def desinstalar(self, connection=None):
+        connection = connection or conexion_default
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.tabla}")
+        self._instalada[connection.alias] = False
+
+
+class BusquedaPostgres(BusquedaSimple):
+    """
+    Búsqueda con un índice GIN sobre to_tsvector. El documento se calcula
+    con la misma expresión en el índice y en la consulta para que Postgres
+    pueda usar el índice; no hace falta sincronizar nada al guardar.
+
+    La configuración de texto es una copia de 'spanish' que pasa cada palabra
+    por unaccent antes de la raíz, así que "garcia marquez" encuentra
+    "García Márquez" (requiere la extensión unaccent, incluida en Postgres).
+    """
+    indice = 'libros_libro_busqueda_gin'
+    configuracion = 'libros_spanish_unaccent'
+
+    def documento(self, tabla=''):
+        prefijo = f'"{tabla}".' if tabla else ''
+        partes = " || ' ' || ".join(
+            f"coalesce({prefijo}\"{campo}\", '')" for campo in CAMPOS_INDEXADOS
+        )
+        return f"to_tsvector('{self.configuracion}'::regconfig, {partes})"
+
+    def disponible(self, connection=None):
+        return True
+
+    def buscar(self, libros, query):
+        terminos = extraer_terminos(query)
+        if not terminos:
+            return libros.none()
+        consulta = ' & '.join(f'{termino}:*' for termino in terminos)
+        documento = self.documento(tabla='libros_libro')
+        tsquery = f"to_tsquery('{self.configuracion}'::regconfig, %s)"
+        return libros.filter(
+            RawSQL(f"{documento} @@ {tsquery}", [consulta], output_field=BooleanField())
+        ).annotate(
+            relevancia=RawSQL(f"ts_rank({documento}, {tsquery})", [consulta], output_field=FloatField())
+        ).order_by('-relevancia', 'id')
+
+    def instalar(self, connection=None):
+        connection = connection or conexion_default
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+            cursor.execute(
+                "DO $$ BEGIN "
+                f"IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{self.configuracion}') THEN "
+                f"CREATE TEXT SEARCH CONFIGURATION {self.configuracion} (COPY = spanish); "
+                f"ALTER TEXT SEARCH CONFIGURATION {self.configuracion} "
+                "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem; "
+                "END IF; END $$"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.indice} "
+                f"ON libros_libro USING GIN ({self.documento()})"
+            )
+
+    def desinstalar(self, connection=None):
+        connection = connection or conexion_default
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {self.indice}")
+            cursor.execute(f"DROP TEXT SEARCH CONFIGURATION IF EXISTS {self.configuracion}")
+
+
+MOTORES_POR_BASE_DE_DATOS = {
+    'sqlite': 'libros.search.BusquedaSQLiteFTS',
+    'postgresql': 'libros.search.BusquedaPostgres',
+}
+
+
+@lru_cache(maxsize=None)
+def _crear_motor(ruta):
+    return import_string(ruta)()
+
+
+def obtener_motor(connection=None, verificar=True):
+    """
+    Retorna el motor configurado para la conexión.
+    Con verificar=True, cae a BusquedaSimple si el índice no está instalado.
+    """
+    connection = connection or conexion_default
+    ruta = getattr(settings, 'LIBROS_SEARCH_BACKEND', 'auto')
+    if ruta == 'auto':
+        ruta = MOTORES_POR_BASE_DE_DATOS.get(connection.vendor, 'libros.search.BusquedaSimple')
+    motor = _crear_motor(ruta)
+    if verificar and not motor.disponible(connection):
+        return _crear_motor('libros.search.BusquedaSimple')
+    return motor
+
+
+def buscar_libros(libros, query):
+    """Filtra el queryset de libros por la búsqueda y lo ordena por relevancia."""
+    return obtener_motor().buscar(libros, query)
+
+
+def indexar_libros(libros):
+    """Agrega o actualiza los libros en el índice de búsqueda."""
+    obtener_motor().indexar(libros)
+
+
+def eliminar_libros_del_indice(ids):
+    """Quita del índice de búsqueda los libros con esos ids."""
+    obtener_motor().eliminar(ids)
@@ -0,0 +1,146 @@
+"""
+Servicios para la carga masiva de libros en segundo plano.
+Separa la lógica de negocio de las vistas según AGENT.md.
+"""
+from datetime import timedelta
+from io import BytesIO
+import logging
+import traceback
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ImportJob
+from .utils import procesar_archivo_libros
+
+logger = logging.getLogger(__name__)
+
+# Plazo de un trabajo reclamado; cada bloque procesado lo renueva. Si vence
+# (worker caído o petición cortada por timeout) el trabajo se marca fallido
+SEGUNDOS_RESERVA = 300
+MENSAJE_INTERRUMPIDA = (
+    'La importación se interrumpió antes de terminar. Los libros ya creados se '
+    'conservan; vuelve a subir el archivo para cargar el resto.'
+)
+
+
+def contadores_importacion(resultados):
+    """Retorna los contadores de progreso de un ImportJob a partir de los resultados."""
+    return {
+        'filas_procesadas': resultados['total_procesado'],
+        'creados': resultados['total_creados'],
+        'duplicados': resultados['total_duplicados'],
+        'errores': resultados['total_errores'],
+    }
+
+
+def encolar_importacion(archivo, usuario):
+    """
+    Guarda el archivo subido como un trabajo pendiente.
+
+    Args:
+        archivo: Archivo subido (Excel, CSV u ODS)
+        usuario: Usuario que será propietario de los libros
+
+    Returns:
+        ImportJob: Trabajo creado en estado 'pendiente'
+    """
+    return ImportJob.objects.create(
+        usuario=usuario,
+        nombre_archivo=archivo.name,
+        contenido=archivo.read(),
+    )
+
+
+def reclamar_importacion(job_id):
+    """
+    Marca un trabajo pendiente como 'procesando' y le asigna una reserva.
+    El UPDATE condicional garantiza que dos workers no tomen el mismo trabajo.
+
+    Returns:
+        bool: True si este proceso obtuvo el trabajo
+    """
+    ahora = timezone.now()
+    return ImportJob.objects.filter(id=job_id, estado='pendiente').update(
+        estado='procesando',
+        iniciado_en=ahora,
+        reserva_hasta=ahora + timedelta(seconds=SEGUNDOS_RESERVA),
+    ) == 1
+
+
+def fallar_importaciones_vencidas(**filtros):
+    """
+    Marca como fallidos los trabajos 'procesando' con la reserva vencida.
+    No se vuelven a ejecutar: parte del archivo ya pudo haberse cargado.
+
+    Returns:
+        int: Cantidad de trabajos marcados
+    """
+    ahora = timezone.now()
+    return ImportJob.objects.filter(
+        Q(reserva_hasta__lte=ahora) | Q(reserva_hasta__isnull=True),
+        estado='procesando', **filtros
+    ).update(
+        estado='fallido',
+        mensaje_error=MENSAJE_INTERRUMPIDA,
+        contenido=b'',
+        finalizado_en=ahora,
+    )
+
+
+def tomar_siguiente_importacion():
+    """
+    Reclama el trabajo pendiente más antiguo, después de dar por fallidos
+    los trabajos con la reserva vencida.
+
+    Returns:
+        ImportJob o None si no hay trabajos pendientes
+    """
+    fallar_importaciones_vencidas()
+    while True:
+        job_id = ImportJob.objects.filter(estado='pendiente').order_by(
+            'creado_en', 'id'
+        ).values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        if reclamar_importacion(job_id):
+            return ImportJob.objects.select_related('usuario').get(id=job_id)
+
+
+def ejecutar_importacion(job):
+    """
+    Procesa un trabajo ya reclamado, guardando el progreso a medida que avanza.
+
+    Args:
+        job: ImportJob en estado 'procesando'
+
+    Returns:
+        ImportJob: Trabajo terminado ('completado' o 'fallido')
+    """
+    def guardar_progreso(resultados):
+        ImportJob.objects.filter(id=job.id, estado='procesando').update(
+            reserva_hasta=timezone.now() + timedelta(seconds=SEGUNDOS_RESERVA),
+            **contadores_importacion(resultados)
+        )
+
+    try:
+        resultados = procesar_archivo_libros(
+            BytesIO(bytes(job.contenido)), job.nombre_archivo, job.usuario,
+            progreso=guardar_progreso
+        )
+    except Exception as e:
+        logger.error(f"Error al procesar la importación {job.id}: {e}")
+        logger.error(traceback.format_exc())
+        job.estado = 'fallido'
+        job.mensaje_error = str(e)
+    else:
+        for campo, valor in contadores_importacion(resultados).items():
+            setattr(job, campo, valor)
+        job.resultados = resultados
+        job.estado = 'completado'
+
+    job.contenido = b''
+    job.reserva_hasta = None
+    job.finalizado_en = timezone.now()
+    job.save()
+    return job
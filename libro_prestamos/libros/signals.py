@@ -0,0 +1,42 @@
+"""
+Señales que mantienen sincronizados con los libros el índice de búsqueda
+y los contadores de UserStats.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.services import ajustar_estadisticas
+from .models import Libro
+from .search import indexar_libros, eliminar_libros_del_indice
+
+
+@receiver(post_save, sender=Libro)
+def indexar_libro_guardado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    indexar_libros([instance])
+
+
+@receiver(post_delete, sender=Libro)
+def eliminar_libro_del_indice(sender, instance, **kwargs):
+    eliminar_libros_del_indice([instance.pk])
+
+
+@receiver(post_save, sender=Libro)
+def contar_libro_creado(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not created:
+        return
+    ajustar_estadisticas(
+        instance.propietario_id,
+        total_libros=1,
+        libros_disponibles=1 if instance.estado == 'disponible' else 0,
+    )
+
+
+@receiver(post_delete, sender=Libro)
+def descontar_libro_eliminado(sender, instance, **kwargs):
+    ajustar_estadisticas(
+        instance.propietario_id,
+        total_libros=-1,
+        libros_disponibles=-1 if instance.estado == 'disponible' else 0,
+    )
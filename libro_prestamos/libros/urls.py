@@ -4,8 +4,12 @@ from . import views
 urlpatterns = [
     path('', views.listar_libros, name='listar_libros'),
     path('my', views.listar_mis_libros, name='listar_mis_libros'),
+    path('exportar/<str:formato>/', views.exportar_catalogo, name='exportar_catalogo'),
+    path('my/exportar/<str:formato>/', views.exportar_mis_libros, name='exportar_mis_libros'),
     path('cargar/', views.cargar_libro, name='cargar_libro'),
     path('cargar-masivo/', views.cargar_libros_masivo, name='cargar_libros_masivo'),
+    path('importaciones/<int:id>/', views.estado_importacion, name='estado_importacion'),
+    path('importaciones/<int:id>/progreso/', views.progreso_importacion, name='progreso_importacion'),
     path('descargar-plantilla/', views.descargar_plantilla_excel, name='descargar_plantilla_excel'),
     path('ver/<int:id>/', views.libro_detalle, name='libro_detalle'),
     path('<int:id>/editar/', views.editar_libro, name='editar_libro'),
@@ -1,34 +1,36 @@
 """
 Utilidades para el procesamiento de archivos Excel y carga masiva de libros.
 """
+import csv
+import hashlib
+import os
+import tempfile
+import zipfile
+from functools import lru_cache
+from itertools import islice
+from xml.etree.ElementTree import iterparse
 import openpyxl
-from openpyxl import load_workbook
-from io import BytesIO
+from openpyxl import load_workbook, Workbook
+from openpyxl.styles import Font, PatternFill
+from io import BytesIO, TextIOWrapper
+from django.db import IntegrityError, transaction
+from core.services import ajustar_estadisticas
 from .models import Libro
+from .normalizacion import normalizar_campo, normalizar_texto
+from .search import indexar_libros
 
 
 def normalizar_nombre_columna(nombre):
     """
     Normaliza el nombre de una columna para hacer comparaciones flexibles.
-    Elimina espacios, convierte a minúsculas y normaliza acentos básicos.
+    Elimina espacios, convierte a minúsculas y quita acentos.
     """
-    if not nombre:
-        return ''
-    # Convertir a minúsculas y eliminar espacios
-    nombre = str(nombre).lower().strip()
-    # Normalizar acentos básicos
-    reemplazos = {
-        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-        'ñ': 'n'
-    }
-    for old, new in reemplazos.items():
-        nombre = nombre.replace(old, new)
-    return nombre
+    return normalizar_texto(nombre)
 
 
-def encontrar_indices_columnas(worksheet):
+def encontrar_indices_columnas(encabezados):
     """
-    Encuentra los índices de las columnas requeridas en la primera fila.
+    Encuentra los índices de las columnas requeridas en la fila de encabezados.
     Retorna un diccionario con los índices encontrados.
     """
     indices = {
@@ -39,11 +41,8 @@ def encontrar_indices_columnas(worksheet):
         'descripcion': None
     }
     
-    # Leer primera fila
-    primera_fila = [cell.value for cell in worksheet[1]]
-    
     # Buscar columnas (case-insensitive y flexible)
-    for idx, valor in enumerate(primera_fila, start=1):
+    for idx, valor in enumerate(encabezados, start=1):
         if valor is None:
             continue
         valor_normalizado = normalizar_nombre_columna(valor)
@@ -63,10 +62,17 @@ def encontrar_indices_columnas(worksheet):
     return indices
 
 
+def _valor_columna(fila, indice):
+    """Retorna el valor de la columna (índice desde 1) o None si la fila es más corta."""
+    if indice is None or indice > len(fila):
+        return None
+    return fila[indice - 1]
+
+
 def validar_fila_libro(fila, indices, numero_fila):
     """
-    Valida una fila de datos y retorna un diccionario con los datos validados
-    o un error si la validación falla.
+    Valida una fila de datos (tupla de valores) y retorna un diccionario con
+    los datos validados o un error si la validación falla.
     """
     errores = []
     datos = {}
@@ -76,9 +82,9 @@ def validar_fila_libro(fila, indices, numero_fila):
     autor = None
     
     if indices['nombre']:
-        nombre = fila[indices['nombre'] - 1].value if fila[indices['nombre'] - 1].value else None
+        nombre = _valor_columna(fila, indices['nombre']) or None
     if indices['autor']:
-        autor = fila[indices['autor'] - 1].value if fila[indices['autor'] - 1].value else None
+        autor = _valor_columna(fila, indices['autor']) or None
     
     # Validar que nombre y autor existan
     if not nombre or (isinstance(nombre, str) and not nombre.strip()):
@@ -101,7 +107,7 @@ def validar_fila_libro(fila, indices, numero_fila):
     
     # Campos opcionales
     if indices['editorial']:
-        editorial = fila[indices['editorial'] - 1].value
+        editorial = _valor_columna(fila, indices['editorial'])
         if editorial:
             editorial = str(editorial).strip()
             if len(editorial) > 255:
@@ -110,7 +116,7 @@ def validar_fila_libro(fila, indices, numero_fila):
                 datos['editorial'] = editorial
     
     if indices['isbn']:
-        isbn = fila[indices['isbn'] - 1].value
+        isbn = _valor_columna(fila, indices['isbn'])
         if isbn:
             isbn = str(isbn).strip()
             # Limpiar guiones y espacios del ISBN
@@ -121,7 +127,7 @@ def validar_fila_libro(fila, indices, numero_fila):
                 datos['isbn'] = isbn
     
     if indices['descripcion']:
-        descripcion = fila[indices['descripcion'] - 1].value
+        descripcion = _valor_columna(fila, indices['descripcion'])
         if descripcion:
             datos['descripcion'] = str(descripcion).strip()
     
@@ -131,150 +137,421 @@ def validar_fila_libro(fila, indices, numero_fila):
     return {'datos': datos}
 
 
-def es_duplicado(datos_libro, usuario):
+class DetectorDuplicados:
     """
-    Verifica si un libro es duplicado comparando con los libros existentes del usuario.
-    Primero verifica por ISBN, luego por nombre+autor.
+    Detecta libros duplicados en memoria durante una carga masiva.
+
+    Carga una sola vez las claves nombre+autor normalizadas de los libros del
+    usuario, y registra cada libro aceptado del archivo para detectar también
+    las filas repetidas dentro del mismo archivo.
+
+    Los ISBN son únicos en toda la base (no por usuario), así que se buscan
+    entre los libros de todos los propietarios; precargar_isbns() los consulta
+    por lote con un solo IN, en lugar de uno por fila.
     """
-    # Verificar por ISBN si existe
-    if datos_libro.get('isbn'):
-        existe = Libro.objects.filter(
-            propietario=usuario,
-            isbn=datos_libro['isbn']
-        ).exists()
-        if existe:
-            return True, 'ISBN'
-    
-    # Verificar por nombre y autor (case-insensitive)
-    existe = Libro.objects.filter(
-        propietario=usuario,
-        nombre__iexact=datos_libro['nombre'],
-        autor__iexact=datos_libro['autor']
-    ).exists()
-    
-    if existe:
-        return True, 'Nombre+Autor'
-    
-    return False, None
 
+    def __init__(self, usuario):
+        self.usuario_id = usuario.pk
+        # ISBN ya consultado -> id del propietario del libro que lo tiene (None si está libre)
+        self.propietarios_isbn = {}
+        self.claves_existentes = set()
+        self.isbns_archivo = set()
+        self.claves_archivo = set()
+        claves_usuario = Libro.objects.filter(propietario=usuario).values_list(
+            'nombre_normalizado', 'autor_normalizado'
+        )
+        for clave in claves_usuario.iterator():
+            self.claves_existentes.add(clave)
+
+    @staticmethod
+    def clave(datos_libro):
+        return (normalizar_campo(datos_libro['nombre']), normalizar_campo(datos_libro['autor']))
+
+    def precargar_isbns(self, isbns):
+        """Consulta a quién pertenecen los ISBN todavía no consultados, en tandas de TAMANIO_LOTE."""
+        pendientes = list({isbn for isbn in isbns if isbn and isbn not in self.propietarios_isbn})
+        for inicio in range(0, len(pendientes), TAMANIO_LOTE):
+            tanda = pendientes[inicio:inicio + TAMANIO_LOTE]
+            self.propietarios_isbn.update(dict.fromkeys(tanda))
+            self.propietarios_isbn.update(
+                Libro.objects.filter(isbn__in=tanda).values_list('isbn', 'propietario_id')
+            )
+
+    def es_duplicado(self, datos_libro):
+        """
+        Verifica si un libro es duplicado. Primero verifica por ISBN, luego por nombre+autor
+        (sin distinguir mayúsculas ni acentos).
+        Retorna (True, tipo) o (False, None).
+        """
+        isbn = datos_libro.get('isbn')
+        if isbn:
+            if isbn not in self.propietarios_isbn:
+                self.precargar_isbns([isbn])
+            propietario_id = self.propietarios_isbn[isbn]
+            if propietario_id == self.usuario_id:
+                return True, 'ISBN'
+            if propietario_id is not None:
+                return True, 'ISBN (registrado por otro usuario)'
+            if isbn in self.isbns_archivo:
+                return True, 'ISBN (repetido en el archivo)'
+
+        clave = self.clave(datos_libro)
+        if clave in self.claves_existentes:
+            return True, 'Nombre+Autor'
+        if clave in self.claves_archivo:
+            return True, 'Nombre+Autor (repetido en el archivo)'
+
+        return False, None
+
+    def registrar(self, datos_libro):
+        """Registra un libro aceptado del archivo para detectar repeticiones posteriores."""
+        if datos_libro.get('isbn'):
+            self.isbns_archivo.add(datos_libro['isbn'])
+        self.claves_archivo.add(self.clave(datos_libro))
+
+
+# Cada cuántas filas se informa el progreso durante una carga masiva
+FILAS_POR_PROGRESO = 100
 
-def procesar_excel_libros(archivo, usuario):
+# Cantidad de libros por cada bulk_create
+TAMANIO_LOTE = 500
+
+# Máximo de filas detalladas por tipo de resultado; el resto solo se cuenta
+MAX_DETALLES_RESULTADO = 100
+
+
+def nuevos_resultados():
     """
-    Procesa un archivo Excel y retorna los resultados de la carga masiva.
-    
-    Retorna un diccionario con:
-    - libros_creados: lista de libros creados exitosamente
-    - duplicados: lista de libros duplicados (no creados)
-    - errores: lista de errores por fila
-    - total_procesado: número total de filas procesadas
+    Retorna el resumen vacío de una carga masiva.
+
+    Los totales cuentan todas las filas; las listas guardan el detalle de
+    hasta MAX_DETALLES_RESULTADO filas por tipo, para que el resumen ocupe
+    lo mismo sin importar el tamaño del archivo.
     """
-    resultados = {
+    return {
         'libros_creados': [],
         'duplicados': [],
         'errores': [],
-        'total_procesado': 0
+        'total_procesado': 0,
+        'total_creados': 0,
+        'total_duplicados': 0,
+        'total_errores': 0,
     }
+
+
+def registrar_resultado(resultados, tipo, detalle):
+    """Cuenta una fila en el resumen y guarda su detalle si todavía hay lugar."""
+    resultados[f'total_{tipo}'] += 1
+    lista = resultados['libros_creados' if tipo == 'creados' else tipo]
+    if len(lista) < MAX_DETALLES_RESULTADO:
+        lista.append(detalle)
+
+
+def leer_filas_excel(archivo):
+    """
+    Generador con las filas de la hoja activa como tuplas de valores.
+    Usa el modo read_only de openpyxl, que no carga la hoja completa en memoria.
+    """
+    workbook = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+# Bytes que se leen para detectar la codificación y el separador de un CSV
+MUESTRA_CSV = 64 * 1024
+
+SEPARADORES_CSV = ',;\t|'
+
+
+def leer_filas_csv(archivo):
+    """
+    Generador con las filas de un CSV como tuplas de valores, leído en streaming
+    con el módulo csv. Acepta UTF-8 (con o sin BOM) o, si no decodifica, Latin-1;
+    el separador (coma, punto y coma, tabulador o barra) se detecta con la muestra.
+    """
+    muestra = archivo.read(MUESTRA_CSV)
+    archivo.seek(0)
+    try:
+        # Una secuencia multibyte puede quedar cortada al final de la muestra
+        muestra.decode('utf-8')
+        codificacion = 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        truncada = len(muestra) == MUESTRA_CSV and e.start >= len(muestra) - 3
+        codificacion = 'utf-8-sig' if truncada else 'latin-1'
+    texto_muestra = muestra.decode(codificacion, errors='ignore')
+    try:
+        dialecto = csv.Sniffer().sniff(texto_muestra, delimiters=SEPARADORES_CSV)
+    except csv.Error:
+        dialecto = csv.excel
+
+    texto = TextIOWrapper(archivo, encoding=codificacion, errors='replace', newline='')
+    try:
+        for fila in csv.reader(texto, dialecto):
+            yield tuple(valor or None for valor in fila)
+    finally:
+        # Evitar que cerrar el wrapper cierre el archivo original (si no se cerró ya)
+        if not texto.closed:
+            texto.detach()
+
+
+# Espacios de nombres de OpenDocument
+NS_TABLE = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+NS_TEXT = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+NS_OFFICE = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+
+
+def _texto_celda_ods(celda):
+    """Retorna el valor de una celda ODS (el texto de sus párrafos) o None si está vacía."""
+    parrafos = celda.findall(f'{{{NS_TEXT}}}p')
+    if not parrafos:
+        return celda.get(f'{{{NS_OFFICE}}}value')
+    return '\n'.join(''.join(parrafo.itertext()) for parrafo in parrafos) or None
+
+
+def leer_filas_ods(archivo):
+    """
+    Generador con las filas de la primera hoja de un ODS como tuplas de valores.
+    Recorre content.xml con iterparse liberando cada fila ya leída, así que no
+    carga el documento completo (ni necesita dependencias externas).
+    """
+    etiqueta_tabla = f'{{{NS_TABLE}}}table'
+    etiqueta_fila = f'{{{NS_TABLE}}}table-row'
+    etiquetas_celda = (f'{{{NS_TABLE}}}table-cell', f'{{{NS_TABLE}}}covered-table-cell')
+    repeticiones = f'{{{NS_TABLE}}}number-columns-repeated'
+    repeticiones_fila = f'{{{NS_TABLE}}}number-rows-repeated'
+
+    with zipfile.ZipFile(archivo) as documento, documento.open('content.xml') as contenido:
+        # Pila de elementos abiertos, para quitar cada fila de su padre una vez leída
+        abiertos = []
+        for evento, elemento in iterparse(contenido, events=('start', 'end')):
+            if evento == 'start':
+                abiertos.append(elemento)
+                continue
+            abiertos.pop()
+            if elemento.tag == etiqueta_tabla:
+                # Solo la primera hoja
+                return
+            if elemento.tag != etiqueta_fila:
+                continue
+            fila = []
+            for celda in elemento:
+                if celda.tag in etiquetas_celda:
+                    valor = _texto_celda_ods(celda)
+                    fila.extend([valor] * int(celda.get(repeticiones, 1)))
+            filas_repetidas = int(elemento.get(repeticiones_fila, 1))
+            elemento.clear()
+            if abiertos:
+                abiertos[-1].remove(elemento)
+            # Las celdas vacías del final suelen venir como una repetición enorme
+            while fila and fila[-1] is None:
+                fila.pop()
+            if not fila:
+                # Filas vacías (o el relleno repetido hasta el final de la hoja)
+                continue
+            for _ in range(filas_repetidas):
+                yield tuple(fila)
+
+
+def validar_filas(filas, indices, resultados, progreso=None):
+    """
+    Generador que valida cada fila de datos y produce (numero_fila, datos)
+    para las filas válidas. Las filas inválidas se registran como errores.
+    Si se indica `progreso`, se llama con el resumen parcial cada
+    FILAS_POR_PROGRESO filas.
+    """
+    # La fila 1 es el encabezado
+    for numero_fila, fila in enumerate(filas, start=2):
+        resultados['total_procesado'] += 1
+        if progreso and resultados['total_procesado'] % FILAS_POR_PROGRESO == 0:
+            progreso(resultados)
+        validacion = validar_fila_libro(fila, indices, numero_fila)
+        if 'error' in validacion:
+            registrar_resultado(resultados, 'errores', {
+                'fila': numero_fila,
+                'mensaje': validacion['error']
+            })
+            continue
+        yield numero_fila, validacion['datos']
+
+
+def descartar_duplicados(filas_validas, detector, resultados):
+    """
+    Generador que descarta los libros duplicados y produce (numero_fila, datos)
+    de los libros a crear. Las filas se revisan en tandas de TAMANIO_LOTE para
+    consultar los ISBN de cada tanda con una sola consulta.
+    """
+    filas_validas = iter(filas_validas)
+    while tanda := list(islice(filas_validas, TAMANIO_LOTE)):
+        detector.precargar_isbns(datos.get('isbn') for _, datos in tanda)
+        for numero_fila, datos in tanda:
+            es_dup, tipo_dup = detector.es_duplicado(datos)
+            if es_dup:
+                registrar_resultado(resultados, 'duplicados', {
+                    'fila': numero_fila,
+                    'libro': f"{datos['nombre']} - {datos['autor']}",
+                    'tipo': tipo_dup
+                })
+                continue
+            detector.registrar(datos)
+            yield numero_fila, datos
+
+
+def _guardar_libros(libros, usuario):
+    """Guarda los libros con un bulk_create en su propia transacción y retorna los creados."""
+    with transaction.atomic():
+        libros_creados = Libro.objects.bulk_create(libros)
+        # bulk_create no dispara señales: indexar y contar explícitamente
+        indexar_libros(libros_creados)
+        ajustar_estadisticas(
+            usuario.pk, total_libros=len(libros_creados), libros_disponibles=len(libros_creados)
+        )
+    return libros_creados
+
+
+def crear_libros_en_lotes(filas_libros, usuario, resultados):
+    """
+    Crea los libros con un bulk_create, en su propia transacción, cada
+    TAMANIO_LOTE libros.
+
+    Si un lote falla por una restricción de la base (ej: otra carga registró el
+    mismo ISBN después de la detección de duplicados), ese lote se guarda fila
+    por fila: las filas en conflicto se informan como errores y el resto del
+    archivo se sigue procesando.
+    """
+    lote = []
+
+    def guardar_lote():
+        try:
+            libros_creados = _guardar_libros([libro for _, libro in lote], usuario)
+        except IntegrityError:
+            libros_creados = []
+            for numero_fila, libro in lote:
+                try:
+                    libros_creados += _guardar_libros([libro], usuario)
+                except IntegrityError:
+                    motivo = f"el ISBN {libro.isbn} ya está registrado" if libro.isbn else "no se pudo guardar el libro"
+                    registrar_resultado(resultados, 'errores', {
+                        'fila': numero_fila,
+                        'mensaje': f"Fila {numero_fila}: {motivo}"
+                    })
+        for libro in libros_creados:
+            registrar_resultado(resultados, 'creados', {'nombre': libro.nombre, 'autor': libro.autor})
+        lote.clear()
+
+    for numero_fila, datos in filas_libros:
+        lote.append((numero_fila, Libro(propietario=usuario, estado='disponible', **datos)))
+        if len(lote) >= TAMANIO_LOTE:
+            guardar_lote()
+
+    if lote:
+        guardar_lote()
+
+
+def procesar_filas_libros(filas, usuario, progreso=None):
+    """
+    Procesa las filas de un archivo de carga masiva (la primera es el encabezado).
+    Las filas se leen, validan, deduplican y guardan en lotes a medida que
+    llegan, así que la memoria no crece con el tamaño del archivo.
+    
+    Retorna el resumen de nuevos_resultados().
+    """
+    resultados = nuevos_resultados()
     
     try:
-        # Leer el archivo Excel
-        workbook = load_workbook(archivo, read_only=True, data_only=True)
-        worksheet = workbook.active
+        filas = iter(filas)
+        encabezados = next(filas, ())
         
         # Encontrar índices de columnas
-        indices = encontrar_indices_columnas(worksheet)
+        indices = encontrar_indices_columnas(encabezados)
         
         # Validar que se encontraron las columnas obligatorias
         if indices['nombre'] is None or indices['autor'] is None:
-            resultados['errores'].append({
+            registrar_resultado(resultados, 'errores', {
                 'fila': 0,
                 'mensaje': 'No se encontraron las columnas obligatorias "Nombre" y "Autor" en la primera fila'
             })
             return resultados
         
-        # Procesar filas (empezando desde la fila 2, ya que la 1 es encabezado)
-        libros_a_crear = []
-        
-        for row_num, fila in enumerate(worksheet.iter_rows(min_row=2), start=2):
-            resultados['total_procesado'] += 1
-            
-            # Validar fila
-            validacion = validar_fila_libro(fila, indices, row_num)
-            
-            if 'error' in validacion:
-                resultados['errores'].append({
-                    'fila': row_num,
-                    'mensaje': validacion['error']
-                })
-                continue
-            
-            datos = validacion['datos']
-            
-            # Verificar duplicados
-            es_dup, tipo_dup = es_duplicado(datos, usuario)
-            if es_dup:
-                resultados['duplicados'].append({
-                    'fila': row_num,
-                    'libro': f"{datos['nombre']} - {datos['autor']}",
-                    'tipo': tipo_dup
-                })
-                continue
-            
-            # Preparar libro para crear
-            libro_data = {
-                'nombre': datos['nombre'],
-                'autor': datos['autor'],
-                'propietario': usuario,
-                'estado': 'disponible'
-            }
-            
-            if 'editorial' in datos:
-                libro_data['editorial'] = datos['editorial']
-            if 'isbn' in datos:
-                libro_data['isbn'] = datos['isbn']
-            if 'descripcion' in datos:
-                libro_data['descripcion'] = datos['descripcion']
-            
-            libros_a_crear.append(Libro(**libro_data))
-        
-        # Crear libros en lote usando bulk_create
-        if libros_a_crear:
-            libros_creados = Libro.objects.bulk_create(libros_a_crear)
-            resultados['libros_creados'] = [
-                {'nombre': libro.nombre, 'autor': libro.autor}
-                for libro in libros_creados
-            ]
-        
-        workbook.close()
+        detector = DetectorDuplicados(usuario)
+        filas_validas = validar_filas(filas, indices, resultados, progreso=progreso)
+        filas_libros = descartar_duplicados(filas_validas, detector, resultados)
+        crear_libros_en_lotes(filas_libros, usuario, resultados)
         
     except Exception as e:
-        resultados['errores'].append({
+        registrar_resultado(resultados, 'errores', {
             'fila': 0,
             'mensaje': f'Error al procesar el archivo: {str(e)}'
         })
+    finally:
+        # Cerrar el lector ahora y no cuando lo recolecte el GC, con el archivo ya cerrado
+        if hasattr(filas, 'close'):
+            filas.close()
     
     return resultados
 
 
+def procesar_excel_libros(archivo, usuario, progreso=None):
+    """
+    Procesa un archivo Excel y retorna el resumen de la carga masiva.
+    Si se indica `progreso`, se llama con el resumen parcial cada
+    FILAS_POR_PROGRESO filas.
+    
+    Retorna un diccionario con:
+    - total_procesado, total_creados, total_duplicados, total_errores
+    - libros_creados, duplicados, errores: detalle de las primeras
+      MAX_DETALLES_RESULTADO filas de cada tipo
+    """
+    return procesar_filas_libros(leer_filas_excel(archivo), usuario, progreso=progreso)
+
+
+# Lector de filas según la extensión del archivo subido
+LECTORES_POR_EXTENSION = {
+    '.xlsx': leer_filas_excel,
+    '.xls': leer_filas_excel,
+    '.csv': leer_filas_csv,
+    '.ods': leer_filas_ods,
+}
+
+
+def procesar_archivo_libros(archivo, nombre_archivo, usuario, progreso=None):
+    """
+    Procesa un archivo de carga masiva (Excel, CSV u ODS, según la extensión
+    de `nombre_archivo`) y retorna el resumen, como procesar_excel_libros().
+    """
+    extension = os.path.splitext(nombre_archivo)[1].lower()
+    lector = LECTORES_POR_EXTENSION.get(extension, leer_filas_excel)
+    return procesar_filas_libros(lector(archivo), usuario, progreso=progreso)
+
+
+# Contenido de la plantilla. Su ETag sale de estos datos y no de los bytes
+# del archivo, que openpyxl regenera con la fecha actual en cada guardado:
+# así es el mismo en todos los procesos. Subir VERSION_PLANTILLA al cambiar
+# algo que no esté en estas constantes (ej: estilos).
+VERSION_PLANTILLA = 1
+ENCABEZADOS_PLANTILLA = ['Nombre', 'Autor', 'Editorial', 'ISBN', 'Descripción']
+EJEMPLOS_PLANTILLA = [
+    ['El Quijote', 'Miguel de Cervantes', 'Editorial Real', '9788491049000', 'Novela clásica española'],
+    ['Cien años de soledad', 'Gabriel García Márquez', 'Sudamericana', '9788437604947', 'Realismo mágico'],
+    ['1984', 'George Orwell', 'Seix Barral', '9788499890944', 'Distopía'],
+]
+ANCHOS_PLANTILLA = {'A': 30, 'B': 25, 'C': 20, 'D': 15, 'E': 40}
+
+
 def generar_plantilla_excel():
     """
     Genera un archivo Excel de ejemplo con la estructura esperada.
     Retorna un objeto BytesIO con el contenido del archivo.
     """
-    from openpyxl import Workbook
-    
     wb = Workbook()
     ws = wb.active
     ws.title = "Libros"
     
     # Encabezados
-    ws['A1'] = 'Nombre'
-    ws['B1'] = 'Autor'
-    ws['C1'] = 'Editorial'
-    ws['D1'] = 'ISBN'
-    ws['E1'] = 'Descripción'
+    ws.append(ENCABEZADOS_PLANTILLA)
     
     # Estilo de encabezados
-    from openpyxl.styles import Font, PatternFill
     header_font = Font(bold=True)
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
     
@@ -283,22 +560,12 @@ def generar_plantilla_excel():
         cell.fill = header_fill
     
     # Ejemplos de datos
-    ejemplos = [
-        ['El Quijote', 'Miguel de Cervantes', 'Editorial Real', '9788491049000', 'Novela clásica española'],
-        ['Cien años de soledad', 'Gabriel García Márquez', 'Sudamericana', '9788437604947', 'Realismo mágico'],
-        ['1984', 'George Orwell', 'Seix Barral', '9788499890944', 'Distopía'],
-    ]
-    
-    for row_num, ejemplo in enumerate(ejemplos, start=2):
-        for col_num, valor in enumerate(ejemplo, start=1):
-            ws.cell(row=row_num, column=col_num, value=valor)
+    for ejemplo in EJEMPLOS_PLANTILLA:
+        ws.append(ejemplo)
     
     # Ajustar ancho de columnas
-    ws.column_dimensions['A'].width = 30
-    ws.column_dimensions['B'].width = 25
-    ws.column_dimensions['C'].width = 20
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 40
+    for columna, ancho in ANCHOS_PLANTILLA.items():
+        ws.column_dimensions[columna].width = ancho
     
     # Guardar en BytesIO
     output = BytesIO()
@@ -306,3 +573,99 @@ def generar_plantilla_excel():
     output.seek(0)
     
     return output
+
+
+@lru_cache(maxsize=1)
+def etag_plantilla_excel():
+    """ETag de la plantilla, igual en todos los procesos mientras no cambie su contenido."""
+    datos = repr((VERSION_PLANTILLA, ENCABEZADOS_PLANTILLA, EJEMPLOS_PLANTILLA, ANCHOS_PLANTILLA))
+    return '"%s"' % hashlib.sha256(datos.encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def obtener_plantilla_excel():
+    """
+    Retorna (contenido, etag) de la plantilla Excel.
+    La plantilla no cambia, así que se genera una sola vez por proceso.
+    """
+    return generar_plantilla_excel().getvalue(), etag_plantilla_excel()
+
+
+# Columnas de la exportación: las mismas de la plantilla, para poder reimportar el archivo
+COLUMNAS_EXPORTACION = ['Nombre', 'Autor', 'Editorial', 'ISBN', 'Descripción', 'Estado', 'Propietario']
+CAMPOS_EXPORTACION = ['nombre', 'autor', 'editorial', 'isbn', 'descripcion', 'estado', 'propietario__username']
+
+# Filas que se piden a la base de datos por cada viaje del cursor
+FILAS_POR_CONSULTA_EXPORTACION = 2000
+
+# Bytes por cada fragmento que se envía al exportar a Excel
+TAMANIO_FRAGMENTO_EXPORTACION = 64 * 1024
+
+
+# Caracteres con los que Excel/LibreOffice interpretan una celda como fórmula
+INICIOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escapar_celda(valor):
+    """
+    Antepone ' a los textos que una planilla tomaría como fórmula (inyección
+    CSV): los libros exportados los cargaron otros usuarios.
+    """
+    if valor is None:
+        return ''
+    if isinstance(valor, str) and valor.startswith(INICIOS_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def filas_exportacion(libros):
+    """
+    Generador con las filas a exportar de un queryset de libros.
+    Usa iterator() para no cargar el queryset completo en memoria.
+    """
+    valores = libros.values_list(*CAMPOS_EXPORTACION)
+    for fila in valores.iterator(chunk_size=FILAS_POR_CONSULTA_EXPORTACION):
+        yield [escapar_celda(valor) for valor in fila]
+
+
+class _BufferLinea:
+    """Pseudo archivo que devuelve lo escrito, para que csv.writer genere texto fila por fila."""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv_libros(libros):
+    """
+    Generador con el contenido CSV (UTF-8 con BOM, para que Excel lo abra bien)
+    de los libros. Cada fila se envía apenas se lee de la base de datos.
+    """
+    escritor = csv.writer(_BufferLinea())
+    yield '\ufeff'.encode('utf-8') + escritor.writerow(COLUMNAS_EXPORTACION).encode('utf-8')
+    for fila in filas_exportacion(libros):
+        yield escritor.writerow(fila).encode('utf-8')
+
+
+def generar_excel_libros(libros):
+    """
+    Generador con el contenido .xlsx de los libros.
+
+    El libro se escribe en modo write-only (las filas van a disco, no a memoria)
+    sobre un archivo temporal, que luego se envía en fragmentos. El formato
+    xlsx es un zip que se arma al final, así que los bytes salen al terminar
+    de recorrer los libros.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title='Libros')
+    worksheet.append(COLUMNAS_EXPORTACION)
+    for fila in filas_exportacion(libros):
+        worksheet.append(fila)
+
+    with tempfile.TemporaryFile() as temporal:
+        workbook.save(temporal)
+        temporal.seek(0)
+        while True:
+            fragmento = temporal.read(TAMANIO_FRAGMENTO_EXPORTACION)
+            if not fragmento:
+                break
+            yield fragmento
@@ -1,34 +1,50 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponseForbidden, HttpResponse
+from django.http import HttpResponseForbidden, HttpResponse, JsonResponse, StreamingHttpResponse, Http404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from core.paginacion import paginar_por_cursor
 from django.contrib import messages
 
-from .models import Libro
+from .models import Libro, ImportJob
 from .forms import LibroForm, CargaMasivaForm
-from .utils import procesar_excel_libros, generar_plantilla_excel
+from .utils import obtener_plantilla_excel, etag_plantilla_excel, generar_csv_libros, generar_excel_libros
+from .search import buscar_libros
+from .services import (
+    encolar_importacion, reclamar_importacion, ejecutar_importacion, fallar_importaciones_vencidas
+)
 
 def listar_libros(request):
     query = request.GET.get('q', '')  # Captura el término de búsqueda
-    libros = Libro.objects.filter(
-        Q(nombre__icontains=query) | Q(autor__icontains=query)
-    ) if query else Libro.objects.all()
+    libros = Libro.objects.para_listado()
+    if query:
+        libros = buscar_libros(libros, query)
+    # Los resultados de búsqueda vienen ordenados por relevancia; si no, por nombre.
+    # Se mira query.order_by y no .ordered: un resultado vacío (libros.none())
+    # se considera ordenado aunque no tenga orden explícito
+    if not libros.query.order_by:
+        libros = libros.order_by('nombre_normalizado', 'id')
     
-    # Paginación
-    paginator = Paginator(libros, 10)  # Mostrar 10 libros por página
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor: 10 libros por página, sin OFFSET
+    page_obj = paginar_por_cursor(libros, request.GET, por_pagina=10, con_total=True)
 
     return render(request, 'libros/lista.html', {
         'libros': page_obj,
         'query': query,
+        'url_exportar': 'exportar_catalogo',
     })
 
 @login_required
 def listar_mis_libros(request):
-    libros = Libro.objects.filter(propietario=request.user)
-    return render(request, 'libros/lista.html', {'libros': libros})
+    libros = Libro.objects.para_listado().filter(
+        propietario=request.user
+    ).order_by('nombre_normalizado', 'id')
+    page_obj = paginar_por_cursor(libros, request.GET, por_pagina=10, con_total=True)
+    return render(request, 'libros/lista.html', {
+        'libros': page_obj,
+        'url_exportar': 'exportar_mis_libros',
+    })
 
 
 @login_required
@@ -87,31 +103,50 @@ def eliminar_libro(request, id):
 
 ## Carga Masiva
 
+def _mensajes_resultados_carga(request, resultados):
+    """Agrega los mensajes de resumen de una carga masiva."""
+    if resultados['total_creados']:
+        mensaje = f"Se crearon {resultados['total_creados']} libro(s) exitosamente."
+        messages.success(request, mensaje)
+    
+    if resultados['total_duplicados']:
+        mensaje = f"Se encontraron {resultados['total_duplicados']} libro(s) duplicado(s) que no se crearon."
+        messages.warning(request, mensaje)
+    
+    if resultados['total_errores']:
+        mensaje = f"Se encontraron {resultados['total_errores']} error(es) en el archivo."
+        messages.error(request, mensaje)
+
+
+# La plantilla solo cambia con un deploy
+CACHE_PLANTILLA_SEGUNDOS = 24 * 60 * 60
+
+
 @login_required
 def cargar_libros_masivo(request):
     """
-    Vista para cargar múltiples libros desde un archivo Excel.
+    Vista para cargar múltiples libros desde un archivo Excel, CSV u ODS.
+    Los archivos chicos se procesan en la misma petición; los grandes se encolan
+    y se procesan con el comando procesar_importaciones.
     """
     if request.method == 'POST':
         form = CargaMasivaForm(request.POST, request.FILES)
         if form.is_valid():
             archivo = request.FILES['archivo_excel']
+            job = encolar_importacion(archivo, request.user)
             
-            # Procesar el archivo Excel
-            resultados = procesar_excel_libros(archivo, request.user)
+            if archivo.size > settings.LIBROS_IMPORTACION_MAX_BYTES_SINCRONO or not reclamar_importacion(job.id):
+                messages.info(request, "Tu archivo se está procesando. Puedes seguir el progreso en esta página.")
+                return redirect('estado_importacion', id=job.id)
             
-            # Mostrar mensajes según resultados
-            if resultados['libros_creados']:
-                mensaje = f"Se crearon {len(resultados['libros_creados'])} libro(s) exitosamente."
-                messages.success(request, mensaje)
-            
-            if resultados['duplicados']:
-                mensaje = f"Se encontraron {len(resultados['duplicados'])} libro(s) duplicado(s) que no se crearon."
-                messages.warning(request, mensaje)
+            # Procesar el archivo Excel
+            job = ejecutar_importacion(job)
+            if job.estado == 'fallido':
+                messages.error(request, "No se pudo procesar el archivo.")
+                return redirect('estado_importacion', id=job.id)
             
-            if resultados['errores']:
-                mensaje = f"Se encontraron {len(resultados['errores'])} error(es) en el archivo."
-                messages.error(request, mensaje)
+            resultados = job.resultados
+            _mensajes_resultados_carga(request, resultados)
             
             # Renderizar con resultados
             return render(request, 'libros/cargar_masivo.html', {
@@ -130,14 +165,90 @@ def cargar_libros_masivo(request):
 
 
 @login_required
+def estado_importacion(request, id):
+    """
+    Vista con el progreso de una carga masiva encolada.
+    Mientras el trabajo no termina, la página consulta progreso_importacion.
+    """
+    job = get_object_or_404(ImportJob, id=id, usuario=request.user)
+    if job.reserva_vencida and fallar_importaciones_vencidas(id=job.id):
+        job.refresh_from_db()
+    return render(request, 'libros/estado_importacion.html', {
+        'job': job,
+        'resultados': job.resultados,
+    })
+
+
+@login_required
+def progreso_importacion(request, id):
+    """Endpoint JSON con los contadores de progreso de una carga masiva."""
+    job = get_object_or_404(
+        ImportJob.objects.only(
+            'id', 'usuario_id', 'estado', 'reserva_hasta',
+            'filas_procesadas', 'creados', 'duplicados', 'errores'
+        ),
+        id=id, usuario=request.user
+    )
+    # Sin esto la página consultaría para siempre un trabajo interrumpido
+    if job.reserva_vencida and fallar_importaciones_vencidas(id=job.id):
+        job.estado = 'fallido'
+    return JsonResponse({
+        'estado': job.estado,
+        'terminado': job.terminado,
+        'filas_procesadas': job.filas_procesadas,
+        'creados': job.creados,
+        'duplicados': job.duplicados,
+        'errores': job.errores,
+    })
+
+
+@login_required
+@cache_control(private=True, max_age=CACHE_PLANTILLA_SEGUNDOS)
+@condition(etag_func=lambda request: etag_plantilla_excel())
 def descargar_plantilla_excel(request):
     """
     Vista para descargar la plantilla Excel de ejemplo.
+    Si el navegador ya tiene la plantilla (If-None-Match), responde 304.
     """
-    plantilla = generar_plantilla_excel()
+    contenido, _ = obtener_plantilla_excel()
     response = HttpResponse(
-        plantilla.getvalue(),
+        contenido,
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
     response['Content-Disposition'] = 'attachment; filename="plantilla_libros.xlsx"'
     return response
+
+
+# Formatos de exportación: (generador, content type)
+FORMATOS_EXPORTACION = {
+    'csv': (generar_csv_libros, 'text/csv; charset=utf-8'),
+    'xlsx': (generar_excel_libros, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def _respuesta_exportacion(libros, formato, nombre_archivo):
+    """Respuesta en streaming con los libros exportados en el formato pedido."""
+    if formato not in FORMATOS_EXPORTACION:
+        raise Http404("Formato de exportación no soportado")
+    generador, content_type = FORMATOS_EXPORTACION[formato]
+    response = StreamingHttpResponse(generador(libros), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.{formato}"'
+    return response
+
+
+@login_required
+def exportar_catalogo(request, formato):
+    """
+    Vista para exportar el catálogo completo a CSV o Excel, en streaming.
+    """
+    libros = Libro.objects.order_by('nombre_normalizado', 'id')
+    return _respuesta_exportacion(libros, formato, 'catalogo_libros')
+
+
+@login_required
+def exportar_mis_libros(request, formato):
+    """
+    Vista para exportar los libros del usuario a CSV o Excel, en streaming.
+    """
+    libros = Libro.objects.filter(propietario=request.user).order_by('nombre_normalizado', 'id')
+    return _respuesta_exportacion(libros, formato, 'mis_libros')
@@ -0,0 +1,34 @@
+from django import forms
+
+
+class FiltroHistorialForm(forms.Form):
+    ESTADOS = [
+        ('', 'Todos'),
+        ('activos', 'Activos'),
+        ('devueltos', 'Devueltos'),
+    ]
+
+    desde = forms.DateField(
+        required=False,
+        label='Desde',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    hasta = forms.DateField(
+        required=False,
+        label='Hasta',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    estado = forms.ChoiceField(
+        choices=ESTADOS,
+        required=False,
+        label='Estado',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde = cleaned_data.get('desde')
+        hasta = cleaned_data.get('hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha "desde" no puede ser posterior a la fecha "hasta".')
+        return cleaned_data
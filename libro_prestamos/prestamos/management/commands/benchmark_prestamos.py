@@ -0,0 +1,167 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+
+from libros.models import Libro
+from prestamos.models import Prestamo
+
+TAMANIO_LOTE = 5000
+
+# Consultas de las vistas que usan los índices de Prestamo: (nombre, función(usuario, libro) -> queryset)
+CONSULTAS = (
+    ('listar_prestamos: realizados', lambda usuario, libro: Prestamo.objects.filter(
+        prestador=usuario, devuelto=False
+    ).order_by('-fecha_prestamo', '-id')),
+    ('listar_prestamos: recibidos', lambda usuario, libro: Prestamo.objects.filter(
+        prestatario=usuario, devuelto=False
+    ).order_by('-fecha_prestamo', '-id')),
+    ('historial: realizados (1a página)', lambda usuario, libro: Prestamo.objects.filter(
+        prestador=usuario
+    ).order_by('-fecha_prestamo', '-id')[:21]),
+    ('historial: recibidos (1a página)', lambda usuario, libro: Prestamo.objects.filter(
+        prestatario=usuario
+    ).order_by('-fecha_prestamo', '-id')[:21]),
+    ('home: préstamos activos', lambda usuario, libro: Prestamo.objects.filter(
+        prestador=usuario, devuelto=False
+    ).values('prestador').annotate(total=Count('id')).order_by()),
+    ('libro_detalle: préstamo activo', lambda usuario, libro: Prestamo.objects.filter(
+        libro=libro, devuelto=False
+    )[:1]),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el plan y la latencia de las consultas de préstamos con y sin los índices de Prestamo. '
+        'Todo (datos generados e índices quitados) se revierte al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prestamos', type=int, default=0,
+            help='Genera esta cantidad de préstamos sintéticos (ej: 1000000). Por defecto usa los datos existentes.'
+        )
+        parser.add_argument(
+            '--usuarios', type=int, default=1000,
+            help='Usuarios sintéticos a generar junto con los préstamos (por defecto 1000).'
+        )
+        parser.add_argument(
+            '--repeticiones', type=int, default=20,
+            help='Veces que se ejecuta cada consulta; se informa la mediana (por defecto 20).'
+        )
+        parser.add_argument(
+            '--usuario',
+            help='Username cuyas consultas se miden. Por defecto, el que más préstamos realizó.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['prestamos'] > 0:
+                self.generar_datos(options['prestamos'], max(options['usuarios'], 2))
+            usuario, libro = self.elegir_usuario(options['usuario'])
+
+            con_indices = self.medir(usuario, libro, options['repeticiones'], 'con índices')
+            self.quitar_indices()
+            sin_indices = self.medir(usuario, libro, options['repeticiones'], 'sin índices')
+
+            self.informar(sin_indices, con_indices)
+            transaction.set_rollback(True)
+
+    def generar_datos(self, cantidad, cantidad_usuarios):
+        self.stdout.write(f'Generando {cantidad} préstamos entre {cantidad_usuarios} usuarios...')
+        inicio = time.perf_counter()
+        usuarios = User.objects.bulk_create(
+            [User(username=f'benchmark_{numero}', password='!') for numero in range(cantidad_usuarios)],
+            batch_size=TAMANIO_LOTE
+        )
+        libros = Libro.objects.bulk_create(
+            [
+                Libro(nombre=f'Libro {numero}', autor='Autor', propietario=usuarios[numero % cantidad_usuarios])
+                for numero in range(cantidad_usuarios * 5)
+            ],
+            batch_size=TAMANIO_LOTE
+        )
+        aleatorio = random.Random(0)
+        lote = []
+        for numero in range(cantidad):
+            libro = libros[numero % len(libros)]
+            # Cualquier usuario salvo el propietario (que es usuarios[numero % cantidad_usuarios])
+            desplazamiento = aleatorio.randrange(1, cantidad_usuarios)
+            prestatario = usuarios[(numero % len(libros) + desplazamiento) % cantidad_usuarios]
+            lote.append(Prestamo(
+                libro=libro, prestador_id=libro.propietario_id, prestatario=prestatario,
+                # Un préstamo activo por cada tercer libro; el resto, historial
+                devuelto=not (numero < len(libros) and numero % 3 == 0),
+            ))
+            if len(lote) >= TAMANIO_LOTE:
+                Prestamo.objects.bulk_create(lote)
+                lote = []
+        Prestamo.objects.bulk_create(lote)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Prestamo._meta.db_table}')
+        self.stdout.write(f'Datos generados en {time.perf_counter() - inicio:.1f} s.')
+
+    def elegir_usuario(self, username):
+        if username:
+            usuario = User.objects.filter(username=username).first()
+            if usuario is None:
+                raise CommandError(f"No existe el usuario '{username}'.")
+        else:
+            fila = Prestamo.objects.values('prestador').annotate(total=Count('id')).order_by('-total').first()
+            if fila is None:
+                raise CommandError('No hay préstamos para medir; use --prestamos para generarlos.')
+            usuario = User.objects.get(id=fila['prestador'])
+        libro = Libro.objects.filter(propietario=usuario).order_by('id').first()
+        return usuario, libro
+
+    def medir(self, usuario, libro, repeticiones, fase):
+        """Retorna {nombre: (mediana_ms, plan)} para cada consulta."""
+        mediciones = {}
+        for nombre, consulta in CONSULTAS:
+            queryset = consulta(usuario, libro)
+            list(queryset.all())  # Calentar la caché de la base de datos
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                list(queryset.all())
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            mediciones[nombre] = (statistics.median(tiempos), self.plan(queryset, fase))
+        return mediciones
+
+    @staticmethod
+    def plan(queryset, fase):
+        """
+        EXPLAIN de la consulta. El comentario con la fase hace que el texto sea
+        distinto en cada medición: sqlite3 reutiliza las sentencias preparadas y
+        mostraría el plan calculado antes de quitar los índices.
+        """
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {fase} */', params)
+            return '\n'.join(' '.join(str(valor) for valor in fila) for fila in cursor.fetchall())
+
+    def quitar_indices(self):
+        editor = connection.schema_editor()
+        tabla = connection.ops.quote_name(Prestamo._meta.db_table)
+        with connection.cursor() as cursor:
+            for indice in Prestamo._meta.indexes:
+                cursor.execute(editor.sql_delete_index % {
+                    'table': tabla, 'name': connection.ops.quote_name(indice.name),
+                })
+
+    def informar(self, sin_indices, con_indices):
+        for nombre, _ in CONSULTAS:
+            ms_sin, plan_sin = sin_indices[nombre]
+            ms_con, plan_con = con_indices[nombre]
+            self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+            self.stdout.write(f'  sin índices: {ms_sin:9.3f} ms   {self._resumir(plan_sin)}')
+            self.stdout.write(f'  con índices: {ms_con:9.3f} ms   {self._resumir(plan_con)}')
+
+    @staticmethod
+    def _resumir(plan):
+        return ' | '.join(linea.strip() for linea in plan.splitlines() if linea.strip())
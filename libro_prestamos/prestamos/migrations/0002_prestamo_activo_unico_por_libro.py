@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def cerrar_prestamos_duplicados(apps, schema_editor):
+    """
+    Antes de crear la restricción, deja un solo préstamo sin devolver por libro
+    (el más reciente); los anteriores se marcan como devueltos.
+    """
+    Prestamo = apps.get_model('prestamos', 'Prestamo')
+    libros_duplicados = Prestamo.objects.filter(devuelto=False).values('libro_id').annotate(
+        cantidad=models.Count('id')
+    ).filter(cantidad__gt=1).values_list('libro_id', flat=True)
+    for libro_id in libros_duplicados:
+        activos = Prestamo.objects.filter(libro_id=libro_id, devuelto=False).order_by('-fecha_prestamo', '-id')
+        Prestamo.objects.filter(id__in=list(activos.values_list('id', flat=True)[1:])).update(
+            devuelto=True,
+            comentario_devolucion='Cerrado automáticamente: el libro tenía otro préstamo activo.',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0004_importjob'),
+        ('prestamos', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(cerrar_prestamos_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='prestamo',
+            constraint=models.UniqueConstraint(condition=models.Q(('devuelto', False)), fields=('libro',), name='prestamo_activo_unico_por_libro'),
+        ),
+    ]
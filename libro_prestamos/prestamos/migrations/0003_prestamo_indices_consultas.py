@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0004_importjob'),
+        ('prestamos', '0002_prestamo_activo_unico_por_libro'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('devuelto', False)), fields=['prestador', '-fecha_prestamo', '-id'], name='prest_activos_prestador_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('devuelto', False)), fields=['prestatario', '-fecha_prestamo', '-id'], name='prest_activos_prestatario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['prestador', '-fecha_prestamo', '-id'], name='prest_hist_prestador_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['prestatario', '-fecha_prestamo', '-id'], name='prest_hist_prestatario_idx'),
+        ),
+    ]
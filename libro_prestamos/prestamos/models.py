@@ -10,5 +10,38 @@ class Prestamo(models.Model):
     devuelto = models.BooleanField(default=False)
     comentario_devolucion = models.TextField(blank=True, null=True)
     
+    class Meta:
+        constraints = [
+            # Un libro no puede tener más de un préstamo sin devolver
+            models.UniqueConstraint(
+                fields=['libro'],
+                condition=models.Q(devuelto=False),
+                name='prestamo_activo_unico_por_libro',
+            ),
+        ]
+        # La restricción anterior ya indexa (libro) WHERE devuelto = false
+        indexes = [
+            # Préstamos activos de cada usuario (listados y contadores)
+            models.Index(
+                fields=['prestador', '-fecha_prestamo', '-id'],
+                condition=models.Q(devuelto=False),
+                name='prest_activos_prestador_idx',
+            ),
+            models.Index(
+                fields=['prestatario', '-fecha_prestamo', '-id'],
+                condition=models.Q(devuelto=False),
+                name='prest_activos_prestatario_idx',
+            ),
+            # Historial completo, paginado por cursor sobre (-fecha_prestamo, -id)
+            models.Index(
+                fields=['prestador', '-fecha_prestamo', '-id'],
+                name='prest_hist_prestador_idx',
+            ),
+            models.Index(
+                fields=['prestatario', '-fecha_prestamo', '-id'],
+                name='prest_hist_prestatario_idx',
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.libro} - {self.prestatario}"
@@ -2,9 +2,16 @@
 Servicios para la lógica de negocio del sistema de préstamos.
 Separa la lógica de negocio de las vistas según AGENT.md.
 """
+import datetime
+
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from core.services import ajustar_estadisticas, ajustar_estadisticas_varios
 from libros.models import Libro
+from libros.normalizacion import filtro_prefijo
 from .models import Prestamo
 
 
@@ -23,16 +30,6 @@ def crear_prestamo_service(libro_id, prestatario_id, prestador):
     Raises:
         ValidationError: Si la validación falla
     """
-    # Validar que el libro existe, pertenece al prestador y está disponible
-    libro = Libro.objects.filter(
-        id=libro_id,
-        propietario=prestador,
-        estado='disponible'
-    ).first()
-    
-    if not libro:
-        return None, "El libro no existe, no te pertenece o no está disponible."
-    
     # Validar que el prestatario existe
     prestatario = User.objects.filter(username=prestatario_id).first()
     
@@ -43,16 +40,31 @@ def crear_prestamo_service(libro_id, prestatario_id, prestador):
     if prestador.id == prestatario.id:
         return None, "No puedes prestar un libro a ti mismo."
     
-    # Crear el préstamo
-    prestamo = Prestamo.objects.create(
-        libro=libro,
-        prestatario=prestatario,
-        prestador=prestador
-    )
-    
-    # Actualizar estado del libro
-    libro.estado = 'prestado'
-    libro.save()
+    try:
+        with transaction.atomic():
+            # Reclamar el libro: el UPDATE condicional solo afecta la fila si sigue
+            # disponible, así que de dos pedidos simultáneos solo uno lo consigue
+            reclamado = Libro.objects.filter(
+                id=libro_id,
+                propietario=prestador,
+                estado='disponible'
+            ).update(estado='prestado')
+            
+            if not reclamado:
+                return None, "El libro no existe, no te pertenece o no está disponible."
+            
+            # Crear el préstamo (la restricción prestamo_activo_unico_por_libro
+            # impide un segundo préstamo sin devolver del mismo libro)
+            prestamo = Prestamo.objects.create(
+                libro_id=libro_id,
+                prestatario=prestatario,
+                prestador=prestador
+            )
+            
+            ajustar_estadisticas(prestador.id, libros_disponibles=-1, prestamos_activos=1)
+            ajustar_estadisticas(prestatario.id, prestamos_recibidos=1)
+    except IntegrityError:
+        return None, "El libro ya tiene un préstamo activo."
     
     return prestamo, None
 
@@ -71,9 +83,9 @@ def marcar_devuelto_service(prestamo_id, prestador):
     Raises:
         Prestamo.DoesNotExist: Si el préstamo no existe
     """
-    # Obtener el préstamo
+    # Obtener el préstamo junto con su libro (una sola consulta)
     try:
-        prestamo = Prestamo.objects.get(id=prestamo_id, prestador=prestador)
+        prestamo = Prestamo.objects.select_related('libro').get(id=prestamo_id, prestador=prestador)
     except Prestamo.DoesNotExist:
         return None, "El préstamo no existe o no tienes permiso para marcarlo como devuelto."
     
@@ -81,10 +93,233 @@ def marcar_devuelto_service(prestamo_id, prestador):
     if prestamo.devuelto:
         return prestamo, "Este préstamo ya ha sido marcado como devuelto."
     
-    # Actualizar el estado del préstamo y del libro
+    # Actualizar solo las columnas que cambian, juntas o ninguna
+    with transaction.atomic():
+        # Condicional: si otro pedido lo devolvió mientras tanto, no se actualiza nada
+        devuelto = Prestamo.objects.filter(id=prestamo.id, devuelto=False).update(devuelto=True)
+        if not devuelto:
+            return prestamo, "Este préstamo ya ha sido marcado como devuelto."
+        Libro.objects.filter(id=prestamo.libro_id).update(estado='disponible')
+        
+        ajustar_estadisticas(prestamo.prestador_id, libros_disponibles=1, prestamos_activos=-1)
+        ajustar_estadisticas(prestamo.prestatario_id, prestamos_recibidos=-1)
+    
     prestamo.devuelto = True
     prestamo.libro.estado = 'disponible'
-    prestamo.libro.save()
-    prestamo.save()
     
     return prestamo, None
+
+
+class OperacionConcurrente(Exception):
+    """Otro pedido modificó los mismos libros o préstamos durante una operación masiva."""
+
+
+def _ids_unicos(ids):
+    """Convierte los ids recibidos a enteros, sin repetir y en el orden original."""
+    unicos = {}
+    for valor in ids:
+        try:
+            unicos.setdefault(int(valor), None)
+        except (TypeError, ValueError):
+            continue
+    return list(unicos)
+
+
+def crear_prestamos_masivo_service(libro_ids, prestatario_id, prestador):
+    """
+    Servicio para prestar varios libros a un mismo usuario en una sola transacción.
+    La cantidad de consultas no depende de la cantidad de libros.
+    
+    Args:
+        libro_ids: IDs de los libros a prestar
+        prestatario_id: Username del usuario que recibirá los préstamos
+        prestador: Usuario que presta los libros
+        
+    Returns:
+        tuple: (resultados, None) si se pudo procesar, (None, error_message) si hay error.
+        resultados es una lista con un diccionario por libro: libro_id, libro
+        (nombre o None), exito y error.
+    """
+    libro_ids = _ids_unicos(libro_ids)
+    if not libro_ids:
+        return None, "No seleccionaste ningún libro."
+    
+    prestatario = User.objects.filter(username=prestatario_id).first()
+    
+    if not prestatario:
+        return None, "El usuario prestatario no existe."
+    
+    if prestador.id == prestatario.id:
+        return None, "No puedes prestar un libro a ti mismo."
+    
+    try:
+        with transaction.atomic():
+            # select_for_update bloquea los libros en las bases que lo soportan;
+            # el UPDATE condicional de abajo detecta la carrera en el resto
+            disponibles = dict(Libro.objects.select_for_update().filter(
+                id__in=libro_ids,
+                propietario=prestador,
+                estado='disponible'
+            ).values_list('id', 'nombre'))
+            
+            if disponibles:
+                reclamados = Libro.objects.filter(
+                    id__in=disponibles, estado='disponible'
+                ).update(estado='prestado')
+                if reclamados != len(disponibles):
+                    raise OperacionConcurrente()
+                
+                Prestamo.objects.bulk_create([
+                    Prestamo(libro_id=libro_id, prestatario=prestatario, prestador=prestador)
+                    for libro_id in disponibles
+                ])
+                
+                ajustar_estadisticas(prestador.id, libros_disponibles=-len(disponibles), prestamos_activos=len(disponibles))
+                ajustar_estadisticas(prestatario.id, prestamos_recibidos=len(disponibles))
+    except (OperacionConcurrente, IntegrityError):
+        return None, "Algunos libros cambiaron de estado mientras se procesaba el préstamo. Intenta de nuevo."
+    
+    resultados = []
+    for libro_id in libro_ids:
+        if libro_id in disponibles:
+            resultados.append({'libro_id': libro_id, 'libro': disponibles[libro_id], 'exito': True, 'error': None})
+        else:
+            resultados.append({
+                'libro_id': libro_id, 'libro': None, 'exito': False,
+                'error': "El libro no existe, no te pertenece o no está disponible."
+            })
+    return resultados, None
+
+
+def marcar_devueltos_masivo_service(prestamo_ids, prestador):
+    """
+    Servicio para marcar varios préstamos como devueltos en una sola transacción.
+    La cantidad de consultas no depende de la cantidad de préstamos.
+    
+    Args:
+        prestamo_ids: IDs de los préstamos a marcar como devueltos
+        prestador: Usuario que prestó los libros (para validación)
+        
+    Returns:
+        tuple: (resultados, None) si se pudo procesar, (None, error_message) si hay error.
+        resultados es una lista con un diccionario por préstamo: prestamo_id,
+        libro (nombre o None), exito y error.
+    """
+    prestamo_ids = _ids_unicos(prestamo_ids)
+    if not prestamo_ids:
+        return None, "No seleccionaste ningún préstamo."
+    
+    prestamos = {
+        prestamo.id: prestamo
+        for prestamo in Prestamo.objects.select_related('libro').filter(
+            id__in=prestamo_ids, prestador=prestador
+        ).only('id', 'devuelto', 'prestatario_id', 'libro__id', 'libro__nombre')
+    }
+    pendientes = [prestamo for prestamo in prestamos.values() if not prestamo.devuelto]
+    
+    try:
+        with transaction.atomic():
+            if pendientes:
+                devueltos = Prestamo.objects.filter(
+                    id__in=[prestamo.id for prestamo in pendientes], devuelto=False
+                ).update(devuelto=True)
+                if devueltos != len(pendientes):
+                    raise OperacionConcurrente()
+                Libro.objects.filter(
+                    id__in=[prestamo.libro_id for prestamo in pendientes]
+                ).update(estado='disponible')
+                
+                ajustar_estadisticas(prestador.id, libros_disponibles=len(pendientes), prestamos_activos=-len(pendientes))
+                recibidos = {}
+                for prestamo in pendientes:
+                    recibidos[prestamo.prestatario_id] = recibidos.get(prestamo.prestatario_id, 0) - 1
+                ajustar_estadisticas_varios('prestamos_recibidos', recibidos)
+    except OperacionConcurrente:
+        return None, "Algunos préstamos cambiaron mientras se procesaba la devolución. Intenta de nuevo."
+    
+    resultados = []
+    for prestamo_id in prestamo_ids:
+        prestamo = prestamos.get(prestamo_id)
+        if prestamo is None:
+            resultados.append({
+                'prestamo_id': prestamo_id, 'libro': None, 'exito': False,
+                'error': "El préstamo no existe o no tienes permiso para marcarlo como devuelto."
+            })
+        elif prestamo.devuelto:
+            resultados.append({
+                'prestamo_id': prestamo_id, 'libro': prestamo.libro.nombre, 'exito': False,
+                'error': "Este préstamo ya ha sido marcado como devuelto."
+            })
+        else:
+            resultados.append({'prestamo_id': prestamo_id, 'libro': prestamo.libro.nombre, 'exito': True, 'error': None})
+    return resultados, None
+
+
+# Mínimo de caracteres para buscar prestatarios y máximo de sugerencias
+PRESTATARIOS_MIN_CARACTERES = 2
+PRESTATARIOS_LIMITE = 10
+
+
+def buscar_prestatarios(texto, prestador, limite=PRESTATARIOS_LIMITE):
+    """
+    Busca usuarios activos cuyo username, nombre o apellido empiece con
+    `texto` (sin distinguir mayúsculas), para sugerirlos como prestatarios.
+
+    Cada condición es un rango sobre lower(columna), que resuelven los índices
+    usuarios_username_lower_idx, usuarios_first_name_lower_idx y
+    usuarios_last_name_lower_idx sin recorrer la tabla de usuarios.
+
+    Args:
+        texto: Prefijo escrito por el usuario
+        prestador: Usuario que presta (se excluye de los resultados)
+        limite: Cantidad máxima de resultados
+
+    Returns:
+        list: Diccionarios con username y nombre
+    """
+    prefijo = texto.strip().lower()
+    if len(prefijo) < PRESTATARIOS_MIN_CARACTERES:
+        return []
+    usuarios = User.objects.annotate(
+        username_lower=Lower('username'),
+        first_name_lower=Lower('first_name'),
+        last_name_lower=Lower('last_name'),
+    ).filter(
+        filtro_prefijo('username_lower', prefijo)
+        | filtro_prefijo('first_name_lower', prefijo)
+        | filtro_prefijo('last_name_lower', prefijo),
+        is_active=True,
+    ).exclude(id=prestador.id).order_by('username_lower').values(
+        'username', 'first_name', 'last_name'
+    )[:limite]
+    return [
+        {
+            'username': usuario['username'],
+            'nombre': f"{usuario['first_name']} {usuario['last_name']}".strip(),
+        }
+        for usuario in usuarios
+    ]
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
+
+
+def filtrar_historial(prestamos, desde=None, hasta=None, estado=''):
+    """
+    Filtra un queryset de préstamos por rango de fechas (ambos días incluidos)
+    y estado ('activos', 'devueltos' o '' para todos).
+
+    Las fechas se convierten en un rango sobre fecha_prestamo en lugar de usar
+    __date, para que la base de datos pueda recorrer el índice
+    (usuario, -fecha_prestamo, -id).
+    """
+    if desde:
+        prestamos = prestamos.filter(fecha_prestamo__gte=_inicio_del_dia(desde))
+    if hasta:
+        prestamos = prestamos.filter(fecha_prestamo__lt=_inicio_del_dia(hasta + datetime.timedelta(days=1)))
+    if estado == 'activos':
+        prestamos = prestamos.filter(devuelto=False)
+    elif estado == 'devueltos':
+        prestamos = prestamos.filter(devuelto=True)
+    return prestamos
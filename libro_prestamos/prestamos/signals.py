@@ -0,0 +1,17 @@
+"""
+Señales que mantienen los contadores de UserStats cuando se eliminan préstamos
+(por ejemplo, en cascada al eliminar un libro prestado).
+"""
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from core.services import ajustar_estadisticas
+from .models import Prestamo
+
+
+@receiver(post_delete, sender=Prestamo)
+def descontar_prestamo_eliminado(sender, instance, **kwargs):
+    if instance.devuelto:
+        return
+    ajustar_estadisticas(instance.prestador_id, prestamos_activos=-1)
+    ajustar_estadisticas(instance.prestatario_id, prestamos_recibidos=-1)
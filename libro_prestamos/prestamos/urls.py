@@ -3,6 +3,9 @@ from . import views
 
 urlpatterns = [
     path('crear', views.crear_prestamo, name='crear_prestamo'),
+    path('crear/masivo', views.crear_prestamos_masivo, name='crear_prestamos_masivo'),
+    path('devolver/masivo', views.marcar_devueltos_masivo, name='marcar_devueltos_masivo'),
+    path('prestatarios/buscar', views.buscar_prestatarios_json, name='buscar_prestatarios'),
     path('', views.listar_prestamos, name='listar_prestamos'),
     path('historial', views.historial_prestamos, name='historial_prestamos'),
     path('marcar_devuelto/<int:prestamo_id>/', views.marcar_devuelto, name='marcar_devuelto'),
@@ -1,11 +1,16 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.contrib.auth.models import User
+from django.http import JsonResponse
 
+from .forms import FiltroHistorialForm
 from .models import Prestamo
-from .services import crear_prestamo_service, marcar_devuelto_service
+from .services import (
+    crear_prestamo_service, marcar_devuelto_service, buscar_prestatarios,
+    crear_prestamos_masivo_service, marcar_devueltos_masivo_service, filtrar_historial
+)
 from libros.models import Libro
+from core.paginacion import paginar_por_cursor
 
 @login_required
 def crear_prestamo(request):
@@ -24,10 +29,61 @@ def crear_prestamo(request):
 
     # Filtrar libros disponibles del usuario actual
     libros = Libro.objects.filter(propietario=request.user, estado='disponible')
-    # Excluir al usuario actual de la lista de usuarios
-    usuarios = User.objects.exclude(id=request.user.id)
+    # El prestatario se elige con el autocompletado de buscar_prestatarios_json
+
+    return render(request, 'prestamos/crear.html', {'libros': libros})
+
+
+def _mensajes_operacion_masiva(request, resultados, accion):
+    """Agrega el resumen de una operación masiva a los mensajes."""
+    exitosos = sum(1 for resultado in resultados if resultado['exito'])
+    if exitosos:
+        messages.success(request, f"Se {accion} {exitosos} libro(s) exitosamente.")
+    for resultado in resultados:
+        if not resultado['error']:
+            continue
+        nombre = resultado['libro'] or f"#{resultado.get('libro_id') or resultado.get('prestamo_id')}"
+        messages.warning(request, f"{nombre}: {resultado['error']}")
+
+
+@login_required
+def crear_prestamos_masivo(request):
+    """Vista para prestar varios libros a un mismo usuario en un solo paso."""
+    if request.method == 'POST':
+        resultados, error = crear_prestamos_masivo_service(
+            request.POST.getlist('libros'), request.POST.get('prestatario'), request.user
+        )
+        if error:
+            messages.error(request, error)
+        else:
+            _mensajes_operacion_masiva(request, resultados, 'prestaron')
+            if any(resultado['exito'] for resultado in resultados):
+                return redirect('listar_prestamos')
+
+    libros = Libro.objects.filter(
+        propietario=request.user, estado='disponible'
+    ).only('id', 'nombre', 'autor').order_by('nombre_normalizado', 'id')
+
+    return render(request, 'prestamos/crear_masivo.html', {'libros': libros})
 
-    return render(request, 'prestamos/crear.html', {'libros': libros, 'usuarios': usuarios})
+
+@login_required
+def marcar_devueltos_masivo(request):
+    """Vista para marcar como devueltos los préstamos seleccionados."""
+    if request.method == 'POST':
+        resultados, error = marcar_devueltos_masivo_service(request.POST.getlist('prestamos'), request.user)
+        if error:
+            messages.error(request, error)
+        else:
+            _mensajes_operacion_masiva(request, resultados, 'marcaron como devueltos')
+    return redirect('listar_prestamos')
+
+
+@login_required
+def buscar_prestatarios_json(request):
+    """Endpoint JSON para autocompletar el prestatario por username."""
+    resultados = buscar_prestatarios(request.GET.get('q', ''), request.user)
+    return JsonResponse({'resultados': resultados})
 
 @login_required
 def listar_prestamos(request):
@@ -35,13 +91,13 @@ def listar_prestamos(request):
     prestamos_realizados = Prestamo.objects.filter(
         prestador=request.user,
         devuelto=False
-    ).select_related('libro', 'prestatario')
+    ).select_related('libro', 'prestatario').order_by('-fecha_prestamo', '-id')
     
     # Préstamos recibidos (libros que recibí prestados)
     prestamos_recibidos = Prestamo.objects.filter(
         prestatario=request.user,
         devuelto=False
-    ).select_related('libro', 'prestador')
+    ).select_related('libro', 'prestador').order_by('-fecha_prestamo', '-id')
     
     return render(request, 'prestamos/listar_prestamos.html', {
         'prestamos_realizados': prestamos_realizados,
@@ -53,16 +109,28 @@ def historial_prestamos(request):
     # Historial de préstamos realizados (todos, incluyendo devueltos)
     historial_realizados = Prestamo.objects.filter(
         prestador=request.user
-    ).select_related('libro', 'prestatario').order_by('-fecha_prestamo')
+    ).select_related('libro', 'prestatario').order_by('-fecha_prestamo', '-id')
     
     # Historial de préstamos recibidos (todos, incluyendo devueltos)
     historial_recibidos = Prestamo.objects.filter(
         prestatario=request.user
-    ).select_related('libro', 'prestador').order_by('-fecha_prestamo')
+    ).select_related('libro', 'prestador').order_by('-fecha_prestamo', '-id')
+    
+    # Los filtros se aplican a ambas listas; si son inválidos se muestra todo
+    filtro_form = FiltroHistorialForm(request.GET)
+    if filtro_form.is_valid():
+        historial_realizados = filtrar_historial(historial_realizados, **filtro_form.cleaned_data)
+        historial_recibidos = filtrar_historial(historial_recibidos, **filtro_form.cleaned_data)
     
+    # Cada lista se pagina por separado con su propio cursor
     return render(request, 'prestamos/historial_prestamos.html', {
-        'historial_realizados': historial_realizados,
-        'historial_recibidos': historial_recibidos,
+        'filtro_form': filtro_form,
+        'historial_realizados': paginar_por_cursor(
+            historial_realizados, request.GET, por_pagina=20, prefijo='realizados_'
+        ),
+        'historial_recibidos': paginar_por_cursor(
+            historial_recibidos, request.GET, por_pagina=20, prefijo='recibidos_'
+        ),
     })
 
 @login_required
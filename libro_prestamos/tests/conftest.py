@@ -3,11 +3,20 @@ Configuración compartida para todos los tests
 """
 import pytest
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from usuarios.models import Perfil, PasswordResetToken
 from django.utils import timezone
 from datetime import timedelta
 
 
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    """Vacía la caché entre tests (los ids de usuario se reutilizan entre tests)"""
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.fixture
 def user(db):
     """Crea un usuario de prueba"""
@@ -0,0 +1,109 @@
+"""
+Tests para los backends de email de desarrollo (core.email_backends)
+"""
+import io
+import mailbox
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from core.email_backends import MaildirEmailBackend, UTF8ConsoleEmailBackend
+
+
+class StreamContador(io.StringIO):
+    """Stream que cuenta las llamadas a write() y a reconfigure()"""
+
+    encoding = 'ascii'
+
+    def __init__(self):
+        super().__init__()
+        self.escrituras = 0
+        self.reconfiguraciones = 0
+
+    def write(self, texto):
+        self.escrituras += 1
+        return super().write(texto)
+
+    def reconfigure(self, **kwargs):
+        self.reconfiguraciones += 1
+        self.encoding = kwargs['encoding']
+
+
+class StreamAscii(io.StringIO):
+    """Stream ascii que no se puede reconfigurar"""
+
+    encoding = 'ascii'
+
+    def write(self, texto):
+        texto.encode('ascii')
+        return super().write(texto)
+
+
+def crear_email(asunto='Cambio de contraseña', destinatario='ana@example.com'):
+    email = EmailMultiAlternatives(
+        subject=asunto, body='Hola Ñandú', from_email='noreply@example.com', to=[destinatario]
+    )
+    email.attach_alternative('<p>Hola Ñandú</p>', 'text/html')
+    return email
+
+
+class TestUTF8ConsoleEmailBackend:
+    """Tests para UTF8ConsoleEmailBackend"""
+
+    def test_un_write_por_email(self):
+        stream = StreamContador()
+        backend = UTF8ConsoleEmailBackend(stream=stream)
+
+        enviados = backend.send_messages([crear_email(), crear_email(), crear_email()])
+
+        assert enviados == 3
+        assert stream.escrituras == 3
+        salida = stream.getvalue()
+        assert 'Subject: Cambio de contraseña' in salida
+        assert '[text/html]\n<p>Hola Ñandú</p>' in salida
+
+    def test_reconfigura_una_vez_por_instancia(self):
+        stream = StreamContador()
+        backend = UTF8ConsoleEmailBackend(stream=stream)
+
+        backend.send_messages([crear_email()])
+        backend.send_messages([crear_email()])
+
+        assert stream.reconfiguraciones == 1
+        assert stream.encoding == 'utf-8'
+
+    def test_stream_sin_utf8_reemplaza_caracteres(self):
+        stream = StreamAscii()
+
+        UTF8ConsoleEmailBackend(stream=stream).send_messages([crear_email()])
+
+        assert 'Subject: Cambio de contrase?a' in stream.getvalue()
+
+
+class TestMaildirEmailBackend:
+    """Tests para MaildirEmailBackend"""
+
+    def test_guarda_cada_email_en_maildir(self, tmp_path):
+        backend = MaildirEmailBackend(file_path=str(tmp_path / 'buzon'))
+
+        enviados = backend.send_messages([crear_email(destinatario=f'u{numero}@example.com') for numero in range(5)])
+
+        buzon = mailbox.Maildir(str(tmp_path / 'buzon'), create=False)
+        assert enviados == 5
+        assert len(buzon) == 5
+        mensaje = next(iter(buzon))
+        assert mensaje.get_content_type() == 'multipart/alternative'
+        assert [parte.get_content_type() for parte in mensaje.get_payload()] == ['text/plain', 'text/html']
+
+    def test_usa_email_file_path(self, settings, tmp_path):
+        settings.EMAIL_FILE_PATH = str(tmp_path)
+        conexion = get_connection('core.email_backends.MaildirEmailBackend')
+
+        EmailMessage('Asunto', 'Cuerpo', 'noreply@example.com', ['ana@example.com'], connection=conexion).send()
+
+        assert len(list((tmp_path / 'new').iterdir())) == 1
+
+    def test_requiere_ruta(self, settings):
+        settings.EMAIL_FILE_PATH = None
+
+        with pytest.raises(ImproperlyConfigured):
+            MaildirEmailBackend()
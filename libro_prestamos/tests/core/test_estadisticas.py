@@ -0,0 +1,195 @@
+"""
+Tests para las estadísticas del panel de inicio
+"""
+import pytest
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.services import (
+    calcular_estadisticas_usuario, obtener_estadisticas_usuario, recalcular_estadisticas
+)
+from libros.models import Libro
+from libros.utils import procesar_excel_libros
+from prestamos.models import Prestamo
+from prestamos.services import crear_prestamo_service, marcar_devuelto_service
+from usuarios.models import UserStats
+
+
+@pytest.fixture
+def datos_prestamos(user, another_user):
+    """Libros y préstamos de ambos usuarios en distintos estados"""
+    libro_prestado = Libro.objects.create(nombre='Prestado', autor='Autor', propietario=user, estado='prestado')
+    Libro.objects.create(nombre='Disponible', autor='Autor', propietario=user)
+    Libro.objects.create(nombre='Otro disponible', autor='Autor', propietario=user)
+    libro_ajeno = Libro.objects.create(nombre='Ajeno', autor='Autor', propietario=another_user, estado='prestado')
+    Prestamo.objects.create(libro=libro_prestado, prestador=user, prestatario=another_user)
+    Prestamo.objects.create(libro=libro_prestado, prestador=user, prestatario=another_user, devuelto=True)
+    Prestamo.objects.create(libro=libro_ajeno, prestador=another_user, prestatario=user)
+
+
+@pytest.mark.django_db
+class TestCalcularEstadisticasUsuario:
+    """Tests para calcular_estadisticas_usuario()"""
+
+    def test_contadores(self, user, datos_prestamos):
+        assert calcular_estadisticas_usuario(user) == {
+            'total_libros': 3,
+            'libros_disponibles': 2,
+            'prestamos_activos': 1,
+            'prestamos_recibidos': 1,
+        }
+
+    def test_usuario_sin_datos(self, user):
+        assert calcular_estadisticas_usuario(user) == {
+            'total_libros': 0,
+            'libros_disponibles': 0,
+            'prestamos_activos': 0,
+            'prestamos_recibidos': 0,
+        }
+
+    def test_una_sola_consulta(self, user, datos_prestamos, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            calcular_estadisticas_usuario(user)
+
+
+def estadisticas(usuario):
+    """Contadores guardados en UserStats"""
+    fila = UserStats.objects.get(usuario=usuario)
+    return {campo: getattr(fila, campo) for campo in UserStats.CONTADORES}
+
+
+@pytest.mark.django_db
+class TestUserStats:
+    """Tests para el mantenimiento incremental de UserStats"""
+
+    def test_se_calcula_al_leer_y_luego_cuesta_una_consulta(self, user, datos_prestamos, django_assert_num_queries):
+        assert not UserStats.objects.filter(usuario=user).exists()
+        primera = obtener_estadisticas_usuario(user)
+
+        with django_assert_num_queries(1):
+            segunda = obtener_estadisticas_usuario(user)
+
+        assert primera == segunda == calcular_estadisticas_usuario(user)
+
+    def test_crear_y_eliminar_libro(self, user):
+        recalcular_estadisticas(user)
+        libro = Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=user)
+
+        assert estadisticas(user)['total_libros'] == 1
+        assert estadisticas(user)['libros_disponibles'] == 1
+
+        libro.delete()
+
+        assert estadisticas(user) == calcular_estadisticas_usuario(user)
+
+    def test_prestar_y_devolver(self, user, another_user):
+        libro = Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=user)
+        recalcular_estadisticas(user)
+        recalcular_estadisticas(another_user)
+
+        prestamo, _ = crear_prestamo_service(libro.id, another_user.username, user)
+
+        assert estadisticas(user) == calcular_estadisticas_usuario(user)
+        assert estadisticas(user)['prestamos_activos'] == 1
+        assert estadisticas(another_user)['prestamos_recibidos'] == 1
+
+        marcar_devuelto_service(prestamo.id, user)
+
+        assert estadisticas(user) == calcular_estadisticas_usuario(user)
+        assert estadisticas(another_user) == calcular_estadisticas_usuario(another_user)
+
+    def test_eliminar_libro_prestado(self, user, another_user, datos_prestamos):
+        recalcular_estadisticas(user)
+        recalcular_estadisticas(another_user)
+
+        Libro.objects.get(nombre='Prestado').delete()
+
+        assert estadisticas(user) == calcular_estadisticas_usuario(user)
+        assert estadisticas(another_user) == calcular_estadisticas_usuario(another_user)
+
+    def test_carga_masiva(self, user, excel_file_valido):
+        recalcular_estadisticas(user)
+
+        procesar_excel_libros(excel_file_valido, user)
+
+        assert estadisticas(user)['total_libros'] == 3
+        assert estadisticas(user)['libros_disponibles'] == 3
+
+    def test_eliminar_usuario(self, user, another_user, datos_prestamos):
+        recalcular_estadisticas(user)
+        recalcular_estadisticas(another_user)
+
+        User.objects.filter(id=user.id).delete()
+
+        assert not UserStats.objects.filter(usuario_id=user.id).exists()
+        assert estadisticas(another_user) == calcular_estadisticas_usuario(another_user)
+
+
+@pytest.mark.django_db
+class TestComandoRecalcularEstadisticas:
+    """Tests para el comando recalcular_estadisticas"""
+
+    def test_reconstruye_contadores(self, user, datos_prestamos):
+        recalcular_estadisticas(user)
+        UserStats.objects.filter(usuario=user).update(total_libros=99)
+
+        call_command('recalcular_estadisticas', stdout=StringIO())
+
+        assert estadisticas(user) == calcular_estadisticas_usuario(user)
+
+    def test_verificar_informa_diferencias(self, user, datos_prestamos):
+        recalcular_estadisticas(user)
+        UserStats.objects.filter(usuario=user).update(prestamos_activos=5)
+        salida = StringIO()
+
+        with pytest.raises(CommandError):
+            call_command('recalcular_estadisticas', '--verificar', stdout=salida)
+
+        assert 'prestamos_activos=5 (real 1)' in salida.getvalue()
+        assert estadisticas(user)['prestamos_activos'] == 5
+
+    def test_verificar_sin_diferencias(self, user, datos_prestamos):
+        recalcular_estadisticas(user)
+        salida = StringIO()
+
+        call_command('recalcular_estadisticas', '--verificar', stdout=salida)
+
+        assert 'Contadores correctos' in salida.getvalue()
+
+
+@pytest.mark.django_db
+class TestVistaHome:
+    """Tests de la vista home con las estadísticas"""
+
+    def test_contexto(self, client, user, datos_prestamos):
+        client.force_login(user)
+
+        response = client.get(reverse('home'))
+
+        assert response.context['total_libros'] == 3
+        assert response.context['libros_disponibles'] == 2
+        assert response.context['prestamos_activos'] == 1
+        assert response.context['prestamos_recibidos'] == 1
+        assert len(response.context['ultimos_libros']) == 3
+
+    def test_consultas_no_dependen_de_los_datos(self, client, user, another_user, datos_prestamos):
+        recalcular_estadisticas(user)
+        recalcular_estadisticas(another_user)
+        client.force_login(another_user)
+        with CaptureQueriesContext(connection) as sin_datos:
+            client.get(reverse('home'))
+        client.force_login(user)
+
+        with CaptureQueriesContext(connection) as con_datos:
+            client.get(reverse('home'))
+
+        consultas_panel = [
+            q for q in con_datos.captured_queries
+            if 'libros_libro' in q['sql'] or 'usuarios_userstats' in q['sql']
+        ]
+        assert len(consultas_panel) == 2
+        assert len(con_datos) == len(sin_datos)
@@ -0,0 +1,154 @@
+"""
+Tests para la paginación por cursor (keyset)
+"""
+import pytest
+from datetime import timedelta
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from core import paginacion
+from core.paginacion import paginar_por_cursor
+from libros.models import Libro
+from prestamos.models import Prestamo
+
+
+def parametros(querystring=''):
+    return QueryDict(querystring, mutable=True)
+
+
+def recorrer_paginas(queryset, por_pagina):
+    """Recorre todas las páginas hacia adelante y retorna los ids vistos"""
+    vistos = []
+    pagina = paginar_por_cursor(queryset, parametros(), por_pagina=por_pagina)
+    vistos.extend(libro.id for libro in pagina)
+    while pagina.has_next:
+        pagina = paginar_por_cursor(queryset, parametros(pagina.querystring_siguiente), por_pagina=por_pagina)
+        vistos.extend(libro.id for libro in pagina)
+    return vistos, pagina
+
+
+@pytest.fixture
+def libros(user):
+    # Nombres repetidos para verificar el desempate por id
+    return [
+        Libro.objects.create(nombre=nombre, autor='Autor', propietario=user)
+        for nombre in ['Beta', 'alfa', 'Gamma', 'Beta', 'Álgebra', 'delta', 'Beta']
+    ]
+
+
+@pytest.mark.django_db
+class TestPaginarPorCursor:
+    """Tests para paginar_por_cursor()"""
+
+    def test_recorre_todas_las_filas_sin_repetir(self, libros):
+        queryset = Libro.objects.order_by('nombre_normalizado', 'id')
+
+        vistos, ultima = recorrer_paginas(queryset, por_pagina=3)
+
+        assert vistos == list(queryset.values_list('id', flat=True))
+        assert not ultima.has_next
+        assert ultima.has_previous
+
+    def test_orden_descendente(self, libros):
+        queryset = Libro.objects.order_by('-nombre_normalizado', '-id')
+
+        vistos, _ = recorrer_paginas(queryset, por_pagina=2)
+
+        assert vistos == list(queryset.values_list('id', flat=True))
+
+    def test_volver_a_la_pagina_anterior(self, libros):
+        queryset = Libro.objects.order_by('nombre_normalizado', 'id')
+        primera = paginar_por_cursor(queryset, parametros(), por_pagina=3)
+        segunda = paginar_por_cursor(queryset, parametros(primera.querystring_siguiente), por_pagina=3)
+
+        anterior = paginar_por_cursor(queryset, parametros(segunda.querystring_anterior), por_pagina=3)
+
+        assert [libro.id for libro in anterior] == [libro.id for libro in primera]
+        assert not anterior.has_previous
+        assert anterior.has_next
+
+    def test_cursor_invalido_muestra_primera_pagina(self, libros):
+        queryset = Libro.objects.order_by('nombre_normalizado', 'id')
+
+        pagina = paginar_por_cursor(queryset, parametros('after=manipulado'), por_pagina=3)
+
+        assert [libro.id for libro in pagina] == list(queryset.values_list('id', flat=True)[:3])
+
+    def test_cursor_con_fechas(self, user, another_user):
+        libro = Libro.objects.create(nombre='Libro', autor='Autor', propietario=user)
+        ahora = timezone.now()
+        for dias in range(5):
+            prestamo = Prestamo.objects.create(libro=libro, prestador=user, prestatario=another_user, devuelto=True)
+            Prestamo.objects.filter(id=prestamo.id).update(fecha_prestamo=ahora - timedelta(days=dias % 3))
+        queryset = Prestamo.objects.order_by('-fecha_prestamo', '-id')
+
+        vistos, _ = recorrer_paginas(queryset, por_pagina=2)
+
+        assert vistos == list(queryset.values_list('id', flat=True))
+
+    def test_conserva_otros_parametros(self, libros):
+        queryset = Libro.objects.order_by('nombre_normalizado', 'id')
+
+        pagina = paginar_por_cursor(queryset, parametros('q=beta&otro_after=x'), por_pagina=3)
+
+        siguiente = QueryDict(pagina.querystring_siguiente)
+        assert siguiente['q'] == 'beta'
+        assert siguiente['otro_after'] == 'x'
+        assert 'after' in siguiente
+
+    def test_total_aproximado_acotado(self, libros, monkeypatch):
+        monkeypatch.setattr(paginacion, 'LIMITE_TOTAL_APROXIMADO', 5)
+        queryset = Libro.objects.order_by('nombre_normalizado', 'id')
+
+        pagina = paginar_por_cursor(queryset, parametros(), por_pagina=3, con_total=True)
+
+        assert pagina.total_aproximado == 5
+        assert pagina.total_es_exacto is False
+
+    def test_requiere_orden_terminado_en_id(self, libros):
+        with pytest.raises(ValueError):
+            paginar_por_cursor(Libro.objects.order_by('nombre'), parametros())
+
+
+@pytest.mark.django_db
+class TestVistasPaginadas:
+    """Tests de integración de la paginación por cursor en las vistas"""
+
+    def test_catalogo_pagina_siguiente(self, client, user):
+        for numero in range(12):
+            Libro.objects.create(nombre=f'Libro {numero:02d}', autor='Autor', propietario=user)
+
+        primera = client.get(reverse('listar_libros'))
+        segunda = client.get(f"{reverse('listar_libros')}?{primera.context['libros'].querystring_siguiente}")
+
+        assert len(primera.context['libros']) == 10
+        assert primera.context['libros'].total_aproximado == 12
+        assert [libro.nombre for libro in segunda.context['libros']] == ['Libro 10', 'Libro 11']
+
+    def test_mis_libros_paginado(self, client, user, another_user):
+        for numero in range(11):
+            Libro.objects.create(nombre=f'Mío {numero:02d}', autor='Autor', propietario=user)
+        Libro.objects.create(nombre='Ajeno', autor='Autor', propietario=another_user)
+        client.force_login(user)
+
+        response = client.get(reverse('listar_mis_libros'))
+
+        assert len(response.context['libros']) == 10
+        assert response.context['libros'].has_next
+        assert response.context['libros'].total_aproximado == 11
+
+    def test_historial_listas_independientes(self, client, user, another_user):
+        libro = Libro.objects.create(nombre='Libro', autor='Autor', propietario=user)
+        libro_ajeno = Libro.objects.create(nombre='Ajeno', autor='Autor', propietario=another_user)
+        for _ in range(21):
+            Prestamo.objects.create(libro=libro, prestador=user, prestatario=another_user, devuelto=True)
+        Prestamo.objects.create(libro=libro_ajeno, prestador=another_user, prestatario=user)
+        client.force_login(user)
+
+        primera = client.get(reverse('historial_prestamos'))
+        realizados = primera.context['historial_realizados']
+        segunda = client.get(f"{reverse('historial_prestamos')}?{realizados.querystring_siguiente}")
+
+        assert len(realizados) == 20
+        assert len(segunda.context['historial_realizados']) == 1
+        assert len(segunda.context['historial_recibidos']) == 1
@@ -1,7 +1,12 @@
 """
 Tests para invalidación de sesiones
 """
+import os
+import subprocess
+import sys
+
 import pytest
+from django.conf import settings as django_settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.test import RequestFactory
@@ -9,6 +14,13 @@ from usuarios.models import Perfil
 from core.middleware import SessionInvalidationMiddleware
 from usuarios.views import cerrar_sesiones_todas
 from django.urls import reverse
+from django.core.cache import cache
+from django.test import Client
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.sesiones import (
+    CLAVE_AUTENTICADO_EN, CLAVE_EPOCA_SESION, epoca_de, fecha_de, obtener_epoca_usuario, sesion_vigente
+)
 
 
 @pytest.fixture
@@ -79,9 +91,8 @@ class TestSessionInvalidationMiddleware:
             invalidation_middleware = SessionInvalidationMiddleware(lambda req: None)
             invalidation_middleware(request)
             
-            # El middleware puede o no llamar a logout dependiendo de si encuentra la sesión en BD
-            # Esto es aceptable ya que el middleware tiene lógica de fallback
-            pass
+            # La sesión no tiene época (se creó antes de la invalidación)
+            mock_logout.assert_called_once_with(request)
 
 
 @pytest.mark.django_db
@@ -126,3 +137,132 @@ class TestCerrarSesionesTodas:
         messages = list(response.context.get('messages', []))
         success_messages = [m for m in messages if m.tags == 'success']
         assert len(success_messages) > 0
+
+
+@pytest.mark.django_db
+class TestEpocaDeSesiones:
+    """Tests para la invalidación por época de core.sesiones"""
+
+    def test_login_guarda_la_epoca_en_la_sesion(self, client, user):
+        client.force_login(user)
+
+        assert client.session[CLAVE_EPOCA_SESION] == 0
+
+    def test_camino_comun_sin_consultas(self, user, django_assert_num_queries):
+        request = RequestFactory().get('/')
+        request.session = {CLAVE_EPOCA_SESION: 0}
+        request.user = user
+        obtener_epoca_usuario(user.pk)  # Caché ya cargada
+
+        with django_assert_num_queries(0):
+            SessionInvalidationMiddleware(lambda req: None)(request)
+
+        assert CLAVE_EPOCA_SESION in request.session
+
+    def test_cache_vacia_consulta_el_perfil_una_vez(self, user, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            obtener_epoca_usuario(user.pk)
+            obtener_epoca_usuario(user.pk)
+
+    def test_cerrar_sesiones_invalida_otros_dispositivos(self, client, user):
+        otro_dispositivo = Client()
+        otro_dispositivo.force_login(user)
+        client.force_login(user)
+
+        client.post(reverse('cerrar_sesiones_todas'))
+
+        # La sesión actual sigue activa; la del otro dispositivo se cierra
+        assert client.get(reverse('perfil')).status_code == 200
+        assert otro_dispositivo.get(reverse('perfil')).status_code == 302
+        assert '_auth_user_id' not in otro_dispositivo.session
+
+    def test_login_posterior_sigue_activo(self, client, user):
+        user.perfil.session_invalidated_at = timezone.now()
+        user.perfil.save()
+
+        client.force_login(user)
+
+        assert client.get(reverse('perfil')).status_code == 200
+
+    def test_epoca_sin_cache_usa_el_perfil(self, client, user):
+        """Test que la invalidación se respeta aunque la caché se haya vaciado"""
+        otro_dispositivo = Client()
+        otro_dispositivo.force_login(user)
+        client.force_login(user)
+        client.post(reverse('cerrar_sesiones_todas'))
+
+        cache.clear()
+
+        assert otro_dispositivo.get(reverse('perfil')).status_code == 302
+
+
+@pytest.mark.django_db
+class TestMomentoDeAutenticacion:
+    """Tests para el momento de autenticación guardado en la sesión"""
+
+    def test_login_guarda_el_momento(self, client, user):
+        antes = timezone.now()
+
+        client.force_login(user)
+
+        autenticado_en = fecha_de(client.session[CLAVE_AUTENTICADO_EN])
+        assert antes <= autenticado_en <= timezone.now()
+
+    def test_sesion_sin_epoca_usa_el_momento_de_autenticacion(self, user):
+        invalidada_en = timezone.now()
+        user.perfil.session_invalidated_at = invalidada_en
+        user.perfil.save()
+        request = RequestFactory().get('/')
+        request.user = user
+
+        request.session = {CLAVE_AUTENTICADO_EN: epoca_de(invalidada_en) + 1}
+        assert sesion_vigente(request)
+
+        request.session = {CLAVE_AUTENTICADO_EN: epoca_de(invalidada_en) - 1}
+        assert not sesion_vigente(request)
+
+    def test_pagina_muestra_inicio_de_sesion(self, client, user):
+        client.force_login(user)
+
+        response = client.get(reverse('cerrar_sesiones_todas'))
+
+        assert 'Sesión actual iniciada el' in response.content.decode()
+
+    def test_peticion_autenticada_no_lee_django_session(self, client, user, settings):
+        """Test que con cached_db la sesión y su validez salen de la caché"""
+        settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+        client.force_login(user)
+        client.get(reverse('perfil'))
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = client.get(reverse('perfil'))
+
+        assert response.status_code == 200
+        assert not [c for c in consultas.captured_queries if 'django_session' in c['sql']]
+
+
+class TestMotorDeSesiones:
+    """Tests para la elección de SESSION_ENGINE en settings.py"""
+
+    def cargar_settings(self, **variables):
+        """Importa los settings en otro proceso, con CACHE_URL local y las variables indicadas."""
+        entorno = {
+            clave: valor for clave, valor in os.environ.items() if clave != 'SESSION_ENGINE'
+        }
+        entorno.update(DJANGO_SETTINGS_MODULE='libro_prestamos.settings', CACHE_URL='locmemcache://')
+        entorno.update(variables)
+        return subprocess.run(
+            [sys.executable, '-c', 'from django.conf import settings; print(settings.SESSION_ENGINE)'],
+            cwd=django_settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+        )
+
+    def test_sin_cache_compartida_usa_db(self):
+        resultado = self.cargar_settings()
+
+        assert resultado.stdout.strip() == 'django.contrib.sessions.backends.db'
+
+    def test_cached_db_con_cache_local_se_rechaza(self):
+        resultado = self.cargar_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+
+        assert resultado.returncode != 0
+        assert 'ImproperlyConfigured' in resultado.stderr
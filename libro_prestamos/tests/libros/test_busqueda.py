@@ -0,0 +1,160 @@
+"""
+Tests para la búsqueda de texto completo del catálogo.
+"""
+import pytest
+from io import BytesIO
+from openpyxl import Workbook
+from django.urls import reverse
+from django.test import override_settings
+from libros.models import Libro
+from libros.search import (
+    BusquedaSimple, BusquedaSQLiteFTS, buscar_libros, extraer_terminos, obtener_motor
+)
+from libros.utils import procesar_excel_libros
+
+
+@pytest.fixture
+def indice_fts(db):
+    """Instala la tabla FTS5 en la base de tests (que se crea sin migraciones)"""
+    motor = obtener_motor(verificar=False)
+    motor.instalar()
+    yield motor
+    motor.desinstalar()
+    motor.olvidar_estado()
+
+
+def test_extraer_terminos_descarta_sintaxis():
+    """Test que los operadores del usuario no llegan al motor"""
+    assert extraer_terminos('García "Márquez" OR -x*') == ['garcía', 'márquez', 'or', 'x']
+
+
+@pytest.mark.django_db
+class TestBusquedaSQLiteFTS:
+    """Tests para el motor FTS5"""
+
+    def test_busca_en_todos_los_campos(self, indice_fts, user):
+        """Test que indexa nombre, autor, editorial, ISBN y descripción"""
+        libro = Libro.objects.create(
+            nombre='Rayuela', autor='Julio Cortázar', editorial='Sudamericana',
+            isbn='9788437604572', descripcion='Novela experimental', propietario=user
+        )
+
+        for query in ['rayuela', 'cortazar', 'sudamericana', '9788437604572', 'experimental']:
+            assert list(buscar_libros(Libro.objects.all(), query)) == [libro]
+
+    def test_ignora_acentos_y_busca_por_prefijo(self, indice_fts, user):
+        """Test que 'garcia marq' encuentra 'García Márquez'"""
+        libro = Libro.objects.create(
+            nombre='Cien años de soledad', autor='Gabriel García Márquez', propietario=user
+        )
+
+        assert list(buscar_libros(Libro.objects.all(), 'garcia marq')) == [libro]
+
+    def test_ordena_por_relevancia(self, indice_fts, user):
+        """Test que el libro con más coincidencias aparece primero"""
+        poco_relevante = Libro.objects.create(
+            nombre='Antología', autor='Varios', descripcion='Incluye un cuento de Borges',
+            propietario=user
+        )
+        relevante = Libro.objects.create(
+            nombre='Borges esencial', autor='Jorge Luis Borges', propietario=user
+        )
+
+        resultados = list(buscar_libros(Libro.objects.all(), 'borges'))
+
+        assert resultados == [relevante, poco_relevante]
+
+    def test_sincroniza_edicion_y_borrado(self, indice_fts, user):
+        """Test que las señales mantienen el índice al editar y eliminar"""
+        libro = Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=user)
+        libro.nombre = 'El Aleph'
+        libro.save()
+
+        assert not buscar_libros(Libro.objects.all(), 'ficciones').exists()
+        assert buscar_libros(Libro.objects.all(), 'aleph').exists()
+
+        libro.delete()
+
+        assert not buscar_libros(Libro.objects.all(), 'aleph').exists()
+
+    def test_indexa_libros_de_carga_masiva(self, indice_fts, user):
+        """Test que los libros creados con bulk_create también se indexan"""
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['Nombre', 'Autor'])
+        ws.append(['Pedro Páramo', 'Juan Rulfo'])
+        excel_file = BytesIO()
+        wb.save(excel_file)
+        excel_file.seek(0)
+
+        procesar_excel_libros(excel_file, user)
+
+        assert buscar_libros(Libro.objects.all(), 'rulfo').count() == 1
+
+    def test_busqueda_sin_terminos_no_devuelve_nada(self, indice_fts, user):
+        """Test que una búsqueda con solo signos no rompe la consulta"""
+        Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=user)
+
+        assert not buscar_libros(Libro.objects.all(), '"*-').exists()
+
+
+@pytest.mark.django_db
+class TestSeleccionDeMotor:
+    """Tests para la selección del motor de búsqueda"""
+
+    def test_sin_indice_usa_busqueda_simple(self):
+        """Test que sin la tabla FTS instalada se usa icontains"""
+        assert isinstance(obtener_motor(), BusquedaSimple)
+        assert not isinstance(obtener_motor(), BusquedaSQLiteFTS)
+
+    def test_con_indice_usa_fts(self, indice_fts):
+        """Test que en SQLite con la tabla instalada se usa FTS5"""
+        assert isinstance(obtener_motor(), BusquedaSQLiteFTS)
+
+    @override_settings(LIBROS_SEARCH_BACKEND='libros.search.BusquedaSimple')
+    def test_motor_configurable(self, indice_fts):
+        """Test que el setting permite forzar un motor"""
+        assert type(obtener_motor()) is BusquedaSimple
+
+
+@pytest.mark.django_db
+class TestVistaListarLibros:
+    """Tests de integración de la búsqueda en listar_libros"""
+
+    def test_vista_usa_el_motor_de_busqueda(self, client, indice_fts, user):
+        """Test que la vista devuelve los resultados del índice"""
+        libro = Libro.objects.create(nombre='Pedro Páramo', autor='Juan Rulfo', propietario=user)
+        Libro.objects.create(nombre='Rayuela', autor='Julio Cortázar', propietario=user)
+
+        response = client.get(reverse('listar_libros'), {'q': 'paramo'})
+
+        assert response.status_code == 200
+        assert list(response.context['libros']) == [libro]
+
+    def test_vista_funciona_sin_indice(self, client, user):
+        """Test que la vista sigue funcionando con la búsqueda simple"""
+        libro = Libro.objects.create(nombre='Pedro Páramo', autor='Juan Rulfo', propietario=user)
+
+        response = client.get(reverse('listar_libros'), {'q': 'Rulfo'})
+
+        assert response.status_code == 200
+        assert list(response.context['libros']) == [libro]
+
+    @pytest.mark.parametrize('query', [' ', '-', '!!', '"*-'])
+    def test_busqueda_en_blanco_o_solo_signos(self, client, indice_fts, user, query):
+        """Test que una búsqueda sin términos muestra una página vacía en lugar de un error"""
+        Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=user)
+
+        response = client.get(reverse('listar_libros'), {'q': query})
+
+        assert response.status_code == 200
+        assert list(response.context['libros']) == []
+
+    def test_busqueda_en_blanco_sin_indice(self, client, user):
+        """Test que la búsqueda simple tampoco rompe la paginación con una búsqueda en blanco"""
+        Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=user)
+
+        response = client.get(reverse('listar_libros'), {'q': ' '})
+
+        assert response.status_code == 200
+        assert list(response.context['libros']) == []
@@ -1,13 +1,18 @@
 """
-Tests para la funcionalidad de carga masiva de libros desde archivos Excel.
+Tests para la funcionalidad de carga masiva de libros desde archivos Excel, CSV y ODS.
 """
 import pytest
+import zipfile
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from io import BytesIO
-from openpyxl import Workbook
+from openpyxl import Workbook, load_workbook
+from libros import utils
 from libros.models import Libro
-from libros.utils import procesar_excel_libros, generar_plantilla_excel
+from libros.utils import (
+    procesar_excel_libros, procesar_filas_libros, procesar_archivo_libros, generar_plantilla_excel,
+    leer_filas_csv, leer_filas_ods, obtener_plantilla_excel
+)
 from libros.views import cargar_libros_masivo, descargar_plantilla_excel
 
 
@@ -57,6 +62,18 @@ class TestProcesarExcelLibros:
         # Verificar que no se creó el duplicado
         assert Libro.objects.filter(propietario=user).count() == 1
     
+    def test_isbn_de_otro_usuario(self, user, another_user):
+        """Test que el ISBN se busca entre los libros de todos los usuarios (es único en la base)"""
+        Libro.objects.create(nombre='Ajeno', autor='Autor', isbn='9781111111111', propietario=another_user)
+        filas = [('Nombre', 'Autor', 'ISBN'), ('Mío', 'Autor', '9781111111111'), ('Otro', 'Autor', '9782222222222')]
+
+        resultados = procesar_filas_libros(iter(filas), user)
+
+        assert resultados['total_creados'] == 1
+        assert resultados['duplicados'][0]['fila'] == 2
+        assert resultados['duplicados'][0]['tipo'] == 'ISBN (registrado por otro usuario)'
+        assert Libro.objects.get(propietario=user).isbn == '9782222222222'
+    
     def test_deteccion_duplicados_por_nombre_autor(self, user):
         """Test detección de duplicados por nombre+autor"""
         # Crear libro existente
@@ -82,6 +99,95 @@ class TestProcesarExcelLibros:
         assert resultados['duplicados'][0]['tipo'] == 'Nombre+Autor'
         assert len(resultados['libros_creados']) == 0
     
+    def test_deteccion_duplicados_dentro_del_archivo(self, excel_file_con_duplicados, user):
+        """Test que las filas repetidas en el mismo archivo se detectan como duplicados"""
+        resultados = procesar_excel_libros(excel_file_con_duplicados, user)
+        
+        assert len(resultados['libros_creados']) == 1
+        assert [dup['fila'] for dup in resultados['duplicados']] == [3, 4]
+        assert resultados['duplicados'][0]['tipo'].startswith('ISBN')
+        assert resultados['duplicados'][1]['tipo'].startswith('Nombre+Autor')
+        assert Libro.objects.filter(propietario=user).count() == 1
+    
+    def test_consultas_constantes_por_archivo(self, user, django_assert_max_num_queries):
+        """Test que la detección de duplicados no hace una consulta por fila"""
+        for numero in range(20):
+            Libro.objects.create(nombre=f'Existente {numero}', autor='Autor', propietario=user)
+        
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['Nombre', 'Autor', 'ISBN'])
+        for numero in range(200):
+            ws.append([f'Existente {numero}', 'Autor', f'978{numero:010d}'])
+        excel_file = BytesIO()
+        wb.save(excel_file)
+        excel_file.seek(0)
+        
+        # Libros existentes + ISBN del lote + savepoint + bulk_create (SQLite lo divide
+        # en lotes por su límite de parámetros) + contadores de UserStats
+        with django_assert_max_num_queries(7):
+            resultados = procesar_excel_libros(excel_file, user)
+        
+        assert resultados['total_duplicados'] == 20
+        assert resultados['total_creados'] == 180
+    
+    def test_crea_libros_en_lotes(self, user, monkeypatch):
+        """Test que los libros se guardan en lotes a medida que se leen las filas"""
+        monkeypatch.setattr('libros.utils.TAMANIO_LOTE', 2)
+        monkeypatch.setattr('libros.utils.FILAS_POR_PROGRESO', 3)
+        filas = [('Nombre', 'Autor')] + [(f'Libro {numero}', 'Autor') for numero in range(7)]
+        creados_en_cada_progreso = []
+        
+        def progreso(parciales):
+            creados_en_cada_progreso.append(Libro.objects.filter(propietario=user).count())
+        
+        resultados = procesar_filas_libros(iter(filas), user, progreso=progreso)
+        
+        assert resultados['total_creados'] == 7
+        assert Libro.objects.filter(propietario=user).count() == 7
+        # Al informar el progreso ya se guardaron los lotes completos anteriores
+        assert creados_en_cada_progreso == [2, 4]
+    
+    def test_lote_con_conflicto_no_corta_el_archivo(self, user, another_user, monkeypatch):
+        """Test que si un lote falla por un ISBN ya registrado se guardan las demás filas"""
+        monkeypatch.setattr('libros.utils.TAMANIO_LOTE', 10)
+        # Simula que otra carga registró el ISBN después de la detección de duplicados
+        monkeypatch.setattr(utils.DetectorDuplicados, 'es_duplicado', lambda self, datos: (False, None))
+        Libro.objects.create(nombre='Ajeno', autor='Autor', isbn='9781111111111', propietario=another_user)
+        filas = [('Nombre', 'Autor', 'ISBN'), ('Mío', 'Autor', '9781111111111')]
+        filas += [(f'Libro {numero}', 'Autor', f'978{numero:010d}') for numero in range(29)]
+
+        resultados = procesar_filas_libros(iter(filas), user)
+
+        assert resultados['total_procesado'] == 30
+        assert resultados['total_creados'] == 29
+        assert resultados['errores'] == [
+            {'fila': 2, 'mensaje': 'Fila 2: el ISBN 9781111111111 ya está registrado'}
+        ]
+        assert Libro.objects.filter(propietario=user).count() == 29
+    
+    def test_resumen_acota_el_detalle(self, user, monkeypatch):
+        """Test que el resumen cuenta todas las filas pero detalla solo las primeras"""
+        monkeypatch.setattr('libros.utils.MAX_DETALLES_RESULTADO', 3)
+        filas = [('Nombre', 'Autor')] + [(f'Libro {numero}', 'Autor') for numero in range(5)] + [('', 'Autor')] * 4
+        
+        resultados = procesar_filas_libros(iter(filas), user)
+        
+        assert resultados['total_procesado'] == 9
+        assert resultados['total_creados'] == 5
+        assert resultados['total_errores'] == 4
+        assert len(resultados['libros_creados']) == 3
+        assert [error['fila'] for error in resultados['errores']] == [7, 8, 9]
+    
+    def test_filas_mas_cortas_que_el_encabezado(self, user):
+        """Test que las columnas faltantes al final de la fila se toman como vacías"""
+        filas = [('Nombre', 'Autor', 'ISBN'), ('Rayuela', 'Julio Cortázar')]
+        
+        resultados = procesar_filas_libros(iter(filas), user)
+        
+        assert resultados['total_creados'] == 1
+        assert Libro.objects.get(propietario=user).isbn is None
+    
     def test_manejo_filas_con_errores(self, excel_file_con_errores, user):
         """Test manejo de filas con errores de validación"""
         resultados = procesar_excel_libros(excel_file_con_errores, user)
@@ -181,6 +287,128 @@ class TestProcesarExcelLibros:
         assert any('obligatorias' in error['mensaje'].lower() for error in resultados['errores'])
 
 
+def crear_ods(filas_xml):
+    """Arma un .ods mínimo con el XML de las filas de la primera hoja"""
+    contenido = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<office:document-content'
+        ' xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"'
+        ' xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"'
+        ' xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">'
+        '<office:body><office:spreadsheet>'
+        f'<table:table table:name="Libros">{filas_xml}</table:table>'
+        '<table:table table:name="Otra"><table:table-row><table:table-cell>'
+        '<text:p>Ignorada</text:p></table:table-cell></table:table-row></table:table>'
+        '</office:spreadsheet></office:body></office:document-content>'
+    )
+    archivo = BytesIO()
+    with zipfile.ZipFile(archivo, 'w') as documento:
+        documento.writestr('mimetype', 'application/vnd.oasis.opendocument.spreadsheet')
+        documento.writestr('content.xml', contenido)
+    archivo.seek(0)
+    return archivo
+
+
+def celda(valor):
+    return f'<table:table-cell><text:p>{valor}</text:p></table:table-cell>'
+
+
+class TestLeerFilasCSV:
+    """Tests para la lectura de archivos CSV"""
+    
+    def test_lee_utf8_con_bom_y_coma(self):
+        archivo = BytesIO('\ufeffNombre,Autor\n"Rayuela, edición especial",Julio Cortázar\n'.encode('utf-8'))
+        
+        filas = list(leer_filas_csv(archivo))
+        
+        assert filas == [('Nombre', 'Autor'), ('Rayuela, edición especial', 'Julio Cortázar')]
+    
+    def test_detecta_punto_y_coma_y_latin1(self):
+        archivo = BytesIO('Título;Autor;ISBN\nPedro Páramo;Juan Rulfo;\n'.encode('latin-1'))
+        
+        filas = list(leer_filas_csv(archivo))
+        
+        assert filas == [('Título', 'Autor', 'ISBN'), ('Pedro Páramo', 'Juan Rulfo', None)]
+    
+    def test_no_cierra_el_archivo(self):
+        archivo = BytesIO(b'Nombre,Autor\nFicciones,Borges\n')
+        
+        list(leer_filas_csv(archivo))
+        
+        assert not archivo.closed
+    
+    def test_abandonar_el_lector_con_el_archivo_cerrado(self):
+        """Test que cerrar el generador a mitad del archivo no falla si el archivo ya se cerró"""
+        archivo = BytesIO(b'Nombre,Autor\nFicciones,Borges\n')
+        filas = leer_filas_csv(archivo)
+        next(filas)
+        archivo.close()
+        
+        filas.close()
+
+
+class TestLeerFilasODS:
+    """Tests para la lectura de archivos OpenDocument"""
+    
+    def test_lee_la_primera_hoja(self):
+        archivo = crear_ods(
+            f'<table:table-row>{celda("Nombre")}{celda("Autor")}</table:table-row>'
+            f'<table:table-row>{celda("Ficciones")}{celda("Borges")}</table:table-row>'
+        )
+        
+        assert list(leer_filas_ods(archivo)) == [('Nombre', 'Autor'), ('Ficciones', 'Borges')]
+    
+    def test_expande_celdas_repetidas_y_descarta_relleno(self):
+        archivo = crear_ods(
+            f'<table:table-row>{celda("Nombre")}<table:table-cell/>{celda("Autor")}'
+            '<table:table-cell table:number-columns-repeated="16000"/></table:table-row>'
+            f'<table:table-row>{celda("Rayuela")}<table:table-cell/>{celda("Cortázar")}</table:table-row>'
+            '<table:table-row table:number-rows-repeated="1048000">'
+            '<table:table-cell table:number-columns-repeated="1024"/></table:table-row>'
+        )
+        
+        assert list(leer_filas_ods(archivo)) == [
+            ('Nombre', None, 'Autor'), ('Rayuela', None, 'Cortázar')
+        ]
+
+
+@pytest.mark.django_db
+class TestProcesarArchivoLibros:
+    """Tests para procesar_archivo_libros() con los distintos formatos"""
+    
+    def test_csv_comparte_validacion_y_duplicados(self, user):
+        Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=user)
+        archivo = BytesIO(
+            'Título,Escritor,ISBN\n'
+            'FICCIONES,borges,\n'
+            ',Autor sin título,\n'
+            'El Aleph,Borges,978-950-04-0000-1\n'.encode('utf-8')
+        )
+        
+        resultados = procesar_archivo_libros(archivo, 'catalogo.csv', user)
+        
+        assert resultados['total_procesado'] == 3
+        assert resultados['total_creados'] == 1
+        assert resultados['total_duplicados'] == 1
+        assert resultados['total_errores'] == 1
+        assert Libro.objects.get(nombre='El Aleph').isbn == '9789500400001'
+    
+    def test_ods(self, user):
+        archivo = crear_ods(
+            f'<table:table-row>{celda("Nombre")}{celda("Autor")}</table:table-row>'
+            f'<table:table-row>{celda("Ficciones")}{celda("Borges")}</table:table-row>'
+        )
+        
+        resultados = procesar_archivo_libros(archivo, 'catalogo.ODS', user)
+        
+        assert resultados['total_creados'] == 1
+    
+    def test_excel_por_defecto(self, excel_file_valido, user):
+        resultados = procesar_archivo_libros(excel_file_valido, 'libros.xlsx', user)
+        
+        assert resultados['total_creados'] == 3
+
+
 class TestGenerarPlantillaExcel:
     """Tests para la función generar_plantilla_excel()"""
     
@@ -216,6 +444,10 @@ class TestGenerarPlantillaExcel:
 
 class TestVistaCargarLibrosMasivo:
     """Tests para la vista cargar_libros_masivo()"""
+
+    @pytest.fixture(autouse=True)
+    def procesar_en_la_peticion(self, settings):
+        settings.LIBROS_IMPORTACION_MAX_BYTES_SINCRONO = 32 * 1024
     
     @pytest.mark.django_db
     def test_carga_exitosa_archivo_valido(self, client, user, excel_file_valido):
@@ -317,6 +549,19 @@ class TestVistaCargarLibrosMasivo:
         assert response.context['mostrar_resultados'] is True
 
 
+    @pytest.mark.django_db
+    def test_carga_csv(self, client, user):
+        """Test que la vista acepta archivos CSV"""
+        client.force_login(user)
+        archivo = SimpleUploadedFile('libros.csv', 'Nombre;Autor\nRayuela;Julio Cortázar\n'.encode('utf-8'))
+        
+        response = client.post('/libros/cargar-masivo/', {'archivo_excel': archivo})
+        
+        assert response.status_code == 200
+        assert response.context['resultados']['total_creados'] == 1
+        assert Libro.objects.filter(propietario=user, nombre='Rayuela').exists()
+
+
 class TestVistaDescargarPlantillaExcel:
     """Tests para la vista descargar_plantilla_excel()"""
     
@@ -331,3 +576,50 @@ class TestVistaDescargarPlantillaExcel:
         assert response['Content-Type'] == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         assert 'attachment' in response['Content-Disposition']
         assert 'plantilla_libros.xlsx' in response['Content-Disposition']
+    
+    @pytest.mark.django_db
+    def test_plantilla_se_genera_una_vez(self, client, user, monkeypatch):
+        """Test que la plantilla se genera una sola vez por proceso"""
+        obtener_plantilla_excel.cache_clear()
+        llamadas = []
+        original = utils.generar_plantilla_excel
+        monkeypatch.setattr(utils, 'generar_plantilla_excel', lambda: llamadas.append(1) or original())
+        client.force_login(user)
+        
+        primera = client.get('/libros/descargar-plantilla/')
+        segunda = client.get('/libros/descargar-plantilla/')
+        obtener_plantilla_excel.cache_clear()
+        
+        assert len(llamadas) == 1
+        assert primera.content == segunda.content
+        load_workbook(BytesIO(primera.content))
+    
+    @pytest.mark.django_db
+    def test_cabeceras_de_cache_y_304(self, client, user):
+        """Test que una descarga repetida con If-None-Match responde 304"""
+        client.force_login(user)
+        
+        response = client.get('/libros/descargar-plantilla/')
+        repetida = client.get('/libros/descargar-plantilla/', HTTP_IF_NONE_MATCH=response['ETag'])
+        
+        assert response['ETag'].startswith('"')
+        assert 'private' in response['Cache-Control']
+        assert 'max-age=86400' in response['Cache-Control']
+        assert repetida.status_code == 304
+        assert repetida.content == b''
+    
+    @pytest.mark.django_db
+    def test_etag_no_depende_de_cuando_se_genero(self, client, user, monkeypatch):
+        """Test que el ETag es el mismo aunque otro proceso genere bytes distintos"""
+        client.force_login(user)
+        obtener_plantilla_excel.cache_clear()
+        primera = client.get('/libros/descargar-plantilla/')
+        
+        # openpyxl guarda la fecha de creación: otro proceso arma otros bytes
+        obtener_plantilla_excel.cache_clear()
+        monkeypatch.setattr(utils, 'generar_plantilla_excel', lambda: BytesIO(b'generada en otro momento'))
+        repetida = client.get('/libros/descargar-plantilla/', HTTP_IF_NONE_MATCH=primera['ETag'])
+        obtener_plantilla_excel.cache_clear()
+        
+        assert repetida.status_code == 304
+        assert repetida['ETag'] == primera['ETag']
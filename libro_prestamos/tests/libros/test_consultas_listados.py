@@ -0,0 +1,65 @@
+"""
+Tests que fijan la cantidad de consultas de los listados de libros,
+para detectar regresiones N+1 (una consulta extra por libro o propietario).
+"""
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from libros.models import Libro
+from usuarios.models import Perfil
+
+
+def crear_libros_con_propietarios_distintos(cantidad):
+    for numero in range(cantidad):
+        propietario = User.objects.create_user(username=f'propietario{numero}', password='x')
+        Perfil.objects.create(usuario=propietario, ciudad=f'Ciudad {numero}', pais='Argentina')
+        Libro.objects.create(nombre=f'Libro {numero}', autor='Autor', propietario=propietario)
+
+
+@pytest.mark.django_db
+class TestConsultasListados:
+    """Tests de cantidad de consultas por vista"""
+
+    # Página de libros + total acotado
+    CONSULTAS_CATALOGO = 2
+    # Usuario + página de libros + total acotado (la sesión y su
+    # invalidación salen de la caché, ver core/sesiones.py)
+    CONSULTAS_CATALOGO_AUTENTICADO = 3
+
+    @pytest.fixture(autouse=True)
+    def sesiones_en_cache(self, settings):
+        # El motor que se usa con una caché compartida (CACHE_URL)
+        settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+    def test_catalogo_anonimo(self, client, django_assert_num_queries):
+        crear_libros_con_propietarios_distintos(10)
+
+        with django_assert_num_queries(self.CONSULTAS_CATALOGO):
+            response = client.get(reverse('listar_libros'))
+
+        assert 'Ciudad 9' in response.content.decode()
+
+    def test_catalogo_con_busqueda(self, client, django_assert_num_queries):
+        crear_libros_con_propietarios_distintos(10)
+
+        with django_assert_num_queries(self.CONSULTAS_CATALOGO):
+            response = client.get(reverse('listar_libros'), {'q': 'libro'})
+
+        assert len(response.context['libros']) == 10
+
+    def test_catalogo_autenticado(self, client, user, django_assert_num_queries):
+        crear_libros_con_propietarios_distintos(10)
+        client.force_login(user)
+
+        with django_assert_num_queries(self.CONSULTAS_CATALOGO_AUTENTICADO):
+            client.get(reverse('listar_libros'))
+
+    def test_mis_libros(self, client, user, django_assert_num_queries):
+        for numero in range(25):
+            Libro.objects.create(nombre=f'Libro {numero}', autor='Autor', propietario=user)
+        client.force_login(user)
+
+        with django_assert_num_queries(self.CONSULTAS_CATALOGO_AUTENTICADO):
+            response = client.get(reverse('listar_mis_libros'))
+
+        assert 'Buenos Aires' in response.content.decode()
@@ -0,0 +1,131 @@
+"""
+Tests para la exportación del catálogo a CSV y Excel.
+"""
+import csv
+import pytest
+from io import BytesIO, StringIO
+from openpyxl import load_workbook
+from django.urls import reverse
+from libros.models import Libro
+from libros.utils import COLUMNAS_EXPORTACION, escapar_celda, generar_csv_libros, procesar_excel_libros
+
+
+def contenido(response):
+    return b''.join(response.streaming_content)
+
+
+@pytest.fixture
+def libros(user, another_user):
+    return [
+        Libro.objects.create(nombre='Rayuela', autor='Julio Cortázar', isbn='9788437604572', propietario=user),
+        Libro.objects.create(nombre='Ficciones', autor='Borges', editorial='Sur', propietario=user),
+        Libro.objects.create(nombre='Ajeno', autor='Otro', propietario=another_user),
+    ]
+
+
+class TestEscaparCelda:
+    """Tests para escapar_celda()"""
+
+    @pytest.mark.parametrize('valor', ['=1+1', '+1', '-1', '@A1', '\tx', '\rx'])
+    def test_formulas(self, valor):
+        assert escapar_celda(valor) == "'" + valor
+
+    @pytest.mark.parametrize('valor', ['Rayuela', '9788437604572', '', 'a=b'])
+    def test_texto_comun(self, valor):
+        assert escapar_celda(valor) == valor
+
+    def test_nulo(self):
+        assert escapar_celda(None) == ''
+
+
+@pytest.mark.django_db
+class TestGenerarCSV:
+    """Tests para generar_csv_libros()"""
+
+    def test_una_fila_por_fragmento(self, libros):
+        fragmentos = list(generar_csv_libros(Libro.objects.order_by('nombre_normalizado', 'id')))
+
+        assert len(fragmentos) == 4
+        assert fragmentos[0].startswith('﻿'.encode('utf-8'))
+
+    def test_escapa_formulas(self, user):
+        Libro.objects.create(
+            nombre='=HYPERLINK("http://ejemplo.com","click")', autor='+cmd|calc', editorial='@SUM(A1)',
+            descripcion='-2+3', propietario=user
+        )
+
+        texto = b''.join(generar_csv_libros(Libro.objects.all())).decode('utf-8-sig')
+        fila = list(csv.reader(StringIO(texto)))[1]
+
+        assert fila[:5] == ['\'=HYPERLINK("http://ejemplo.com","click")', "'+cmd|calc", "'@SUM(A1)", '', "'-2+3"]
+
+    def test_consultas_no_crecen_con_los_libros(self, user, django_assert_num_queries):
+        Libro.objects.bulk_create([
+            Libro(nombre=f'Libro {numero}', autor='Autor', propietario=user) for numero in range(50)
+        ])
+
+        with django_assert_num_queries(1):
+            list(generar_csv_libros(Libro.objects.all()))
+
+
+@pytest.mark.django_db
+class TestVistasExportacion:
+    """Tests para las vistas de exportación"""
+
+    def test_mis_libros_csv(self, client, user, libros):
+        client.force_login(user)
+
+        response = client.get(reverse('exportar_mis_libros', args=['csv']))
+
+        assert response.streaming
+        assert response['Content-Type'] == 'text/csv; charset=utf-8'
+        assert 'mis_libros.csv' in response['Content-Disposition']
+        filas = list(csv.reader(StringIO(contenido(response).decode('utf-8-sig'))))
+        assert filas[0] == COLUMNAS_EXPORTACION
+        assert [fila[0] for fila in filas[1:]] == ['Ficciones', 'Rayuela']
+        assert filas[2][3] == '9788437604572'
+
+    def test_catalogo_excel(self, client, user, libros):
+        client.force_login(user)
+
+        response = client.get(reverse('exportar_catalogo', args=['xlsx']))
+
+        assert response.streaming
+        worksheet = load_workbook(BytesIO(contenido(response)), read_only=True).active
+        filas = list(worksheet.iter_rows(values_only=True))
+        assert list(filas[0]) == COLUMNAS_EXPORTACION
+        assert [fila[0] for fila in filas[1:]] == ['Ajeno', 'Ficciones', 'Rayuela']
+
+    def test_excel_no_escribe_formulas(self, client, user):
+        Libro.objects.create(nombre='=HYPERLINK("http://ejemplo.com")', autor='Autor', propietario=user)
+        client.force_login(user)
+
+        response = client.get(reverse('exportar_catalogo', args=['xlsx']))
+
+        worksheet = load_workbook(BytesIO(contenido(response))).active
+        celda = worksheet['A2']
+        assert celda.data_type == 's'
+        assert celda.value == '\'=HYPERLINK("http://ejemplo.com")'
+
+    def test_exportacion_se_puede_reimportar(self, client, user, libros):
+        """Test que el Excel exportado tiene el formato de la carga masiva"""
+        client.force_login(user)
+        response = client.get(reverse('exportar_mis_libros', args=['xlsx']))
+        archivo = BytesIO(contenido(response))
+        Libro.objects.filter(propietario=user).delete()
+
+        resultados = procesar_excel_libros(archivo, user)
+
+        assert resultados['total_creados'] == 2
+
+    def test_formato_invalido(self, client, user):
+        client.force_login(user)
+
+        response = client.get(reverse('exportar_catalogo', args=['pdf']))
+
+        assert response.status_code == 404
+
+    def test_requiere_login(self, client, libros):
+        response = client.get(reverse('exportar_catalogo', args=['csv']))
+
+        assert response.status_code == 302
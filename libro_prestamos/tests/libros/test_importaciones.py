@@ -0,0 +1,230 @@
+"""
+Tests para la carga masiva en segundo plano (ImportJob).
+"""
+from datetime import timedelta
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from libros.models import Libro, ImportJob
+from libros.services import (
+    encolar_importacion, reclamar_importacion, tomar_siguiente_importacion, ejecutar_importacion,
+    fallar_importaciones_vencidas, MENSAJE_INTERRUMPIDA
+)
+
+
+def archivo_subido(excel_file, nombre='libros.xlsx'):
+    return SimpleUploadedFile(nombre, excel_file.getvalue())
+
+
+def interrumpir(job, hace=timedelta(seconds=1)):
+    """Simula un proceso que reclamó el trabajo y murió: la reserva ya venció."""
+    reclamar_importacion(job.id)
+    ImportJob.objects.filter(id=job.id).update(reserva_hasta=timezone.now() - hace)
+
+
+@pytest.mark.django_db
+class TestServiciosImportacion:
+    """Tests para la cola de importaciones"""
+
+    def test_encolar_guarda_el_archivo(self, user, excel_file_valido):
+        job = encolar_importacion(archivo_subido(excel_file_valido), user)
+
+        assert job.estado == 'pendiente'
+        assert job.nombre_archivo == 'libros.xlsx'
+        assert bytes(job.contenido) == excel_file_valido.getvalue()
+        assert Libro.objects.count() == 0
+
+    def test_un_trabajo_solo_se_reclama_una_vez(self, user, excel_file_valido):
+        job = encolar_importacion(archivo_subido(excel_file_valido), user)
+
+        assert reclamar_importacion(job.id) is True
+        assert reclamar_importacion(job.id) is False
+
+    def test_tomar_siguiente_respeta_el_orden(self, user, excel_file_valido):
+        primero = encolar_importacion(archivo_subido(excel_file_valido), user)
+        encolar_importacion(archivo_subido(excel_file_valido), user)
+
+        job = tomar_siguiente_importacion()
+
+        assert job.id == primero.id
+        assert job.estado == 'procesando'
+
+    def test_reclamar_asigna_reserva(self, user, excel_file_valido):
+        job = encolar_importacion(archivo_subido(excel_file_valido), user)
+
+        reclamar_importacion(job.id)
+
+        job.refresh_from_db()
+        assert job.reserva_hasta > timezone.now()
+
+    def test_reserva_vencida_se_marca_fallida(self, user, excel_file_valido):
+        job = encolar_importacion(archivo_subido(excel_file_valido), user)
+        interrumpir(job)
+
+        assert fallar_importaciones_vencidas() == 1
+
+        job.refresh_from_db()
+        assert job.estado == 'fallido'
+        assert job.mensaje_error == MENSAJE_INTERRUMPIDA
+        assert bytes(job.contenido) == b''
+        assert job.finalizado_en is not None
+
+    def test_reserva_vigente_no_se_toca(self, user, excel_file_valido):
+        job = encolar_importacion(archivo_subido(excel_file_valido), user)
+        reclamar_importacion(job.id)
+
+        assert fallar_importaciones_vencidas() == 0
+        job.refresh_from_db()
+        assert job.estado == 'procesando'
+
+    def test_tomar_siguiente_falla_las_vencidas(self, user, excel_file_valido):
+        interrumpida = encolar_importacion(archivo_subido(excel_file_valido), user)
+        interrumpir(interrumpida)
+        pendiente = encolar_importacion(archivo_subido(excel_file_valido), user)
+
+        job = tomar_siguiente_importacion()
+
+        interrumpida.refresh_from_db()
+        assert job.id == pendiente.id
+        assert interrumpida.estado == 'fallido'
+
+    def test_progreso_renueva_la_reserva(self, user, excel_file_valido, monkeypatch):
+        job = encolar_importacion(archivo_subido(excel_file_valido), user)
+        interrumpir(job, hace=timedelta(0))
+        job.refresh_from_db()
+        resumen = {'total_procesado': 1, 'total_creados': 1, 'total_duplicados': 0, 'total_errores': 0}
+        reservas = []
+
+        def procesar(*args, progreso=None, **kwargs):
+            progreso(resumen)
+            reservas.append(ImportJob.objects.get(id=job.id).reserva_hasta)
+            return resumen
+        monkeypatch.setattr('libros.services.procesar_archivo_libros', procesar)
+
+        job = ejecutar_importacion(job)
+
+        assert reservas[0] > timezone.now()
+        assert job.estado == 'completado'
+        assert job.reserva_hasta is None
+
+    def test_tomar_siguiente_sin_trabajos(self, db):
+        assert tomar_siguiente_importacion() is None
+
+    def test_ejecutar_guarda_contadores_y_resultados(self, user, excel_file_con_duplicados):
+        encolar_importacion(archivo_subido(excel_file_con_duplicados), user)
+
+        job = ejecutar_importacion(tomar_siguiente_importacion())
+
+        job.refresh_from_db()
+        assert job.estado == 'completado'
+        assert job.filas_procesadas == 3
+        assert job.creados == 1
+        assert job.duplicados == 2
+        assert job.errores == 0
+        assert len(job.resultados['duplicados']) == 2
+        assert bytes(job.contenido) == b''
+        assert job.finalizado_en is not None
+
+    def test_archivo_ilegible_se_informa_como_error(self, user):
+        encolar_importacion(SimpleUploadedFile('libros.xlsx', b'no es un excel'), user)
+
+        job = ejecutar_importacion(tomar_siguiente_importacion())
+
+        assert job.estado == 'completado'
+        assert job.errores == 1
+
+    def test_excepcion_inesperada_marca_fallido(self, user, excel_file_valido, monkeypatch):
+        def fallar(*args, **kwargs):
+            raise RuntimeError('sin conexión')
+        monkeypatch.setattr('libros.services.procesar_archivo_libros', fallar)
+        encolar_importacion(archivo_subido(excel_file_valido), user)
+
+        job = ejecutar_importacion(tomar_siguiente_importacion())
+
+        assert job.estado == 'fallido'
+        assert job.mensaje_error == 'sin conexión'
+        assert job.terminado
+
+
+@pytest.mark.django_db
+class TestComandoProcesarImportaciones:
+    """Tests para el comando procesar_importaciones"""
+
+    def test_una_vez_procesa_la_cola(self, user, excel_file_valido):
+        encolar_importacion(archivo_subido(excel_file_valido), user)
+        encolar_importacion(archivo_subido(excel_file_valido), user)
+
+        call_command('procesar_importaciones', '--una-vez')
+
+        assert not ImportJob.objects.exclude(estado='completado').exists()
+        # El segundo archivo repite los libros del primero
+        assert Libro.objects.filter(propietario=user).count() == 3
+
+
+@pytest.mark.django_db
+class TestVistasImportacionEncolada:
+    """Tests para las vistas de una importación encolada"""
+
+    @pytest.fixture(autouse=True)
+    def encolar_siempre(self, settings):
+        settings.LIBROS_IMPORTACION_MAX_BYTES_SINCRONO = 0
+
+    def test_archivo_grande_se_encola(self, client, user, excel_file_valido):
+        client.force_login(user)
+
+        response = client.post(reverse('cargar_libros_masivo'), {
+            'archivo_excel': archivo_subido(excel_file_valido)
+        })
+
+        job = ImportJob.objects.get()
+        assert response.status_code == 302
+        assert response.url == reverse('estado_importacion', args=[job.id])
+        assert job.estado == 'pendiente'
+        assert Libro.objects.count() == 0
+
+    def test_progreso_json(self, client, user, excel_file_valido):
+        client.force_login(user)
+        job = encolar_importacion(archivo_subido(excel_file_valido), user)
+
+        pendiente = client.get(reverse('progreso_importacion', args=[job.id])).json()
+        call_command('procesar_importaciones', '--una-vez')
+        completado = client.get(reverse('progreso_importacion', args=[job.id])).json()
+
+        assert pendiente['estado'] == 'pendiente'
+        assert pendiente['terminado'] is False
+        assert completado == {
+            'estado': 'completado', 'terminado': True,
+            'filas_procesadas': 3, 'creados': 3, 'duplicados': 0, 'errores': 0,
+        }
+
+    def test_pagina_de_estado(self, client, user, excel_file_valido):
+        client.force_login(user)
+        job = encolar_importacion(archivo_subido(excel_file_valido), user)
+        call_command('procesar_importaciones', '--una-vez')
+
+        response = client.get(reverse('estado_importacion', args=[job.id]))
+
+        assert response.status_code == 200
+        assert 'El Quijote' in response.content.decode()
+
+    def test_progreso_de_trabajo_interrumpido_termina(self, client, user, excel_file_valido):
+        client.force_login(user)
+        job = encolar_importacion(archivo_subido(excel_file_valido), user)
+        interrumpir(job)
+
+        datos = client.get(reverse('progreso_importacion', args=[job.id])).json()
+        response = client.get(reverse('estado_importacion', args=[job.id]))
+
+        assert datos['estado'] == 'fallido'
+        assert datos['terminado'] is True
+        assert MENSAJE_INTERRUMPIDA in response.content.decode()
+
+    def test_otro_usuario_no_ve_el_trabajo(self, client, user, another_user, excel_file_valido):
+        job = encolar_importacion(archivo_subido(excel_file_valido), user)
+        client.force_login(another_user)
+
+        assert client.get(reverse('estado_importacion', args=[job.id])).status_code == 404
+        assert client.get(reverse('progreso_importacion', args=[job.id])).status_code == 404
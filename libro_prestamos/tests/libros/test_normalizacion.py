@@ -0,0 +1,117 @@
+"""
+Tests para las columnas normalizadas de Libro.
+"""
+import pytest
+from io import BytesIO
+from openpyxl import Workbook
+from libros.models import Libro
+from libros.normalizacion import filtro_prefijo, normalizar_campo, normalizar_texto, rango_prefijo
+from libros.search import BusquedaSimple
+from libros.utils import DetectorDuplicados, procesar_excel_libros
+
+
+class TestNormalizarTexto:
+    """Tests para la función normalizar_texto()"""
+
+    def test_quita_acentos_y_mayusculas(self):
+        assert normalizar_texto('Gabriel García MÁRQUEZ') == 'gabriel garcia marquez'
+
+    def test_pliega_caracteres_unicode(self):
+        """Test que aplica NFKD completo, no solo las vocales acentuadas"""
+        assert normalizar_texto('Ñandú Çedilla Straße ﬁn') == 'nandu cedilla strasse fin'
+
+    def test_colapsa_espacios(self):
+        assert normalizar_texto('  El   Quijote ') == 'el quijote'
+
+    def test_valores_vacios(self):
+        assert normalizar_texto(None) == ''
+        assert normalizar_texto('') == ''
+
+    def test_normalizar_campo_recorta_al_largo_de_la_columna(self):
+        """Test que el texto expandido por NFKD y casefold entra en la columna"""
+        assert normalizar_texto('ß' * 255) == 'ss' * 255
+        assert normalizar_campo('ß' * 255) == 's' * 255
+        assert len(normalizar_campo('ﬃ' * 255)) == 255
+
+    def test_rango_prefijo(self):
+        assert rango_prefijo('garc') == 'gard'
+
+
+@pytest.mark.django_db
+class TestCamposNormalizados:
+    """Tests para el mantenimiento de las columnas normalizadas"""
+
+    def test_save_completa_campos(self, user):
+        libro = Libro.objects.create(nombre='Ficciones', autor='Jorge Luis Borgés', propietario=user)
+
+        assert libro.nombre_normalizado == 'ficciones'
+        assert libro.autor_normalizado == 'jorge luis borges'
+
+    def test_save_con_update_fields_actualiza_normalizados(self, user):
+        libro = Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=user)
+        libro.nombre = 'El Aleph'
+        libro.save(update_fields=['nombre'])
+
+        libro.refresh_from_db()
+        assert libro.nombre_normalizado == 'el aleph'
+
+    def test_nombre_que_se_expande_al_normalizar(self, user):
+        libro = Libro.objects.create(nombre='ß' * 255, autor='ﬃ' * 255, propietario=user)
+
+        libro.refresh_from_db()
+        assert libro.nombre_normalizado == 's' * 255
+        assert len(libro.autor_normalizado) == 255
+
+    def test_bulk_create_completa_campos(self, user):
+        Libro.objects.bulk_create([Libro(nombre='Rayuela', autor='Julio Cortázar', propietario=user)])
+
+        libro = Libro.objects.get(nombre='Rayuela')
+        assert libro.autor_normalizado == 'julio cortazar'
+
+    def test_filtro_prefijo(self, user):
+        libro = Libro.objects.create(nombre='Cien años', autor='Gabriel García Márquez', propietario=user)
+        Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=user)
+
+        assert list(Libro.objects.filter(filtro_prefijo('autor_normalizado', 'gabriel garc'))) == [libro]
+        assert not Libro.objects.filter(filtro_prefijo('autor_normalizado', 'garcia')).exists()
+
+    def test_busqueda_simple_ignora_acentos(self, user):
+        libro = Libro.objects.create(nombre='Cien años', autor='Gabriel García Márquez', propietario=user)
+
+        resultados = BusquedaSimple().buscar(Libro.objects.all(), 'garcia marquez')
+
+        assert list(resultados) == [libro]
+
+    def test_busqueda_simple_solo_guiones_no_trae_todos_los_isbn(self, user):
+        Libro.objects.create(nombre='Rayuela', autor='Julio Cortázar', isbn='9788437604572', propietario=user)
+
+        assert not BusquedaSimple().buscar(Libro.objects.all(), '- -').exists()
+
+
+@pytest.mark.django_db
+class TestDuplicadosNormalizados:
+    """Tests para la detección de duplicados sobre columnas normalizadas"""
+
+    def test_es_duplicado_ignora_acentos_y_mayusculas(self, user):
+        Libro.objects.create(nombre='Cien años de soledad', autor='García Márquez', propietario=user)
+
+        detector = DetectorDuplicados(user)
+        es_dup, tipo = detector.es_duplicado({'nombre': 'CIEN ANOS DE SOLEDAD', 'autor': 'garcia marquez'})
+
+        assert es_dup is True
+        assert tipo == 'Nombre+Autor'
+
+    def test_carga_masiva_detecta_duplicado_sin_acentos(self, user):
+        Libro.objects.create(nombre='Pedro Páramo', autor='Juan Rulfo', propietario=user)
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['Nombre', 'Autor'])
+        ws.append(['Pedro Paramo', 'JUAN RULFO'])
+        excel_file = BytesIO()
+        wb.save(excel_file)
+        excel_file.seek(0)
+
+        resultados = procesar_excel_libros(excel_file, user)
+
+        assert len(resultados['duplicados']) == 1
+        assert Libro.objects.filter(propietario=user).count() == 1
@@ -0,0 +1,82 @@
+"""
+Tests para el autocompletado de prestatarios.
+"""
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from prestamos.services import buscar_prestatarios
+
+
+@pytest.fixture
+def usuarios(db):
+    return [
+        User.objects.create_user(username=username, first_name=nombre, password='testpass123')
+        for username, nombre in [
+            ('Ana', 'Ana'), ('anabel', 'Anabel'), ('andres', ''), ('bruno', 'Bruno'),
+        ]
+    ]
+
+
+@pytest.mark.django_db
+class TestBuscarPrestatarios:
+    """Tests para el servicio buscar_prestatarios"""
+
+    def test_busca_por_prefijo_sin_distinguir_mayusculas(self, user, usuarios):
+        resultados = buscar_prestatarios('AN', user)
+
+        assert [r['username'] for r in resultados] == ['Ana', 'anabel', 'andres']
+        assert resultados[1]['nombre'] == 'Anabel'
+
+    def test_busca_por_nombre_y_apellido(self, user):
+        juan = User.objects.create_user(username='jp', first_name='Juan', last_name='García', password='x')
+        maria = User.objects.create_user(username='mg', first_name='María', last_name='Garcés', password='x')
+
+        assert [r['username'] for r in buscar_prestatarios('juan', user)] == [juan.username]
+        assert [r['username'] for r in buscar_prestatarios('GARC', user)] == [juan.username, maria.username]
+
+    def test_el_rango_no_basta_para_el_prefijo(self, user):
+        """Test que exige startswith además del rango (collations que ignoran la puntuación)"""
+        User.objects.create_user(username='a.bc', password='x')
+        abril = User.objects.create_user(username='abril', password='x')
+
+        assert [r['username'] for r in buscar_prestatarios('ab', user)] == [abril.username]
+
+    def test_excluye_al_prestador_y_a_inactivos(self, usuarios):
+        User.objects.filter(username='anabel').update(is_active=False)
+
+        resultados = buscar_prestatarios('an', usuarios[0])
+
+        assert [r['username'] for r in resultados] == ['andres']
+
+    def test_respeta_el_limite(self, user, usuarios):
+        assert len(buscar_prestatarios('an', user, limite=2)) == 2
+
+    def test_requiere_minimo_de_caracteres(self, user, usuarios, django_assert_num_queries):
+        with django_assert_num_queries(0):
+            assert buscar_prestatarios('a', user) == []
+
+
+@pytest.mark.django_db
+class TestVistaBuscarPrestatarios:
+    """Tests para el endpoint JSON de autocompletado"""
+
+    def test_devuelve_json(self, client, user, usuarios):
+        client.force_login(user)
+
+        response = client.get(reverse('buscar_prestatarios'), {'q': 'bru'})
+
+        assert response.status_code == 200
+        assert response.json() == {'resultados': [{'username': 'bruno', 'nombre': 'Bruno'}]}
+
+    def test_requiere_login(self, client):
+        response = client.get(reverse('buscar_prestatarios'), {'q': 'bru'})
+
+        assert response.status_code == 302
+
+    def test_crear_prestamo_no_lista_usuarios(self, client, user, usuarios):
+        """Test que la página de préstamo no carga la tabla de usuarios"""
+        client.force_login(user)
+
+        response = client.get(reverse('crear_prestamo'))
+
+        assert 'anabel' not in response.content.decode()
@@ -0,0 +1,60 @@
+"""
+Tests de concurrencia para la creación de préstamos.
+"""
+import threading
+import pytest
+from django.contrib.auth.models import User
+from django.db import IntegrityError, OperationalError, connection, transaction
+from libros.models import Libro
+from prestamos.models import Prestamo
+from prestamos.services import crear_prestamo_service
+
+HILOS = 8
+
+
+@pytest.mark.django_db(transaction=True)
+class TestCrearPrestamoConcurrente:
+    """Tests que el mismo libro no se pueda prestar dos veces a la vez"""
+
+    def test_muchos_hilos_un_solo_prestamo(self):
+        prestador = User.objects.create_user(username='prestador', password='testpass123')
+        prestatarios = [
+            User.objects.create_user(username=f'prestatario{numero}', password='testpass123')
+            for numero in range(HILOS)
+        ]
+        libro = Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=prestador)
+        barrera = threading.Barrier(HILOS)
+        resultados = []
+
+        def prestar(prestatario):
+            try:
+                barrera.wait()
+                prestamo, error = crear_prestamo_service(libro.id, prestatario.username, prestador)
+                resultados.append(prestamo is not None)
+            except OperationalError:
+                # SQLite puede rechazar la escritura concurrente (tabla bloqueada)
+                resultados.append(False)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=prestar, args=(prestatario,)) for prestatario in prestatarios]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert len(resultados) == HILOS
+        assert resultados.count(True) == 1
+        assert Prestamo.objects.filter(libro=libro, devuelto=False).count() == 1
+        libro.refresh_from_db()
+        assert libro.estado == 'prestado'
+
+    def test_restriccion_un_prestamo_activo_por_libro(self):
+        prestador = User.objects.create_user(username='prestador', password='testpass123')
+        prestatario = User.objects.create_user(username='prestatario', password='testpass123')
+        libro = Libro.objects.create(nombre='Ficciones', autor='Borges', propietario=prestador)
+        Prestamo.objects.create(libro=libro, prestador=prestador, prestatario=prestatario, devuelto=True)
+        Prestamo.objects.create(libro=libro, prestador=prestador, prestatario=prestatario)
+
+        with pytest.raises(IntegrityError), transaction.atomic():
+            Prestamo.objects.create(libro=libro, prestador=prestador, prestatario=prestatario)
@@ -0,0 +1,112 @@
+"""
+Tests para los filtros del historial de préstamos.
+"""
+import pytest
+from datetime import date, datetime, time, timedelta
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from libros.models import Libro
+from prestamos.forms import FiltroHistorialForm
+from prestamos.models import Prestamo
+from prestamos.services import filtrar_historial
+
+
+def crear_prestamo(libro, prestador, prestatario, fecha, devuelto=True):
+    prestamo = Prestamo.objects.create(libro=libro, prestador=prestador, prestatario=prestatario, devuelto=devuelto)
+    Prestamo.objects.filter(id=prestamo.id).update(
+        fecha_prestamo=timezone.make_aware(datetime.combine(fecha, time(12)))
+    )
+    return prestamo
+
+
+@pytest.fixture
+def historial(user, another_user):
+    """Un préstamo por día del 1 al 5 de marzo; el último sigue activo"""
+    libro = Libro.objects.create(nombre='Libro', autor='Autor', propietario=user)
+    return [
+        crear_prestamo(libro, user, another_user, date(2024, 3, dia), devuelto=dia < 5)
+        for dia in range(1, 6)
+    ]
+
+
+@pytest.mark.django_db
+class TestFiltrarHistorial:
+    """Tests para filtrar_historial()"""
+
+    def test_rango_incluye_ambos_dias(self, historial):
+        prestamos = filtrar_historial(Prestamo.objects.all(), desde=date(2024, 3, 2), hasta=date(2024, 3, 4))
+
+        assert set(prestamos) == set(historial[1:4])
+
+    def test_solo_desde(self, historial):
+        prestamos = filtrar_historial(Prestamo.objects.all(), desde=date(2024, 3, 4))
+
+        assert set(prestamos) == set(historial[3:])
+
+    def test_por_estado(self, historial):
+        assert list(filtrar_historial(Prestamo.objects.all(), estado='activos')) == [historial[4]]
+        assert filtrar_historial(Prestamo.objects.all(), estado='devueltos').count() == 4
+        assert filtrar_historial(Prestamo.objects.all(), estado='').count() == 5
+
+
+class TestFiltroHistorialForm:
+    """Tests para FiltroHistorialForm"""
+
+    def test_rango_invertido_es_invalido(self):
+        form = FiltroHistorialForm({'desde': '2024-03-05', 'hasta': '2024-03-01'})
+
+        assert not form.is_valid()
+
+    def test_sin_filtros_es_valido(self):
+        form = FiltroHistorialForm(QueryDict(''))
+
+        assert form.is_valid()
+        assert not form.has_changed()
+
+
+@pytest.mark.django_db
+class TestVistaHistorialFiltrado:
+    """Tests de integración de los filtros en historial_prestamos"""
+
+    def test_filtra_ambas_listas(self, client, user, another_user, historial):
+        libro_ajeno = Libro.objects.create(nombre='Ajeno', autor='Autor', propietario=another_user)
+        recibido = crear_prestamo(libro_ajeno, another_user, user, date(2024, 3, 3))
+        crear_prestamo(libro_ajeno, another_user, user, date(2024, 4, 1))
+        client.force_login(user)
+
+        response = client.get(reverse('historial_prestamos'), {'desde': '2024-03-03', 'hasta': '2024-03-03'})
+
+        assert list(response.context['historial_realizados']) == [historial[2]]
+        assert list(response.context['historial_recibidos']) == [recibido]
+
+    def test_cursor_conserva_los_filtros(self, client, user, another_user):
+        libro = Libro.objects.create(nombre='Libro', autor='Autor', propietario=user)
+        inicio = date(2024, 1, 1)
+        for dias in range(25):
+            crear_prestamo(libro, user, another_user, inicio + timedelta(days=dias))
+        crear_prestamo(libro, user, another_user, date(2023, 6, 1))
+        client.force_login(user)
+
+        primera = client.get(reverse('historial_prestamos'), {'desde': '2024-01-01', 'estado': 'devueltos'})
+        querystring = primera.context['historial_realizados'].querystring_siguiente
+        segunda = client.get(f"{reverse('historial_prestamos')}?{querystring}")
+
+        assert 'desde=2024-01-01' in querystring
+        assert len(primera.context['historial_realizados']) == 20
+        assert len(segunda.context['historial_realizados']) == 5
+
+    def test_filtro_invalido_muestra_todo(self, client, user, historial):
+        client.force_login(user)
+
+        response = client.get(reverse('historial_prestamos'), {'desde': '2024-03-05', 'hasta': '2024-03-01'})
+
+        assert len(response.context['historial_realizados']) == 5
+        assert 'sin filtrar' in response.content.decode()
+
+    def test_sin_resultados_para_el_filtro(self, client, user, historial):
+        client.force_login(user)
+
+        response = client.get(reverse('historial_prestamos'), {'desde': '2030-01-01'})
+
+        assert 'No hay préstamos para los filtros seleccionados.' in response.content.decode()
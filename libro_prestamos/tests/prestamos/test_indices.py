@@ -0,0 +1,57 @@
+"""
+Tests para los índices de Prestamo y el comando benchmark_prestamos.
+"""
+import pytest
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from libros.models import Libro
+from prestamos.models import Prestamo
+
+
+def plan(queryset):
+    return queryset.explain()
+
+
+@pytest.mark.django_db
+class TestIndicesPrestamo:
+    """Tests que las consultas de las vistas usan los índices compuestos"""
+
+    def test_prestamos_activos_usan_indice_parcial(self, user):
+        queryset = Prestamo.objects.filter(prestador=user, devuelto=False).order_by('-fecha_prestamo', '-id')
+
+        assert 'prest_activos_prestador_idx' in plan(queryset)
+        assert 'TEMP B-TREE' not in plan(queryset)
+
+    def test_recibidos_usan_indice_parcial(self, user):
+        queryset = Prestamo.objects.filter(prestatario=user, devuelto=False).order_by('-fecha_prestamo', '-id')
+
+        assert 'prest_activos_prestatario_idx' in plan(queryset)
+
+    def test_historial_ordena_con_el_indice(self, user):
+        queryset = Prestamo.objects.filter(prestador=user).order_by('-fecha_prestamo', '-id')[:21]
+
+        assert 'prest_hist_prestador_idx' in plan(queryset)
+        assert 'TEMP B-TREE' not in plan(queryset)
+
+
+@pytest.mark.django_db
+class TestBenchmarkPrestamos:
+    """Tests para el comando benchmark_prestamos"""
+
+    def test_compara_y_revierte_todo(self):
+        salida = StringIO()
+
+        call_command('benchmark_prestamos', prestamos=60, usuarios=4, repeticiones=1, stdout=salida)
+
+        assert 'historial: realizados' in salida.getvalue()
+        assert 'prest_hist_prestador_idx' in salida.getvalue()
+        assert not User.objects.exists()
+        assert not Libro.objects.exists()
+        # Los índices quitados durante la medición vuelven con el rollback
+        assert 'prest_hist_prestador_idx' in plan(Prestamo.objects.filter(prestador_id=1).order_by('-fecha_prestamo', '-id'))
+
+    def test_sin_prestamos(self):
+        with pytest.raises(CommandError, match='No hay préstamos'):
+            call_command('benchmark_prestamos', stdout=StringIO())
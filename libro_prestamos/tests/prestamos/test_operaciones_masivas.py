@@ -0,0 +1,219 @@
+"""
+Tests para el préstamo y la devolución masivos.
+"""
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.services import calcular_estadisticas_usuario, recalcular_estadisticas
+from libros.models import Libro
+from prestamos.models import Prestamo
+from prestamos.services import crear_prestamos_masivo_service, marcar_devueltos_masivo_service
+from usuarios.models import UserStats
+
+
+def crear_libros(propietario, cantidad, estado='disponible'):
+    return [
+        Libro.objects.create(nombre=f'Libro {numero:02d}', autor='Autor', propietario=propietario, estado=estado)
+        for numero in range(cantidad)
+    ]
+
+
+def prestar(libros, prestador, prestatario):
+    Libro.objects.filter(id__in=[libro.id for libro in libros]).update(estado='prestado')
+    return [
+        Prestamo.objects.create(libro=libro, prestador=prestador, prestatario=prestatario)
+        for libro in libros
+    ]
+
+
+@pytest.mark.django_db
+class TestCrearPrestamosMasivoService:
+    """Tests para crear_prestamos_masivo_service"""
+
+    def test_presta_todos_los_libros(self, user, another_user):
+        libros = crear_libros(user, 3)
+
+        resultados, error = crear_prestamos_masivo_service([libro.id for libro in libros], another_user.username, user)
+
+        assert error is None
+        assert all(resultado['exito'] for resultado in resultados)
+        assert Prestamo.objects.filter(prestatario=another_user, devuelto=False).count() == 3
+        assert not Libro.objects.filter(propietario=user, estado='disponible').exists()
+
+    def test_resultados_por_libro(self, user, another_user):
+        disponible = crear_libros(user, 1)[0]
+        prestado = Libro.objects.create(nombre='Prestado', autor='Autor', propietario=user, estado='prestado')
+        ajeno = Libro.objects.create(nombre='Ajeno', autor='Autor', propietario=another_user)
+        tercero = User.objects.create_user(username='tercero', password='testpass123')
+
+        resultados, error = crear_prestamos_masivo_service(
+            [disponible.id, prestado.id, ajeno.id, 999, disponible.id, 'x'], tercero.username, user
+        )
+
+        assert error is None
+        assert [(r['libro_id'], r['exito']) for r in resultados] == [
+            (disponible.id, True), (prestado.id, False), (ajeno.id, False), (999, False)
+        ]
+        assert resultados[0]['libro'] == disponible.nombre
+        assert Prestamo.objects.count() == 1
+
+    def test_consultas_constantes(self, user, another_user):
+        pocos = crear_libros(user, 2)
+        muchos = [
+            Libro.objects.create(nombre=f'Otro {numero}', autor='Autor', propietario=user)
+            for numero in range(50)
+        ]
+
+        with CaptureQueriesContext(connection) as con_pocos:
+            crear_prestamos_masivo_service([libro.id for libro in pocos], another_user.username, user)
+        with CaptureQueriesContext(connection) as con_muchos:
+            crear_prestamos_masivo_service([libro.id for libro in muchos], another_user.username, user)
+
+        assert len(con_muchos) == len(con_pocos)
+
+    def test_prestatario_invalido(self, user):
+        libros = crear_libros(user, 2)
+
+        resultados, error = crear_prestamos_masivo_service([libro.id for libro in libros], 'no_existe', user)
+
+        assert resultados is None
+        assert "no existe" in error
+        assert not Prestamo.objects.exists()
+
+    def test_a_si_mismo(self, user):
+        libros = crear_libros(user, 1)
+
+        resultados, error = crear_prestamos_masivo_service([libros[0].id], user.username, user)
+
+        assert resultados is None
+        assert "ti mismo" in error
+
+    def test_sin_libros(self, user, another_user):
+        resultados, error = crear_prestamos_masivo_service([], another_user.username, user)
+
+        assert resultados is None
+        assert error
+
+    def test_actualiza_estadisticas(self, user, another_user):
+        libros = crear_libros(user, 3)
+        recalcular_estadisticas(user)
+        recalcular_estadisticas(another_user)
+
+        crear_prestamos_masivo_service([libro.id for libro in libros], another_user.username, user)
+
+        for usuario in (user, another_user):
+            fila = UserStats.objects.filter(usuario=usuario).values(*UserStats.CONTADORES).get()
+            assert fila == calcular_estadisticas_usuario(usuario)
+
+
+@pytest.mark.django_db
+class TestMarcarDevueltosMasivoService:
+    """Tests para marcar_devueltos_masivo_service"""
+
+    def test_devuelve_todos(self, user, another_user):
+        prestamos = prestar(crear_libros(user, 3), user, another_user)
+
+        resultados, error = marcar_devueltos_masivo_service([prestamo.id for prestamo in prestamos], user)
+
+        assert error is None
+        assert all(resultado['exito'] for resultado in resultados)
+        assert not Prestamo.objects.filter(devuelto=False).exists()
+        assert Libro.objects.filter(propietario=user, estado='disponible').count() == 3
+
+    def test_resultados_por_prestamo(self, user, another_user):
+        activo, devuelto = prestar(crear_libros(user, 2), user, another_user)
+        Prestamo.objects.filter(id=devuelto.id).update(devuelto=True)
+        ajeno = prestar(crear_libros(another_user, 1), another_user, user)[0]
+
+        resultados, error = marcar_devueltos_masivo_service([activo.id, devuelto.id, ajeno.id], user)
+
+        assert error is None
+        assert [r['exito'] for r in resultados] == [True, False, False]
+        assert "ya ha sido marcado" in resultados[1]['error']
+        assert "no existe" in resultados[2]['error']
+        assert Prestamo.objects.filter(id=ajeno.id, devuelto=False).exists()
+
+    def test_actualiza_estadisticas_de_varios_prestatarios(self, user, another_user):
+        tercero = User.objects.create_user(username='tercero', password='testpass123')
+        libros = crear_libros(user, 3)
+        prestamos = prestar(libros[:2], user, another_user) + prestar(libros[2:], user, tercero)
+        for usuario in (user, another_user, tercero):
+            recalcular_estadisticas(usuario)
+
+        marcar_devueltos_masivo_service([prestamo.id for prestamo in prestamos], user)
+
+        for usuario in (user, another_user, tercero):
+            fila = UserStats.objects.filter(usuario=usuario).values(*UserStats.CONTADORES).get()
+            assert fila == calcular_estadisticas_usuario(usuario)
+
+    def test_consultas_constantes(self, user, another_user):
+        libros = crear_libros(user, 52)
+        pocos = prestar(libros[:2], user, another_user)
+        muchos = prestar(libros[2:], user, another_user)
+
+        with CaptureQueriesContext(connection) as con_pocos:
+            marcar_devueltos_masivo_service([prestamo.id for prestamo in pocos], user)
+        with CaptureQueriesContext(connection) as con_muchos:
+            marcar_devueltos_masivo_service([prestamo.id for prestamo in muchos], user)
+
+        assert len(con_muchos) == len(con_pocos)
+
+
+@pytest.mark.django_db
+class TestVistasMasivas:
+    """Tests de integración de las vistas de préstamo y devolución masivos"""
+
+    def test_get_prestamo_masivo(self, client, user):
+        crear_libros(user, 2)
+        client.force_login(user)
+
+        response = client.get(reverse('crear_prestamos_masivo'))
+
+        assert response.status_code == 200
+        assert len(response.context['libros']) == 2
+
+    def test_post_prestamo_masivo(self, client, user, another_user):
+        libros = crear_libros(user, 3)
+        client.force_login(user)
+
+        response = client.post(reverse('crear_prestamos_masivo'), {
+            'libros': [libro.id for libro in libros],
+            'prestatario': another_user.username,
+        }, follow=True)
+
+        assert response.redirect_chain[-1][0] == reverse('listar_prestamos')
+        assert Prestamo.objects.filter(prestatario=another_user).count() == 3
+        assert any('3 libro(s)' in str(mensaje) for mensaje in response.context['messages'])
+
+    def test_post_prestamo_masivo_con_error(self, client, user):
+        libros = crear_libros(user, 1)
+        client.force_login(user)
+
+        response = client.post(reverse('crear_prestamos_masivo'), {
+            'libros': [libros[0].id],
+            'prestatario': 'no_existe',
+        })
+
+        assert response.status_code == 200
+        assert not Prestamo.objects.exists()
+
+    def test_post_devolucion_masiva(self, client, user, another_user):
+        prestamos = prestar(crear_libros(user, 2), user, another_user)
+        client.force_login(user)
+
+        response = client.post(reverse('marcar_devueltos_masivo'), {
+            'prestamos': [prestamo.id for prestamo in prestamos],
+        })
+
+        assert response.status_code == 302
+        assert not Prestamo.objects.filter(devuelto=False).exists()
+
+    def test_listar_prestamos_tiene_seleccion(self, client, user, another_user):
+        prestar(crear_libros(user, 1), user, another_user)
+        client.force_login(user)
+
+        response = client.get(reverse('listar_prestamos'))
+
+        assert 'form="devolucion-masiva"' in response.content.decode()
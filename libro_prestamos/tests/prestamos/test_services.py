@@ -3,6 +3,8 @@ Tests para los servicios de lógica de negocio.
 """
 import pytest
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from libros.models import Libro
 from prestamos.models import Prestamo
 from prestamos.services import crear_prestamo_service, marcar_devuelto_service
@@ -240,3 +242,33 @@ class TestMarcarDevueltoService:
         assert resultado is None
         assert error is not None
         assert "no existe" in error.lower() or "permiso" in error.lower()
+    
+    def test_marcar_devuelto_una_lectura_y_dos_escrituras(self, user, another_user):
+        """Test que la devolución lee préstamo y libro juntos y solo actualiza devuelto/estado"""
+        libro = Libro.objects.create(nombre='Test Book', autor='Test Author', propietario=user, estado='prestado')
+        prestamo = Prestamo.objects.create(libro=libro, prestatario=another_user, prestador=user)
+        
+        with CaptureQueriesContext(connection) as consultas:
+            resultado, error = marcar_devuelto_service(prestamo.id, user)
+        
+        sql = [
+            q['sql'] for q in consultas.captured_queries
+            if 'prestamos_prestamo' in q['sql'] or 'libros_libro' in q['sql']
+        ]
+        assert error is None
+        assert resultado.libro.estado == 'disponible'
+        assert len(sql) == 3
+        assert sql[0].startswith('SELECT') and 'INNER JOIN "libros_libro"' in sql[0]
+        assert sql[1].startswith('UPDATE "prestamos_prestamo" SET "devuelto"')
+        assert sql[2].startswith('UPDATE "libros_libro" SET "estado"')
+    
+    def test_marcar_devuelto_dos_veces(self, user, another_user):
+        """Test que una segunda devolución del mismo préstamo no cambia nada"""
+        libro = Libro.objects.create(nombre='Test Book', autor='Test Author', propietario=user, estado='prestado')
+        prestamo = Prestamo.objects.create(libro=libro, prestatario=another_user, prestador=user)
+        marcar_devuelto_service(prestamo.id, user)
+        
+        resultado, error = marcar_devuelto_service(prestamo.id, user)
+        
+        assert "ya ha sido marcado" in error
+        assert Prestamo.objects.filter(libro=libro, devuelto=True).count() == 1
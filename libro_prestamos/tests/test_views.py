@@ -209,7 +209,7 @@ class TestCrearPrestamoView:
         response = client.get(reverse('crear_prestamo'))
         assert response.status_code == 200
         assert 'libros' in response.context
-        assert 'usuarios' in response.context
+        assert reverse('buscar_prestatarios') in response.content.decode()
     
     def test_post_request_creates_prestamo(self, client, user):
         """Test que crea un préstamo exitosamente usando el servicio"""
@@ -0,0 +1,192 @@
+"""
+Tests del envío de la cola de emails contra un servidor SMTP local de prueba
+(reutilización de la conexión, límite por dominio y reintentos).
+"""
+import socketserver
+import threading
+import time
+import pytest
+from datetime import timedelta
+from django.core.mail import EmailMessage
+from django.utils import timezone
+from usuarios import outbox
+from usuarios.models import EmailOutbox
+from usuarios.outbox import LimitePorDominio, enviar_pendientes, espera_reintento
+
+
+class ManejadorSMTP(socketserver.StreamRequestHandler):
+    """Diálogo SMTP mínimo: EHLO, MAIL, RCPT, DATA, RSET, NOOP y QUIT, sin TLS ni AUTH"""
+
+    def responder(self, texto):
+        self.wfile.write(f'{texto}\r\n'.encode())
+
+    def handle(self):
+        servidor = self.server
+        servidor.conexiones += 1
+        self.responder('220 localhost ESMTP prueba')
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.decode('utf-8', 'replace').strip()
+            verbo = comando[:4].upper()
+            if verbo == 'EHLO':
+                self.responder('250-localhost')
+                self.responder('250 8BITMIME')
+            elif verbo == 'RCPT' and any(rechazado in comando for rechazado in servidor.rechazados):
+                self.responder('550 Destinatario rechazado')
+            elif verbo == 'DATA':
+                self.responder('354 Terminar con <CRLF>.<CRLF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                servidor.mensajes.append(time.perf_counter())
+                self.responder('250 OK')
+                if servidor.cortar_cada and len(servidor.mensajes) % servidor.cortar_cada == 0:
+                    return  # El servidor corta la conexión
+            elif verbo == 'QUIT':
+                self.responder('221 Chau')
+                return
+            else:
+                self.responder('250 OK')
+
+
+class ServidorSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), ManejadorSMTP)
+        self.conexiones = 0
+        self.mensajes = []
+        self.rechazados = set()
+        self.cortar_cada = 0
+
+
+@pytest.fixture
+def servidor_smtp(settings):
+    servidor = ServidorSMTP()
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    settings.EMAIL_HOST = '127.0.0.1'
+    settings.EMAIL_PORT = servidor.server_address[1]
+    settings.EMAIL_USE_TLS = False
+    settings.EMAIL_USE_SSL = False
+    settings.EMAIL_HOST_USER = ''
+    settings.EMAIL_HOST_PASSWORD = ''
+    settings.EMAIL_MAX_POR_DOMINIO_POR_MINUTO = 0
+    settings.EMAIL_OUTBOX_ENVIO_INMEDIATO = False
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def encolar(cantidad, dominio='example.com'):
+    EmailOutbox.objects.bulk_create([
+        EmailOutbox(
+            remitente='noreply@example.com', destinatarios=[f'usuario{numero}@{dominio}'],
+            asunto=f'Email {numero}', cuerpo='<p>Hola</p>', tipo_contenido='html'
+        )
+        for numero in range(cantidad)
+    ])
+
+
+@pytest.mark.django_db
+class TestEnvioSMTP:
+    """Tests de enviar_pendientes() contra el servidor SMTP de prueba"""
+
+    def test_una_conexion_por_lote(self, servidor_smtp):
+        encolar(40)
+
+        enviados, fallidos = enviar_pendientes(limite=40)
+
+        assert (enviados, fallidos) == (40, 0)
+        assert len(servidor_smtp.mensajes) == 40
+        assert servidor_smtp.conexiones == 1
+
+    def test_lote_abre_menos_conexiones_que_send_por_mensaje(self, servidor_smtp):
+        """Comparación con el envío directo de antes (EmailMessage.send() por email)"""
+        for numero in range(10):
+            EmailMessage('Asunto', 'Cuerpo', 'noreply@example.com', [f'u{numero}@example.com']).send()
+        conexiones_por_mensaje = servidor_smtp.conexiones
+
+        servidor_smtp.conexiones = 0
+        encolar(10)
+        assert enviar_pendientes(limite=10) == (10, 0)
+
+        assert servidor_smtp.conexiones < conexiones_por_mensaje
+        assert (servidor_smtp.conexiones, conexiones_por_mensaje) == (1, 10)
+
+    def test_lote_configurable(self, servidor_smtp, settings):
+        settings.EMAIL_LOTE_ENVIO = 10
+        encolar(25)
+
+        assert enviar_pendientes() == (10, 0)
+        assert EmailOutbox.objects.filter(estado='pendiente').count() == 15
+
+    def test_reconecta_si_el_servidor_corta(self, servidor_smtp):
+        servidor_smtp.cortar_cada = 5
+        encolar(12)
+
+        assert enviar_pendientes(limite=12) == (12, 0)
+        assert servidor_smtp.conexiones == 3
+
+    def test_destinatario_rechazado_no_frena_el_lote(self, servidor_smtp):
+        servidor_smtp.rechazados = {'usuario1@'}
+        encolar(3)
+
+        assert enviar_pendientes() == (2, 1)
+        rechazado = EmailOutbox.objects.get(destinatarios=['usuario1@example.com'])
+        assert rechazado.estado == 'pendiente'
+        assert rechazado.disponible_en > timezone.now() + timedelta(seconds=50)
+        assert servidor_smtp.conexiones == 1
+
+    def test_servidor_caido_programa_reintentos(self, servidor_smtp, settings):
+        settings.EMAIL_PORT = 1  # Nadie escucha
+        encolar(2)
+
+        assert enviar_pendientes() == (0, 2)
+        assert EmailOutbox.objects.filter(estado='pendiente', intentos=1).count() == 2
+
+    def test_limite_por_dominio_difiere_sin_contar_intento(self, servidor_smtp, settings):
+        settings.EMAIL_MAX_POR_DOMINIO_POR_MINUTO = 3
+        encolar(5, dominio='lento.com')
+        encolar(2, dominio='otro.com')
+
+        assert enviar_pendientes() == (5, 0)
+
+        diferidos = EmailOutbox.objects.filter(estado='pendiente')
+        assert diferidos.count() == 2
+        assert all(email.destinatarios[0].endswith('@lento.com') for email in diferidos)
+        assert all(email.intentos == 0 for email in diferidos)
+        assert all(email.disponible_en > timezone.now() for email in diferidos)
+
+
+class TestLimitePorDominio:
+    """Tests para LimitePorDominio"""
+
+    def test_ventana_de_un_minuto(self):
+        ahora = [0.0]
+        limite = LimitePorDominio(2, reloj=lambda: ahora[0])
+        limite.registrar('a.com')
+        ahora[0] = 10
+        limite.registrar('a.com')
+
+        assert limite.espera('a.com') == 50
+        assert limite.espera('b.com') == 0
+        ahora[0] = 60
+        assert limite.espera('a.com') == 0
+
+    def test_sin_limite(self):
+        limite = LimitePorDominio(0)
+        for _ in range(100):
+            limite.registrar('a.com')
+
+        assert limite.espera('a.com') == 0
+
+
+def test_espera_exponencial_con_tope(settings):
+    settings.EMAIL_REINTENTO_SEGUNDOS = 60
+
+    assert [espera_reintento(n) for n in (1, 2, 3, 4)] == [60, 120, 240, 480]
+    assert espera_reintento(20) == outbox.REINTENTO_MAXIMO_SEGUNDOS
@@ -0,0 +1,206 @@
+"""
+Tests para la cola de emails salientes (EmailOutbox) y el comando enviar_emails
+"""
+import pytest
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from usuarios import outbox
+from usuarios.models import EmailChangeToken, EmailOutbox, PasswordResetToken
+from usuarios.outbox import enviar_pendientes, obtener_conexion_outbox, reclamar_emails
+from usuarios.services import (
+    cambiar_password_desde_perfil_service, confirmar_cambio_email_service,
+    confirmar_cambio_password_service, solicitar_cambio_password_service
+)
+from usuarios.utils import enviar_email_cambio_password
+
+
+@pytest.fixture(autouse=True)
+def sin_envio_inmediato(settings):
+    settings.EMAIL_OUTBOX_ENVIO_INMEDIATO = False
+
+
+@pytest.fixture
+def cola_sin_tabla(db):
+    """Hace fallar en la base el INSERT en la cola (la tabla vuelve al revertir el test)."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {EmailOutbox._meta.db_table}')
+
+
+def encolar(asunto='Asunto', destinatario='destino@example.com'):
+    return EmailOutbox.objects.create(
+        remitente='noreply@example.com', destinatarios=[destinatario],
+        asunto=asunto, cuerpo='<p>Hola</p>', tipo_contenido='html'
+    )
+
+
+@pytest.mark.django_db
+class TestEncolar:
+    """Tests para el encolado de emails desde usuarios.utils y los servicios"""
+
+    def test_utils_encola_sin_enviar(self, user, password_reset_token):
+        assert enviar_email_cambio_password(user, password_reset_token) is True
+
+        email = EmailOutbox.objects.get()
+        assert email.destinatarios == [user.email]
+        assert 'Cambio de contrasena' in email.asunto
+        assert password_reset_token.token in email.cuerpo
+        assert email.tipo_contenido == 'html'
+        assert email.estado == 'pendiente'
+        assert mail.outbox == []
+
+    def test_servicio_crea_token_y_email(self, user):
+        token, error = solicitar_cambio_password_service(user=user)
+
+        assert error is None
+        assert EmailOutbox.objects.filter(destinatarios=[user.email]).count() == 1
+        assert PasswordResetToken.objects.filter(id=token.id).exists()
+
+    def test_si_no_se_puede_encolar_no_queda_token(self, user):
+        with patch.object(outbox.OutboxEmailBackend, 'send_messages', side_effect=Exception('Base caída')):
+            token, error = solicitar_cambio_password_service(user=user)
+
+        assert token is None
+        assert error == "Error al enviar email"
+        assert not PasswordResetToken.objects.exists()
+        assert not EmailOutbox.objects.exists()
+
+    def test_cambio_de_password_se_guarda_si_falla_la_cola(self, user, cola_sin_tabla):
+        resultado, error = cambiar_password_desde_perfil_service(user, 'testpass123', 'NuevaClave456!')
+
+        user.refresh_from_db()
+        assert error is None
+        assert resultado == user
+        assert user.check_password('NuevaClave456!')
+
+    def test_confirmar_password_se_guarda_si_falla_la_cola(self, user, password_reset_token, cola_sin_tabla):
+        resultado, error = confirmar_cambio_password_service(password_reset_token.token, 'NuevaClave456!')
+
+        user.refresh_from_db()
+        password_reset_token.refresh_from_db()
+        assert error is None
+        assert user.check_password('NuevaClave456!')
+        assert password_reset_token.used
+
+    def test_confirmar_email_se_guarda_si_falla_la_cola(self, user, cola_sin_tabla):
+        token = EmailChangeToken.create_token(user, 'nuevo@example.com')
+
+        resultado, old_email, new_email, error = confirmar_cambio_email_service(token.token)
+
+        user.refresh_from_db()
+        token.refresh_from_db()
+        assert error is None
+        assert user.email == 'nuevo@example.com'
+        assert token.used
+
+    def test_solicitud_falla_si_la_cola_falla_en_la_base(self, user, cola_sin_tabla):
+        token, error = solicitar_cambio_password_service(user=user)
+
+        assert token is None
+        assert error == "Error al enviar email"
+        assert not PasswordResetToken.objects.exists()
+
+    def test_envio_inmediato_al_confirmar(self, user, settings, django_capture_on_commit_callbacks):
+        settings.EMAIL_OUTBOX_ENVIO_INMEDIATO = True
+
+        with django_capture_on_commit_callbacks(execute=True):
+            solicitar_cambio_password_service(user=user)
+
+        assert len(mail.outbox) == 1
+        assert EmailOutbox.objects.get().estado == 'enviado'
+
+
+@pytest.mark.django_db
+class TestEnviarPendientes:
+    """Tests para enviar_pendientes() y reclamar_emails()"""
+
+    def test_envia_y_marca_enviados(self):
+        encolar('Uno')
+        encolar('Dos')
+
+        enviados, fallidos = enviar_pendientes()
+
+        assert (enviados, fallidos) == (2, 0)
+        assert [m.subject for m in mail.outbox] == ['Uno', 'Dos']
+        assert mail.outbox[0].content_subtype == 'html'
+        assert not EmailOutbox.objects.exclude(estado='enviado').exists()
+        assert enviar_pendientes() == (0, 0)
+
+    def test_copia_oculta_no_va_en_los_encabezados(self):
+        EmailMessage(
+            'Asunto', 'Hola', 'noreply@example.com', ['ana@example.com'],
+            cc=['beto@example.com'], bcc=['oculto@example.com'], connection=obtener_conexion_outbox(),
+        ).send()
+        email = EmailOutbox.objects.get()
+        assert (email.destinatarios, email.copia, email.copia_oculta) == (
+            ['ana@example.com'], ['beto@example.com'], ['oculto@example.com']
+        )
+
+        enviar_pendientes()
+
+        enviado = mail.outbox[0]
+        assert enviado.recipients() == ['ana@example.com', 'beto@example.com', 'oculto@example.com']
+        encabezados = enviado.message()
+        assert encabezados['To'] == 'ana@example.com'
+        assert encabezados['Cc'] == 'beto@example.com'
+        assert 'oculto@example.com' not in encabezados.as_string()
+
+    def test_error_programa_reintento(self):
+        email = encolar()
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP caído')):
+            assert enviar_pendientes() == (0, 1)
+
+        email.refresh_from_db()
+        assert email.estado == 'pendiente'
+        assert email.intentos == 1
+        assert 'SMTP caído' in email.ultimo_error
+        assert email.disponible_en > timezone.now()
+
+    def test_agotados_los_intentos_queda_fallido(self, monkeypatch):
+        monkeypatch.setattr(outbox, 'MAX_INTENTOS', 1)
+        email = encolar()
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP caído')):
+            enviar_pendientes()
+
+        email.refresh_from_db()
+        assert email.estado == 'fallido'
+
+    def test_reserva_vencida_se_vuelve_a_tomar(self):
+        email = encolar()
+        assert reclamar_emails() == [email]
+        assert reclamar_emails() == []
+
+        EmailOutbox.objects.filter(id=email.id).update(disponible_en=timezone.now() - timedelta(seconds=1))
+
+        assert reclamar_emails() == [email]
+        email.refresh_from_db()
+        assert email.intentos == 2
+
+    def test_respeta_el_limite(self):
+        for numero in range(3):
+            encolar(f'Email {numero}')
+
+        assert len(reclamar_emails(limite=2)) == 2
+
+
+@pytest.mark.django_db
+class TestComandoEnviarEmails:
+    """Tests para el comando enviar_emails"""
+
+    def test_una_vez(self):
+        for numero in range(3):
+            encolar(f'Email {numero}')
+        salida = StringIO()
+
+        call_command('enviar_emails', una_vez=True, lote=2, stdout=salida)
+
+        assert len(mail.outbox) == 3
+        assert 'Emails enviados: 2' in salida.getvalue()
+        assert 'Emails enviados: 1' in salida.getvalue()
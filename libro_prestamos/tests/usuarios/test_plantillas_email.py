@@ -0,0 +1,80 @@
+"""
+Tests para el armado de emails con plantillas (usuarios.utils.construir_email)
+"""
+import pytest
+from django.core import mail
+from usuarios.models import EmailOutbox
+from usuarios.outbox import enviar_pendientes, obtener_conexion_outbox
+from usuarios.utils import construir_email, enviar_email_cambio_password, url_base
+
+
+@pytest.fixture(autouse=True)
+def sin_envio_inmediato(settings):
+    settings.EMAIL_OUTBOX_ENVIO_INMEDIATO = False
+
+
+class TestUrlBase:
+    """Tests para url_base()"""
+
+    def test_desarrollo(self, settings):
+        settings.DEBUG = True
+
+        assert url_base() == 'http://127.0.0.1:8000'
+
+    def test_produccion_usa_primer_host(self, settings):
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = ['biblioteca.example.com', 'www.biblioteca.example.com']
+
+        assert url_base() == 'https://biblioteca.example.com'
+
+    def test_se_recalcula_al_cambiar_settings(self, settings):
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = ['uno.example.com']
+        assert url_base() == 'https://uno.example.com'
+
+        settings.ALLOWED_HOSTS = ['dos.example.com']
+
+        assert url_base() == 'https://dos.example.com'
+
+
+@pytest.mark.django_db
+class TestConstruirEmail:
+    """Tests para construir_email()"""
+
+    def test_html_y_texto_plano(self, user):
+        user.first_name = 'Ana & Luis'
+        email = construir_email('email_change_confirmation', user.email, {
+            'user': user, 'old_email': 'viejo@example.com',
+        })
+
+        texto, tipo = email.alternatives[0]
+        assert email.content_subtype == 'html'
+        assert 'Ana &amp; Luis' in email.body
+        assert tipo == 'text/plain'
+        assert 'Hola Ana & Luis ' in texto
+        assert 'Correo anterior: viejo@example.com' in texto
+
+    def test_varios_emails_en_un_solo_insert(self, user, django_assert_num_queries):
+        conexion = obtener_conexion_outbox()
+        emails = [
+            construir_email('password_change_confirmation', f'usuario{numero}@example.com', {'user': user}, conexion)
+            for numero in range(20)
+        ]
+
+        with django_assert_num_queries(1):
+            conexion.send_messages(emails)
+
+        assert EmailOutbox.objects.count() == 20
+
+    def test_se_envia_como_multipart_alternative(self, user, password_reset_token):
+        enviar_email_cambio_password(user, password_reset_token)
+
+        encolado = EmailOutbox.objects.get()
+        assert 'Has solicitado cambiar tu contraseña' in encolado.cuerpo_texto
+
+        enviar_pendientes()
+
+        enviado = mail.outbox[0]
+        assert enviado.body == encolado.cuerpo_texto
+        assert enviado.alternatives[0] == (encolado.cuerpo, 'text/html')
+        assert password_reset_token.token in enviado.body
@@ -0,0 +1,139 @@
+"""
+Tests para la purga de tokens y emails enviados (usuarios.limpieza y comando purgar_tokens)
+"""
+import pytest
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from usuarios.limpieza import purgables, purgar_en_lotes
+from usuarios.models import EmailChangeToken, EmailOutbox, PasswordResetToken
+
+
+def crear_token_password(user, dias_creado=0, usado=False):
+    """Token creado hace `dias_creado` días (vence 24 horas después de crearse)"""
+    token = PasswordResetToken.create_token(user)
+    creado = timezone.now() - timedelta(days=dias_creado)
+    PasswordResetToken.objects.filter(id=token.id).update(
+        created_at=creado, expires_at=creado + timedelta(hours=24), used=usado
+    )
+    return token
+
+
+def crear_token_email(user, dias_creado=0, usado=False):
+    token = EmailChangeToken.create_token(user, 'nuevo@example.com')
+    creado = timezone.now() - timedelta(days=dias_creado)
+    EmailChangeToken.objects.filter(id=token.id).update(
+        created_at=creado, expires_at=creado + timedelta(hours=24), used=usado
+    )
+    return token
+
+
+def crear_email(estado='enviado', dias_enviado=0):
+    return EmailOutbox.objects.create(
+        remitente='noreply@example.com', destinatarios=['ana@example.com'], asunto='Asunto',
+        cuerpo='Hola', estado=estado,
+        enviado_en=timezone.now() - timedelta(days=dias_enviado) if estado == 'enviado' else None,
+    )
+
+
+@pytest.mark.django_db
+class TestPurgables:
+    """Tests para purgables()"""
+
+    def test_tokens_vencidos_y_usados(self, user):
+        vencido = crear_token_password(user, dias_creado=3)
+        usado = crear_token_password(user, dias_creado=2, usado=True)
+        usado_reciente = crear_token_password(user, usado=True)
+        vigente = crear_token_password(user)
+        email_vencido = crear_token_email(user, dias_creado=3)
+        email_vigente = crear_token_email(user)
+
+        (_, passwords), (_, emails), _ = purgables()
+
+        assert set(passwords) == {vencido, usado}
+        assert list(emails) == [email_vencido]
+        assert usado_reciente not in passwords
+        assert vigente not in passwords
+        assert email_vigente not in emails
+
+    def test_emails_enviados_antiguos(self):
+        antiguo = crear_email(dias_enviado=8)
+        crear_email(dias_enviado=1)
+        crear_email(estado='pendiente')
+        crear_email(estado='fallido')
+
+        _, _, (_, emails) = purgables()
+
+        assert list(emails) == [antiguo]
+
+
+@pytest.mark.django_db
+class TestPurgarEnLotes:
+    """Tests para purgar_en_lotes()"""
+
+    def test_borra_en_lotes_acotados(self, user):
+        for _ in range(5):
+            crear_token_password(user, dias_creado=3)
+        vigente = crear_token_password(user)
+        (_, queryset), _, _ = purgables()
+
+        borradas, lotes = purgar_en_lotes(queryset, lote=2)
+
+        assert (borradas, lotes) == (5, 3)
+        assert list(PasswordResetToken.objects.all()) == [vigente]
+
+    def test_sin_filas(self):
+        (_, queryset), _, _ = purgables()
+
+        assert purgar_en_lotes(queryset) == (0, 0)
+
+    def test_cada_lote_continua_desde_el_ultimo_id(self, user, django_assert_max_num_queries):
+        for _ in range(4):
+            crear_token_password(user, dias_creado=3)
+        (_, queryset), _, _ = purgables()
+
+        # Dos lotes (SELECT de ids, SAVEPOINT, DELETE, RELEASE) y un SELECT final sin filas
+        with django_assert_max_num_queries(2 * 4 + 1):
+            purgar_en_lotes(queryset, lote=2)
+
+
+@pytest.mark.django_db
+class TestComandoPurgarTokens:
+    """Tests para el comando purgar_tokens"""
+
+    def test_informa_filas_borradas(self, user):
+        crear_token_password(user, dias_creado=3)
+        crear_token_email(user, dias_creado=3)
+        crear_email(dias_enviado=10)
+        salida = StringIO()
+
+        call_command('purgar_tokens', stdout=salida)
+
+        assert 'PasswordResetToken: 1 fila(s) borrada(s) en 1 lote(s).' in salida.getvalue()
+        assert 'EmailChangeToken: 1 fila(s) borrada(s)' in salida.getvalue()
+        assert 'EmailOutbox: 1 fila(s) borrada(s)' in salida.getvalue()
+        assert 'Total: 3 fila(s)' in salida.getvalue()
+        assert not PasswordResetToken.objects.exists()
+        assert not EmailOutbox.objects.exists()
+
+    def test_simular_no_borra(self, user):
+        crear_token_password(user, dias_creado=3)
+        salida = StringIO()
+
+        call_command('purgar_tokens', '--simular', stdout=salida)
+
+        assert 'PasswordResetToken: 1 fila(s) a borrar.' in salida.getvalue()
+        assert PasswordResetToken.objects.count() == 1
+
+    def test_dias_de_retencion(self, user):
+        crear_token_password(user, dias_creado=3)
+
+        call_command('purgar_tokens', '--dias', '7', stdout=StringIO())
+
+        assert PasswordResetToken.objects.count() == 1
+
+    def test_lote_invalido(self):
+        with pytest.raises(CommandError):
+            call_command('purgar_tokens', '--lote', '0', stdout=StringIO())
@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import Perfil
+from .models import EmailOutbox, Perfil, UserStats
 
 admin.site.register(Perfil)
+admin.site.register(UserStats)
+admin.site.register(EmailOutbox)
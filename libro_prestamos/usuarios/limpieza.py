@@ -0,0 +1,75 @@
+"""
+Purga de filas que ya no sirven: tokens de cambio de contraseña y de email
+usados o vencidos, y emails de la cola (EmailOutbox) ya enviados.
+
+Las filas se borran en lotes acotados, cada uno en su propia transacción
+corta, para no bloquear la tabla mientras se atienden peticiones. Los lotes
+se buscan recorriendo la clave primaria (id > último borrado), así cada
+consulta continúa donde terminó la anterior en lugar de volver a leer la
+tabla desde el principio. Lo usa el comando purgar_tokens.
+"""
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EmailChangeToken, EmailOutbox, PasswordResetToken
+
+LOTE_PURGA = 1000
+# Los tokens usados o vencidos se conservan un tiempo: quien vuelve a abrir
+# el enlace ve "ya fue utilizado" en lugar de "inválido"
+DIAS_RETENCION_TOKENS = 1
+DIAS_RETENCION_EMAILS = 7
+
+
+def purgables(dias_tokens=DIAS_RETENCION_TOKENS, dias_emails=DIAS_RETENCION_EMAILS, ahora=None):
+    """
+    Filas a purgar de cada modelo.
+
+    Returns:
+        tuple: Pares (nombre del modelo, queryset)
+    """
+    ahora = ahora or timezone.now()
+    limite_tokens = ahora - timedelta(days=dias_tokens)
+    tokens = Q(expires_at__lt=limite_tokens) | Q(used=True, created_at__lt=limite_tokens)
+    return (
+        ('PasswordResetToken', PasswordResetToken.objects.filter(tokens)),
+        ('EmailChangeToken', EmailChangeToken.objects.filter(tokens)),
+        ('EmailOutbox', EmailOutbox.objects.filter(
+            estado='enviado', enviado_en__lt=ahora - timedelta(days=dias_emails)
+        )),
+    )
+
+
+def purgar_en_lotes(queryset, lote=LOTE_PURGA, pausa=0):
+    """
+    Borra las filas del queryset en lotes de a lo sumo `lote` filas.
+
+    Args:
+        queryset: Filas a borrar
+        lote: Filas por lote (y por transacción)
+        pausa: Segundos de espera entre lotes, para ceder la base a otras escrituras
+
+    Returns:
+        tuple: (filas borradas, lotes)
+    """
+    borradas = lotes = 0
+    ultimo_id = 0
+    while True:
+        ids = list(
+            queryset.filter(id__gt=ultimo_id).order_by('id').values_list('id', flat=True)[:lote]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            # Se repite la condición por si la fila cambió desde que se leyó
+            borradas += queryset.filter(id__in=ids).delete()[0]
+        lotes += 1
+        ultimo_id = ids[-1]
+        if len(ids) < lote:
+            break
+        if pausa:
+            time.sleep(pausa)
+    return borradas, lotes
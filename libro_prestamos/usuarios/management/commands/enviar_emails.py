@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from usuarios.outbox import enviar_pendientes, limite_configurado
+
+
+class Command(BaseCommand):
+    help = 'Envía los emails encolados en EmailOutbox (worker sin broker externo: la cola es la base de datos).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help='Envía los emails pendientes y termina, en lugar de quedar esperando.'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5,
+            help='Segundos de espera entre consultas cuando la cola está vacía (por defecto 5).'
+        )
+        parser.add_argument(
+            '--lote', type=int,
+            help='Emails a enviar por conexión (por defecto EMAIL_LOTE_ENVIO).'
+        )
+
+    def handle(self, *args, **options):
+        # El límite por dominio se conserva entre lotes
+        limite_dominio = limite_configurado()
+        try:
+            while True:
+                enviados, fallidos = enviar_pendientes(options['lote'], limite_dominio)
+                if enviados or fallidos:
+                    self.stdout.write(f'Emails enviados: {enviados}, con error: {fallidos}.')
+                    continue
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido.')
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from usuarios.limpieza import (
+    DIAS_RETENCION_EMAILS, DIAS_RETENCION_TOKENS, LOTE_PURGA, purgables, purgar_en_lotes,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra en lotes los tokens de cambio de contraseña y de email usados o vencidos, '
+        'y los emails ya enviados de la cola. Pensado para correr periódicamente (ej: cron diario).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=LOTE_PURGA,
+            help=f'Filas borradas por transacción (por defecto {LOTE_PURGA}).'
+        )
+        parser.add_argument(
+            '--pausa', type=float, default=0,
+            help='Segundos de espera entre lotes (por defecto 0).'
+        )
+        parser.add_argument(
+            '--dias', type=int, default=DIAS_RETENCION_TOKENS,
+            help=f'Días que se conservan los tokens usados o vencidos (por defecto {DIAS_RETENCION_TOKENS}).'
+        )
+        parser.add_argument(
+            '--dias-emails', type=int, default=DIAS_RETENCION_EMAILS,
+            help=f'Días que se conservan los emails enviados (por defecto {DIAS_RETENCION_EMAILS}).'
+        )
+        parser.add_argument(
+            '--simular', action='store_true',
+            help='Solo informa cuántas filas se borrarían; no borra nada.'
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que 0.')
+        if options['dias'] < 0 or options['dias_emails'] < 0:
+            raise CommandError('Los días de retención no pueden ser negativos.')
+
+        inicio = time.perf_counter()
+        total = 0
+        for nombre, queryset in purgables(options['dias'], options['dias_emails']):
+            if options['simular']:
+                filas = queryset.count()
+                self.stdout.write(f'{nombre}: {filas} fila(s) a borrar.')
+            else:
+                filas, lotes = purgar_en_lotes(queryset, options['lote'], options['pausa'])
+                self.stdout.write(f'{nombre}: {filas} fila(s) borrada(s) en {lotes} lote(s).')
+            total += filas
+
+        segundos = time.perf_counter() - inicio
+        if options['simular']:
+            self.stdout.write(self.style.SUCCESS(f'Total: {total} fila(s) a borrar.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Total: {total} fila(s) borrada(s) en {segundos:.2f} s.'))
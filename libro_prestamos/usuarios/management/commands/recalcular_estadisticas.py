@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import calcular_estadisticas_usuario, recalcular_estadisticas
+from usuarios.models import UserStats
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye (o verifica con --verificar) los contadores de UserStats a partir de libros y préstamos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help='Solo compara los contadores guardados con los reales; no modifica nada.'
+        )
+        parser.add_argument(
+            '--usuario',
+            help='Username de un único usuario a procesar.'
+        )
+
+    def handle(self, *args, **options):
+        usuarios = User.objects.order_by('id').only('id', 'username')
+        if options['usuario']:
+            usuarios = usuarios.filter(username=options['usuario'])
+            if not usuarios.exists():
+                raise CommandError(f"No existe el usuario '{options['usuario']}'.")
+
+        guardadas = {
+            fila['usuario_id']: fila
+            for fila in UserStats.objects.values('usuario_id', *UserStats.CONTADORES)
+        } if options['verificar'] else {}
+
+        procesados = 0
+        diferencias = 0
+        for usuario in usuarios.iterator():
+            procesados += 1
+            if not options['verificar']:
+                recalcular_estadisticas(usuario)
+                continue
+            reales = calcular_estadisticas_usuario(usuario)
+            guardada = guardadas.get(usuario.id)
+            if guardada is None:
+                # Sin fila: se calcula al leerla, no es una inconsistencia
+                continue
+            distintos = [
+                f'{campo}={guardada[campo]} (real {reales[campo]})'
+                for campo in UserStats.CONTADORES if guardada[campo] != reales[campo]
+            ]
+            if distintos:
+                diferencias += 1
+                self.stdout.write(self.style.WARNING(f'{usuario.username}: ' + ', '.join(distintos)))
+
+        if not options['verificar']:
+            self.stdout.write(self.style.SUCCESS(f'Estadísticas recalculadas para {procesados} usuario(s).'))
+        elif diferencias:
+            raise CommandError(f'{diferencias} de {procesados} usuario(s) con contadores desactualizados.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Contadores correctos para {procesados} usuario(s).'))
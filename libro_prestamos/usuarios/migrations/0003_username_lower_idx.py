@@ -0,0 +1,34 @@
+from django.db import migrations
+
+INDICE = 'usuarios_username_lower_idx'
+
+# Bases de datos con índices sobre expresiones con esta sintaxis
+BASES_SOPORTADAS = ('sqlite', 'postgresql')
+
+
+def crear_indice(apps, schema_editor):
+    """
+    Índice sobre lower(username) de auth_user, para el autocompletado de
+    prestatarios (el modelo User no es nuestro, así que se crea a mano).
+    """
+    if schema_editor.connection.vendor not in BASES_SOPORTADAS:
+        return
+    schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {INDICE} ON auth_user (lower(username))')
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor not in BASES_SOPORTADAS:
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('usuarios', '0002_userstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
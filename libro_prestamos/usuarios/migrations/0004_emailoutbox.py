@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_username_lower_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('remitente', models.CharField(max_length=254)),
+                ('destinatarios', models.JSONField(default=list)),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo', models.TextField()),
+                ('tipo_contenido', models.CharField(default='plain', max_length=10)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviando', 'Enviando'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reserva', models.CharField(blank=True, default='', max_length=32)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('enviado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['estado', 'disponible_en'], name='usuarios_outbox_cola_idx')],
+            },
+        ),
+    ]
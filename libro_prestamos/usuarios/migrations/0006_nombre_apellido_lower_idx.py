@@ -0,0 +1,38 @@
+from django.db import migrations
+
+INDICES = {
+    'usuarios_first_name_lower_idx': 'first_name',
+    'usuarios_last_name_lower_idx': 'last_name',
+}
+
+# Bases de datos con índices sobre expresiones con esta sintaxis
+BASES_SOPORTADAS = ('sqlite', 'postgresql')
+
+
+def crear_indices(apps, schema_editor):
+    """
+    Índices sobre lower(first_name) y lower(last_name) de auth_user, para
+    buscar prestatarios también por nombre y apellido (ver 0003).
+    """
+    if schema_editor.connection.vendor not in BASES_SOPORTADAS:
+        return
+    for indice, columna in INDICES.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {indice} ON auth_user (lower({columna}))')
+
+
+def eliminar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor not in BASES_SOPORTADAS:
+        return
+    for indice in INDICES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {indice}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0005_emailoutbox_cuerpo_texto'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
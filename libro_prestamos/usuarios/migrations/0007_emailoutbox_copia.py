@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0006_nombre_apellido_lower_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='copia',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='copia_oculta',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -14,6 +14,24 @@ class Perfil(models.Model):
     def __str__(self):
         return self.usuario.username
 
+class UserStats(models.Model):
+    """
+    Contadores desnormalizados del usuario para el panel de inicio.
+    Se actualizan de forma incremental (ver core.services.ajustar_estadisticas)
+    y se pueden reconstruir con el comando recalcular_estadisticas.
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='estadisticas')
+    total_libros = models.IntegerField(default=0)
+    libros_disponibles = models.IntegerField(default=0)
+    prestamos_activos = models.IntegerField(default=0)
+    prestamos_recibidos = models.IntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+    
+    CONTADORES = ('total_libros', 'libros_disponibles', 'prestamos_activos', 'prestamos_recibidos')
+    
+    def __str__(self):
+        return f"Estadísticas de {self.usuario.username}"
+
 class PasswordResetToken(models.Model):
     """Modelo para tokens de cambio de contraseña con confirmación por email"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='password_reset_tokens')
@@ -132,3 +150,45 @@ class EmailChangeToken(models.Model):
     
     def __str__(self):
         return f"EmailChangeToken for {self.user.username} -> {self.new_email} - Valid: {self.is_valid()}"
+
+
+class EmailOutbox(models.Model):
+    """
+    Email pendiente de envío (patrón outbox). Se guarda en la misma transacción
+    que el cambio que lo origina (ej: el token) y el comando enviar_emails lo
+    entrega fuera de la petición, así que la latencia no depende del servidor
+    SMTP y los emails sobreviven a reinicios del proceso.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+    remitente = models.CharField(max_length=254)
+    destinatarios = models.JSONField(default=list)
+    # Se guardan aparte para reconstruir el mensaje: los de copia oculta no van en los encabezados
+    copia = models.JSONField(default=list, blank=True)
+    copia_oculta = models.JSONField(default=list, blank=True)
+    asunto = models.CharField(max_length=255)
+    cuerpo = models.TextField()
+    # Versión en texto plano de un cuerpo HTML (se envía como multipart/alternative)
+    cuerpo_texto = models.TextField(blank=True, default='')
+    tipo_contenido = models.CharField(max_length=10, default='plain')
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True, default='')
+    # Un email 'enviando' cuyo plazo venció (worker caído) vuelve a tomarse
+    disponible_en = models.DateTimeField(default=timezone.now)
+    reserva = models.CharField(max_length=32, blank=True, default='')
+    creado_en = models.DateTimeField(auto_now_add=True)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['estado', 'disponible_en'], name='usuarios_outbox_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} -> {', '.join(self.destinatarios)} - {self.estado}"
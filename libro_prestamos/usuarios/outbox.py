@@ -0,0 +1,276 @@
+"""
+Cola de emails salientes (outbox) guardada en la base de datos.
+
+- OutboxEmailBackend: backend de email que en lugar de enviar guarda cada
+  mensaje como EmailOutbox. Como escribe con el ORM, el email queda en la
+  misma transacción que el token que lo origina: si la transacción se
+  revierte, el email no sale.
+- enviar_pendientes(): reclama un lote de emails y los entrega con el
+  backend real (settings.EMAIL_BACKEND) reutilizando una sola conexión
+  (una sola negociación TLS y autenticación SMTP por lote). Lo usa el
+  comando enviar_emails.
+
+Los errores se reintentan con espera exponencial y, opcionalmente, se limita
+la cantidad de emails por minuto a cada dominio (LimitePorDominio).
+"""
+import logging
+import smtplib
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+LOTE_ENVIO = 50
+# Plazo de un envío reclamado; si vence (worker caído) el email se vuelve a tomar
+SEGUNDOS_RESERVA = 600
+# Espera antes del reintento n: REINTENTO_SEGUNDOS * 2^(n-1), con tope
+REINTENTO_SEGUNDOS = 60
+REINTENTO_MAXIMO_SEGUNDOS = 3600
+MAX_INTENTOS = 5
+
+
+class LimitePorDominio:
+    """
+    Ventana deslizante de un minuto con la cantidad de envíos por dominio de
+    destino (ej: para no superar el límite de entrada de un proveedor).
+    El estado vive en el proceso: con varios workers el límite es por worker.
+    """
+
+    def __init__(self, maximo_por_minuto=0, reloj=time.monotonic):
+        self.maximo_por_minuto = maximo_por_minuto
+        self.reloj = reloj
+        self._envios = defaultdict(deque)
+
+    def espera(self, dominio):
+        """Segundos que faltan para poder enviar otro email al dominio (0 si se puede ya)."""
+        if not self.maximo_por_minuto:
+            return 0
+        envios = self._envios[dominio]
+        ahora = self.reloj()
+        while envios and envios[0] <= ahora - 60:
+            envios.popleft()
+        if len(envios) < self.maximo_por_minuto:
+            return 0
+        return envios[0] + 60 - ahora
+
+    def registrar(self, dominio):
+        if self.maximo_por_minuto:
+            self._envios[dominio].append(self.reloj())
+
+
+def limite_configurado():
+    return LimitePorDominio(getattr(settings, 'EMAIL_MAX_POR_DOMINIO_POR_MINUTO', 0))
+
+
+def dominio_de(email):
+    destinatario = email.destinatarios[0] if email.destinatarios else ''
+    return destinatario.rpartition('@')[2].lower()
+
+
+def espera_reintento(intentos):
+    """Espera exponencial antes del próximo intento (intentos ya realizados >= 1)."""
+    base = getattr(settings, 'EMAIL_REINTENTO_SEGUNDOS', REINTENTO_SEGUNDOS)
+    return min(base * 2 ** max(intentos - 1, 0), REINTENTO_MAXIMO_SEGUNDOS)
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """Backend que encola los mensajes en EmailOutbox en lugar de enviarlos."""
+
+    def send_messages(self, email_messages):
+        encolados = [EmailOutbox(**datos_mensaje(mensaje)) for mensaje in email_messages]
+        EmailOutbox.objects.bulk_create(encolados)
+        if getattr(settings, 'EMAIL_OUTBOX_ENVIO_INMEDIATO', False):
+            # Desarrollo: enviar apenas se confirme la transacción, sin worker
+            transaction.on_commit(enviar_pendientes, robust=True)
+        return len(encolados)
+
+
+def obtener_conexion_outbox():
+    """Conexión para encolar emails (ver OutboxEmailBackend)."""
+    return get_connection('usuarios.outbox.OutboxEmailBackend')
+
+
+def datos_mensaje(mensaje):
+    """
+    Campos de EmailOutbox para un EmailMessage (sin adjuntos). De las
+    alternativas se conserva el par HTML / texto plano, en cualquiera de las
+    dos formas: cuerpo HTML con alternativa text/plain, o cuerpo en texto
+    plano con alternativa text/html (EmailMultiAlternatives).
+    """
+    if mensaje.attachments:
+        raise ValueError('La cola de emails no admite adjuntos')
+    alternativas = {tipo: contenido for contenido, tipo in getattr(mensaje, 'alternatives', ())}
+    if mensaje.content_subtype == 'plain' and 'text/html' in alternativas:
+        cuerpo, tipo_contenido, cuerpo_texto = alternativas['text/html'], 'html', mensaje.body
+    else:
+        cuerpo, tipo_contenido = mensaje.body, mensaje.content_subtype
+        cuerpo_texto = alternativas.get('text/plain', '')
+    return {
+        'remitente': mensaje.from_email or settings.DEFAULT_FROM_EMAIL,
+        'destinatarios': list(mensaje.to),
+        'copia': list(mensaje.cc),
+        'copia_oculta': list(mensaje.bcc),
+        'asunto': mensaje.subject,
+        'cuerpo': cuerpo,
+        'cuerpo_texto': cuerpo_texto,
+        'tipo_contenido': tipo_contenido,
+    }
+
+
+def construir_mensaje(email, connection=None):
+    """
+    Reconstruye el EmailMessage a enviar a partir de un EmailOutbox. Si hay
+    versión en texto plano se arma un multipart/alternative con el texto
+    primero y el HTML después (los clientes muestran la última que soportan).
+    """
+    if email.cuerpo_texto and email.tipo_contenido == 'html':
+        mensaje = EmailMultiAlternatives(
+            subject=email.asunto,
+            body=email.cuerpo_texto,
+            from_email=email.remitente,
+            to=email.destinatarios,
+            cc=email.copia,
+            bcc=email.copia_oculta,
+            connection=connection,
+        )
+        mensaje.attach_alternative(email.cuerpo, 'text/html')
+    else:
+        mensaje = EmailMessage(
+            subject=email.asunto,
+            body=email.cuerpo,
+            from_email=email.remitente,
+            to=email.destinatarios,
+            cc=email.copia,
+            bcc=email.copia_oculta,
+            connection=connection,
+        )
+        mensaje.content_subtype = email.tipo_contenido
+    mensaje.encoding = 'utf-8'
+    return mensaje
+
+
+def reclamar_emails(limite=LOTE_ENVIO):
+    """
+    Reclama hasta `limite` emails listos para enviar (pendientes, o 'enviando'
+    con la reserva vencida). El UPDATE condicional marca los emails con una
+    reserva propia, así dos workers nunca toman el mismo email.
+
+    Returns:
+        list[EmailOutbox]: Emails reclamados, en estado 'enviando'
+    """
+    ahora = timezone.now()
+    disponibles = EmailOutbox.objects.filter(
+        estado__in=('pendiente', 'enviando'), disponible_en__lte=ahora
+    )
+    ids = list(disponibles.order_by('disponible_en', 'id').values_list('id', flat=True)[:limite])
+    if not ids:
+        return []
+    reserva = uuid.uuid4().hex
+    disponibles.filter(id__in=ids).update(
+        estado='enviando',
+        reserva=reserva,
+        intentos=F('intentos') + 1,
+        disponible_en=ahora + timedelta(seconds=SEGUNDOS_RESERVA),
+    )
+    return list(EmailOutbox.objects.filter(reserva=reserva, estado='enviando').order_by('id'))
+
+
+def marcar_enviado(email):
+    EmailOutbox.objects.filter(id=email.id, reserva=email.reserva).update(
+        estado='enviado', enviado_en=timezone.now(), ultimo_error=''
+    )
+
+
+def marcar_error(email, error):
+    """Programa un reintento con espera exponencial o, agotados los intentos, marca el email como fallido."""
+    agotado = email.intentos >= MAX_INTENTOS
+    EmailOutbox.objects.filter(id=email.id, reserva=email.reserva).update(
+        estado='fallido' if agotado else 'pendiente',
+        ultimo_error=str(error)[:1000],
+        disponible_en=timezone.now() + timedelta(seconds=espera_reintento(email.intentos)),
+    )
+
+
+def diferir(email, segundos):
+    """Devuelve el email a la cola sin contar el intento (límite por dominio)."""
+    EmailOutbox.objects.filter(id=email.id, reserva=email.reserva).update(
+        estado='pendiente',
+        intentos=F('intentos') - 1,
+        disponible_en=timezone.now() + timedelta(seconds=segundos),
+    )
+
+
+def _enviar(connection, email):
+    """
+    Envía un email por la conexión abierta. Si el servidor cortó la conexión
+    (ej: timeout entre lotes), reconecta una vez y reintenta.
+    """
+    try:
+        return connection.send_messages([construir_mensaje(email, connection)])
+    except smtplib.SMTPServerDisconnected:
+        connection.close()
+        connection.open()
+        return connection.send_messages([construir_mensaje(email, connection)])
+
+
+def enviar_pendientes(limite=None, limite_dominio=None):
+    """
+    Reclama un lote de emails y los envía con el backend configurado,
+    reutilizando una sola conexión para todo el lote.
+
+    Args:
+        limite: Tamaño del lote (por defecto EMAIL_LOTE_ENVIO)
+        limite_dominio: LimitePorDominio a respetar (el worker conserva el mismo
+            entre lotes); por defecto se usa EMAIL_MAX_POR_DOMINIO_POR_MINUTO
+
+    Returns:
+        tuple: (enviados, fallidos)
+    """
+    limite = limite or getattr(settings, 'EMAIL_LOTE_ENVIO', LOTE_ENVIO)
+    limite_dominio = limite_dominio or limite_configurado()
+    emails = reclamar_emails(limite)
+    if not emails:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"No se pudo conectar con el servidor de email: {e}")
+        for email in emails:
+            marcar_error(email, e)
+        return 0, len(emails)
+
+    enviados = fallidos = 0
+    try:
+        for email in emails:
+            dominio = dominio_de(email)
+            espera = limite_dominio.espera(dominio)
+            if espera:
+                diferir(email, espera)
+                continue
+            try:
+                if not _enviar(connection, email):
+                    raise RuntimeError('El backend de email no envió el mensaje')
+            except Exception as e:
+                logger.error(f"Error al enviar el email {email.id}: {e}")
+                marcar_error(email, e)
+                fallidos += 1
+            else:
+                marcar_enviado(email)
+                limite_dominio.registrar(dominio)
+                enviados += 1
+    finally:
+        connection.close()
+    return enviados, fallidos
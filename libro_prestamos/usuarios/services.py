@@ -5,6 +5,7 @@ Separa la lógica de negocio de las vistas según AGENT.md.
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from django.db import transaction
 import traceback
 import logging
 from .models import PasswordResetToken, EmailChangeToken
@@ -42,20 +43,24 @@ def solicitar_cambio_password_service(user=None, email=None):
     if not user:
         return None, "Usuario no encontrado"
     
-    # Crear token
+    # Crear token y encolar el email en la misma transacción:
+    # si el email no se puede encolar, el token no queda creado
+    token = None
     try:
-        token = PasswordResetToken.create_token(user)
-    except Exception as e:
-        logger.error(f"Error al crear token de cambio de contraseña: {e}")
-        return None, "Error al crear token de cambio de contraseña"
-    
-    # Enviar email
-    try:
-        if enviar_email_cambio_password(user, token):
+        with transaction.atomic():
+            token = PasswordResetToken.create_token(user)
+            encolado = enviar_email_cambio_password(user, token)
+            if not encolado:
+                transaction.set_rollback(True)
+        if encolado:
             return token, None
         else:
             return None, "Error al enviar email"
     except Exception as e:
+        if token is None:
+            logger.error(f"Error al crear token de cambio de contraseña: {e}")
+            return None, "Error al crear token de cambio de contraseña"
+
         logger.error(f"Error al enviar email en servicio: {e}")
         logger.error(traceback.format_exc())
         
@@ -97,14 +102,15 @@ def confirmar_cambio_password_service(token_value, new_password):
     
     # Cambiar contraseña
     try:
-        reset_token.user.set_password(new_password)
-        reset_token.user.save()
-        
-        # Marcar token como usado
-        reset_token.mark_as_used()
-        
-        # Enviar email de confirmación
-        enviar_email_confirmacion_cambio(reset_token.user)
+        with transaction.atomic():
+            reset_token.user.set_password(new_password)
+            reset_token.user.save()
+            
+            # Marcar token como usado
+            reset_token.mark_as_used()
+            
+            # Encolar email de confirmación
+            enviar_email_confirmacion_cambio(reset_token.user)
         
         return reset_token.user, None
     except Exception as e:
@@ -131,11 +137,12 @@ def cambiar_password_desde_perfil_service(user, old_password, new_password):
     
     # Cambiar contraseña
     try:
-        user.set_password(new_password)
-        user.save()
-        
-        # Enviar email de confirmación
-        enviar_email_confirmacion_cambio(user)
+        with transaction.atomic():
+            user.set_password(new_password)
+            user.save()
+            
+            # Encolar email de confirmación
+            enviar_email_confirmacion_cambio(user)
         
         return user, None
     except Exception as e:
@@ -165,20 +172,23 @@ def solicitar_cambio_email_service(user, new_email, password):
     if User.objects.filter(email=new_email).exclude(id=user.id).exists():
         return None, "Este correo electrónico ya está en uso"
     
-    # Crear token
+    # Crear token y encolar el email con el enlace en la misma transacción
+    token = None
     try:
-        token = EmailChangeToken.create_token(user, new_email)
-    except Exception as e:
-        logger.error(f"Error al crear token de cambio de email: {e}")
-        return None, "Error al crear token de cambio de email"
-    
-    # Enviar email con enlace de confirmación
-    try:
-        if enviar_email_cambio_email(user, token, new_email):
+        with transaction.atomic():
+            token = EmailChangeToken.create_token(user, new_email)
+            encolado = enviar_email_cambio_email(user, token, new_email)
+            if not encolado:
+                transaction.set_rollback(True)
+        if encolado:
             return token, None
         else:
             return None, "Error al enviar email"
     except Exception as e:
+        if token is None:
+            logger.error(f"Error al crear token de cambio de email: {e}")
+            return None, "Error al crear token de cambio de email"
+
         logger.error(f"Error al enviar email de cambio de email: {e}")
         logger.error(traceback.format_exc())
         return None, "Error al enviar email"
@@ -213,15 +223,16 @@ def confirmar_cambio_email_service(token_value):
     
     # Cambiar el email
     try:
-        user.email = new_email
-        user.save()
-        
-        # Marcar token como usado
-        email_token.used = True
-        email_token.save()
-        
-        # Enviar email de confirmación al nuevo email
-        enviar_email_confirmacion_cambio_email(user, old_email)
+        with transaction.atomic():
+            user.email = new_email
+            user.save()
+            
+            # Marcar token como usado
+            email_token.used = True
+            email_token.save()
+            
+            # Encolar email de confirmación al nuevo email
+            enviar_email_confirmacion_cambio_email(user, old_email)
         
         return user, old_email, new_email, None
     except Exception as e:
@@ -2,7 +2,6 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout, update_session_auth_hash
 from django.contrib import messages
-from django.utils import timezone
 from django.conf import settings
 from django.contrib.auth.models import User
 
@@ -19,6 +18,7 @@ from .services import (
     solicitar_cambio_email_service,
     confirmar_cambio_email_service
 )
+from core.sesiones import fecha_autenticacion, invalidar_sesiones
 # Las funciones de email están en utils.py pero no se importan directamente en views
 # Se usan a través de services
 
@@ -307,10 +307,8 @@ def cerrar_sesiones_todas(request):
     Actualiza el timestamp session_invalidated_at en el perfil.
     """
     if request.method == 'POST':
-        # Actualizar timestamp para invalidar todas las sesiones anteriores
-        perfil = request.user.perfil
-        perfil.session_invalidated_at = timezone.now()
-        perfil.save()
+        # Invalidar todas las sesiones anteriores; la actual sigue activa
+        invalidar_sesiones(request.user, request)
         
         messages.success(request, 
             'Se han cerrado todas las sesiones en otros dispositivos. '
@@ -319,4 +317,6 @@ def cerrar_sesiones_todas(request):
         return redirect('perfil')
     else:
         # Mostrar página de confirmación
-        return render(request, 'users/cerrar_sesiones_todas.html')
+        return render(request, 'users/cerrar_sesiones_todas.html', {
+            'sesion_iniciada_en': fecha_autenticacion(request),
+        })